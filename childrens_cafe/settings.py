@@ -45,6 +45,8 @@ INSTALLED_APPS = [
     'about',
     'contacts',
     'contact_form',
+    'jobs',
+    'reports',
 ]
 
 MIDDLEWARE = [
@@ -54,6 +56,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'menu.middleware.CartMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -93,6 +96,28 @@ DATABASES = {
     }
 }
 
+# Общий кэш всех процессов: по версиям в кэше процессы узнают об изменении
+# каталога (menu.catalog) и тарифов доставки (menu.delivery), свободное время
+# бронирований (homepage.slots) тоже должно быть одним на все процессы.
+# Без REDIS_URL - кэш в памяти процесса, только для разработки и тестов
+# с одним процессом (check --deploy предупреждает)
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'childrens_cafe',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'KEY_PREFIX': 'childrens_cafe',
+        }
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -146,7 +171,7 @@ STATICFILES_DIRS = [
 STATIC_ROOT = BASE_DIR / 'static'
 
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # или 'django.contrib.sessions.backends.signed_cookies'
-SESSION_SAVE_EVERY_REQUEST = True  # Важно: сохранять сессию при каждом запросе
+SESSION_SAVE_EVERY_REQUEST = False  # Корзина хранится отдельно от сессии (MENU_CART_*)
 
 SESSION_COOKIE_NAME = 'sessionid'
 SESSION_COOKIE_AGE = 1209600  # 2 недели
@@ -155,6 +180,19 @@ SESSION_COOKIE_SECURE = False  # True если используете HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
 
+# Хранилища корзины: гостя и авторизованного пользователя
+MENU_CART_ANONYMOUS_BACKEND = 'menu.cart_store.SignedCookieCartStore'
+MENU_CART_USER_BACKEND = 'menu.cart_store.DatabaseCartStore'
+
+# Локальные миниатюры изображений товаров
+MENU_THUMBNAIL_ROOT = BASE_DIR / 'media' / 'thumbnails'
+MENU_THUMBNAIL_WIDTHS = [96, 320, 640, 960]
+# Откуда можно скачивать исходные изображения (file:// - только в тестах)
+MENU_THUMBNAIL_SOURCE_SCHEMES = ['http', 'https']
+
+# Координаты кафе (широта, долгота) для расчета расстояния доставки
+MENU_CAFE_LOCATION = (54.1931, 37.6173)
+
 # Настройки аутентификации
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/profile/'
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import path, include
 
 urlpatterns = [
+    path('admin/reports/', include('reports.urls')),
     path('admin/', admin.site.urls),
     path('', include('homepage.urls')),
     path('menu/', include('menu.urls')),
@@ -1,17 +1,25 @@
 from django.contrib import admin
+from homepage.admin_export import ExportMixin
+from homepage.admin_helpers import LargeTableAdminMixin, PhoneSearchMixin, UserEmailFilter
 from .models import ContactMessage
 
 @admin.register(ContactMessage)
-class ContactMessageAdmin(admin.ModelAdmin):
-    list_display = ('name', 'email', 'user', 'created_at', 'ip_address')
-    list_filter = ('created_at', 'user')
+class ContactMessageAdmin(ExportMixin, PhoneSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('name', 'email', 'phone', 'user', 'created_at', 'ip_address')
+    list_filter = ('created_at', UserEmailFilter)
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
     search_fields = ('name', 'email', 'message', 'user__email')
+    phone_search_field = 'phone_normalized'
     readonly_fields = ('created_at', 'ip_address')
     date_hierarchy = 'created_at'
+    export_fields = (
+        'id', 'created_at', 'name', 'email', 'phone', ('user__email', 'Email пользователя'), 'ip_address', 'message',
+    )
     
     fieldsets = (
         ('Информация о сообщении', {
-            'fields': ('name', 'email', 'message', 'created_at', 'ip_address')
+            'fields': ('name', 'email', 'phone', 'message', 'created_at', 'ip_address')
         }),
         ('Связь с пользователем', {
             'fields': ('user',),
@@ -1,5 +1,6 @@
 from django import forms
 from django.contrib.auth import get_user_model
+from menu.phones import format_phone_number, validate_phone_number
 from .models import ContactMessage
 
 User = get_user_model()
@@ -7,7 +8,7 @@ User = get_user_model()
 class ContactForm(forms.ModelForm):
     class Meta:
         model = ContactMessage
-        fields = ['name', 'email', 'message']
+        fields = ['name', 'email', 'phone', 'message']
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -17,6 +18,11 @@ class ContactForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': 'Введите ваш email'
             }),
+            'phone': forms.TextInput(attrs={
+                'type': 'tel',
+                'class': 'form-control',
+                'placeholder': '+7 (XXX) XXX-XX-XX'
+            }),
             'message': forms.Textarea(attrs={
                 'class': 'form-control',
                 'placeholder': 'Введите ваше сообщение',
@@ -26,6 +32,7 @@ class ContactForm(forms.ModelForm):
         labels = {
             'name': 'Ваше имя',
             'email': 'Ваш email',
+            'phone': 'Телефон (необязательно)',
             'message': 'Сообщение',
         }
     
@@ -59,6 +66,15 @@ class ContactForm(forms.ModelForm):
         
         return email
     
+    def clean_phone(self):
+        phone = self.cleaned_data.get('phone', '').strip()
+        if phone:
+            is_valid, message = validate_phone_number(phone)
+            if not is_valid:
+                raise forms.ValidationError(message)
+            phone = format_phone_number(phone)
+        return phone
+    
     def save(self, commit=True):
         instance = super().save(commit=False)
         
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact_form', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactmessage',
+            name='phone',
+            field=models.CharField(blank=True, max_length=20, verbose_name='Телефон'),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='phone_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, verbose_name='Телефон (нормализованный)'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from menu.phones import normalize_phone
 
 class ContactMessage(models.Model):
     user = models.ForeignKey(
@@ -11,6 +12,8 @@ class ContactMessage(models.Model):
     )
     name = models.CharField(max_length=100, verbose_name='Имя')
     email = models.EmailField(verbose_name='Email')
+    phone = models.CharField(max_length=20, blank=True, verbose_name='Телефон')
+    phone_normalized = models.CharField(max_length=12, blank=True, db_index=True, editable=False, verbose_name='Телефон (нормализованный)')
     message = models.TextField(verbose_name='Сообщение')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата отправки')
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name='IP адрес')
@@ -20,5 +23,12 @@ class ContactMessage(models.Model):
         verbose_name_plural = 'Контактные сообщения'
         ordering = ['-created_at']
     
+    def save(self, *args, **kwargs):
+        self.phone_normalized = normalize_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'phone' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'phone_normalized'}
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"Сообщение от {self.name} ({self.email})"
\ No newline at end of file
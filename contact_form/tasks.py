@@ -0,0 +1,19 @@
+from .models import ContactMessage
+
+
+def report_contact_message(message_id):
+    """Выводит новое сообщение формы контактов в консоль (фоновая задача)"""
+    contact_message = ContactMessage.objects.select_related('user').filter(id=message_id).first()
+    if contact_message is None:
+        return
+    
+    print("=" * 50)
+    print("НОВАЯ ФОРМА КОНТАКТОВ, СОХРАНЕНО В БАЗУ ДАННЫХ:")
+    print(f"ID записи: {contact_message.id}")
+    print(f"Имя: {contact_message.name}")
+    print(f"Email: {contact_message.email}")
+    print(f"Сообщение: {contact_message.message}")
+    print(f"Дата создания: {contact_message.created_at}")
+    print(f"IP адрес: {contact_message.ip_address}")
+    print(f"Пользователь: {contact_message.user}")
+    print("=" * 50)
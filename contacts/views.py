@@ -1,35 +1,16 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from contact_form.forms import ContactForm
+from contact_form.tasks import report_contact_message
+from jobs.queue import enqueue
 
 def contact_info(request):
     if request.method == 'POST':
         form = ContactForm(request.POST, request=request)
         if form.is_valid():
             contact_message = form.save()
-            # Получаем данные из формы
-            name = form.cleaned_data['name']
-            email = form.cleaned_data['email']
-            message = form.cleaned_data['message']
-            
-            # Выводим данные в консоль
-            print("=" * 50)
-            print("НОВАЯ ФОРМА КОНТАКТОВ:")
-            print(f"Имя: {name}")
-            print(f"Email: {email}")
-            print(f"Сообщение: {message}")
-            print("=" * 50)
-
-            print("=" * 50)
-            print("СОХРАНЕНО В БАЗУ ДАННЫХ:")
-            print(f"ID записи: {contact_message.id}")
-            print(f"Имя: {contact_message.name}")
-            print(f"Email: {contact_message.email}")
-            print(f"Сообщение: {contact_message.message}")
-            print(f"Дата создания: {contact_message.created_at}")
-            print(f"IP адрес: {contact_message.ip_address}")
-            print(f"Пользователь: {contact_message.user}")
-            print("=" * 50)
+            # Вывод в консоль - фоновая задача (manage.py run_workers)
+            enqueue(report_contact_message, message_id=contact_message.id)
             
             # Перенаправляем на страницу успеха
             return redirect('contacts:success')
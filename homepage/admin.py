@@ -1,10 +1,12 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from .admin_export import ExportMixin
+from .admin_helpers import LargeTableAdminMixin, PhoneSearchMixin, UserEmailFilter
 from .models import CustomUser, CafeRating
-from .models import Booking
+from .models import ArchivedBooking, Booking, Room
 
 @admin.register(CustomUser)
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(LargeTableAdminMixin, UserAdmin):
     list_display = ('email', 'username', 'first_name', 'last_name', 'is_staff', 'is_active')
     list_filter = ('is_staff', 'is_superuser', 'is_active')
     search_fields = ('email', 'username', 'first_name', 'last_name')
@@ -25,12 +27,20 @@ class CustomUserAdmin(UserAdmin):
     )
 
 @admin.register(CafeRating)
-class CafeRatingAdmin(admin.ModelAdmin):
+class CafeRatingAdmin(ExportMixin, LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'overall_rating', 'food_quality', 'service_quality', 'recommend', 'created_at')
-    list_filter = ('food_quality', 'service_quality', 'recommend', 'created_at')
+    list_filter = ('food_quality', 'service_quality', 'recommend', 'created_at', UserEmailFilter)
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
     search_fields = ('user__email', 'user__username', 'comment')
     readonly_fields = ('created_at', 'overall_rating')
     date_hierarchy = 'created_at'
+    export_fields = (
+        'id', 'created_at', ('user__email', 'Email пользователя'),
+        'food_quality', 'service_quality', 'atmosphere', 'cleanliness', 'overall_rating',
+        'food_taste', 'portion_size', 'speed_service', 'staff_friendliness', 'price_quality',
+        'child_friendly', 'recommend', 'comment',
+    )
     
     fieldsets = (
         ('Основная информация', {
@@ -59,13 +69,27 @@ class CafeRatingAdmin(admin.ModelAdmin):
             return self.readonly_fields + ('user',)
         return self.readonly_fields
 
+@admin.register(Room)
+class RoomAdmin(admin.ModelAdmin):
+    list_display = ('name', 'capacity', 'is_active', 'sort_order')
+    list_editable = ('capacity', 'is_active', 'sort_order')
+    ordering = ('sort_order', 'capacity')
+
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'event_date', 'event_time', 'event_type', 'guests_count', 'status', 'total_cost')
-    list_filter = ('status', 'event_type', 'event_date', 'created_at')
-    search_fields = ('user__email', 'user__username', 'phone', 'comments')
+class BookingAdmin(ExportMixin, PhoneSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'user', 'event_date', 'event_time', 'room', 'event_type', 'guests_count', 'status', 'total_cost')
+    list_filter = ('status', 'room', 'event_type', 'event_date', 'created_at', UserEmailFilter)
+    list_select_related = ('user', 'room')
+    autocomplete_fields = ('user',)
+    search_fields = ('user__email', 'user__username', 'comments')
+    phone_search_field = 'phone_normalized'
     readonly_fields = ('created_at', 'updated_at', 'event_end_time', 'base_cost', 'services_cost', 'total_cost')
     date_hierarchy = 'event_date'
+    export_fields = (
+        'id', 'created_at', ('user__email', 'Email пользователя'), 'status',
+        'event_date', 'event_time', 'event_end_time', 'event_duration', ('room__name', 'Зал'), 'guests_count', 'event_type',
+        'services', 'base_cost', 'services_cost', 'total_cost', 'phone', 'comments',
+    )
     
     fieldsets = (
         ('Основная информация', {
@@ -77,6 +101,7 @@ class BookingAdmin(admin.ModelAdmin):
                 'event_time', 
                 'event_end_time',
                 'event_duration',
+                'room',
                 'guests_count', 
                 'event_type',
                 'comments'
@@ -97,4 +122,26 @@ class BookingAdmin(admin.ModelAdmin):
     def get_readonly_fields(self, request, obj=None):
         if obj:  # editing an existing object
             return self.readonly_fields + ('user', 'services')
-        return self.readonly_fields
\ No newline at end of file
+        return self.readonly_fields
+
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(ExportMixin, PhoneSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    """Архив бронирований (homepage.lifecycle), только просмотр"""
+    list_display = ('id', 'user', 'event_date', 'event_time', 'room', 'event_type', 'guests_count', 'status', 'total_cost')
+    list_filter = ('status', 'event_type', 'event_date', UserEmailFilter)
+    list_select_related = ('user', 'room')
+    search_fields = ('user__email', 'user__username', 'comments')
+    phone_search_field = 'phone_normalized'
+    date_hierarchy = 'event_date'
+    export_fields = (
+        'id', 'created_at', ('user__email', 'Email пользователя'), 'status',
+        'event_date', 'event_time', 'event_end_time', 'event_duration', ('room__name', 'Зал'), 'guests_count', 'event_type',
+        'services', 'base_cost', 'services_cost', 'total_cost', 'phone', 'comments', 'archived_at',
+    )
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,103 @@
+"""
+Общие настройки админки для больших таблиц.
+
+- InputFilter - фильтр с полем ввода вместо списка всех значений
+  (фильтр по внешнему ключу выводил каждый заказ или пользователя);
+- EstimatedCountPaginator - на PostgreSQL для нефильтрованного списка
+  берет оценку количества строк из статистики вместо COUNT(*);
+- LargeTableAdminMixin - подключает пагинатор и отключает подсчет
+  полного количества строк (show_full_result_count);
+- PhoneSearchMixin - если в поиск введен номер телефона, ищет точное
+  совпадение по индексированному нормализованному номеру.
+"""
+from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import QueryDict
+from django.utils.functional import cached_property
+
+from menu.phones import normalize_phone
+
+# Ниже этого порога количество считается точно
+ESTIMATE_THRESHOLD = 10000
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр со строкой ввода, значение подставляется в lookup"""
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        try:
+            return queryset.filter(**{self.lookup: value})
+        except (ValueError, ValidationError):
+            return queryset.none()
+
+    def choices(self, changelist):
+        # Остальные параметры списка сохраняются скрытыми полями формы
+        query_string = changelist.get_query_string(remove=[self.parameter_name])
+        yield {
+            'value': self.value() or '',
+            'hidden_params': list(QueryDict(query_string.lstrip('?')).lists()),
+        }
+
+
+class UserEmailFilter(InputFilter):
+    """Фильтр по email пользователя для моделей с полем user"""
+    title = 'email пользователя'
+    parameter_name = 'user_email'
+    lookup = 'user__email__iexact'
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор с оценкой количества строк для больших таблиц PostgreSQL"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is not None and not query.where:
+            estimate = self.estimate(queryset)
+            if estimate is not None and estimate > ESTIMATE_THRESHOLD:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] >= 0 else None
+
+
+class LargeTableAdminMixin:
+    """Список без полного подсчета строк и с оценкой количества на PostgreSQL"""
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
+class PhoneSearchMixin:
+    """Поиск по номеру телефона через поле phone_search_field (+7XXXXXXXXXX)"""
+    phone_search_field = None
+
+    def get_search_results(self, request, queryset, search_term):
+        phone = normalize_phone(search_term.strip()) if self.phone_search_field else ''
+        if phone:
+            return queryset.filter(**{self.phone_search_field: phone}), False
+        return super().get_search_results(request, queryset, search_term)
@@ -0,0 +1,154 @@
+"""
+Проверка занятости времени для бронирований.
+
+Каждое бронирование хранит интервал [starts_at, ends_at) полными датой и
+временем, поэтому мероприятие после полуночи не "заворачивается", как
+event_end_time. Пересечение с интервалом [start, end) ищется одним
+запросом по индексу (starts_at, ends_at):
+
+    starts_at < end AND ends_at > start
+
+Мероприятие длится не больше MAX_DURATION, поэтому начало пересекающегося
+бронирования ограничено и снизу (starts_at > start - MAX_DURATION), и
+запрос читает только узкий диапазон индекса, а не все бронирования дня.
+Индексы частичные - только действующие бронирования (ACTIVE_STATUSES):
+отмененные и завершенные (homepage.lifecycle) их не увеличивают.
+
+Время занимает не все кафе, а один зал (Room). Свободный зал для
+мероприятия выбирается по принципу best fit: самый маленький из
+подходящих по вместимости, в котором нет пересекающихся бронирований.
+Для каждого зала это проверка EXISTS по индексу (room, starts_at,
+ends_at) - отсортированному списку интервалов зала, поэтому весь подбор -
+один запрос, а не перебор бронирований. Бронирование без зала (созданное
+в обход reserve) занимает все залы.
+
+Проверка и сохранение (reserve) выполняются в одной транзакции под
+блокировкой дат бронирования: на PostgreSQL - pg_advisory_xact_lock на
+каждую дату, на других БД - UPDATE строк BookingDateLock (блокировка
+строк, на SQLite - блокировка записи в БД). Запросы на одну дату
+выполняются по очереди, на разные даты - параллельно. Даты блокируются
+по возрастанию, чтобы не было взаимных блокировок.
+
+На PostgreSQL двойное бронирование зала дополнительно запрещает сама БД:
+exclusion constraint booking_no_overlap по залу и tstzrange(starts_at,
+ends_at) (миграция 0010), его нарушение превращается в SlotTaken.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from .models import Booking, BookingDateLock, Room, event_interval
+
+# Как MaxValueValidator у Booking.event_duration
+MAX_DURATION = timedelta(hours=8)
+OVERLAP_CONSTRAINT = 'booking_no_overlap'
+# Первый ключ pg_advisory_xact_lock(int, int) для дат бронирований, второй - номер дня
+ADVISORY_LOCK_CLASS = 0x426B
+
+
+class SlotTaken(Exception):
+    """Время уже занято другим бронированием"""
+
+
+def overlapping(start, end, exclude_id=None):
+    """Действующие бронирования, пересекающиеся с интервалом [start, end)"""
+    queryset = Booking.objects.filter(
+        starts_at__gt=start - MAX_DURATION,
+        starts_at__lt=end,
+        ends_at__gt=start,
+        status__in=Booking.ACTIVE_STATUSES,
+    )
+    if exclude_id is not None:
+        queryset = queryset.exclude(id=exclude_id)
+    return queryset
+
+
+def free_room(start, end, guests_count=None, exclude_id=None, rooms=None):
+    """Самый маленький подходящий зал, свободный в интервале [start, end), или None"""
+    busy = overlapping(start, end, exclude_id)
+    candidates = Room.objects.filter(is_active=True)
+    if guests_count:
+        candidates = candidates.filter(capacity__gte=guests_count)
+    if rooms is not None:
+        candidates = candidates.filter(pk__in=[room.pk for room in rooms])
+    return (
+        candidates
+        .filter(~Exists(busy.filter(room=OuterRef('pk'))), ~Exists(busy.filter(room__isnull=True)))
+        .order_by('capacity', 'sort_order', 'id')
+        .first()
+    )
+
+
+def largest_capacity():
+    """Вместимость самого большого зала, принимающего бронирования"""
+    return Room.objects.filter(is_active=True).aggregate(capacity=Max('capacity'))['capacity'] or 0
+
+
+def is_available(event_date, event_time, duration, guests_count=None, exclude_id=None):
+    """Есть ли свободный зал: одна проверка для формы, AJAX-проверки и создания"""
+    start, end = event_interval(event_date, event_time, duration)
+    return free_room(start, end, guests_count, exclude_id) is not None
+
+
+def interval_days(starts_at, ends_at):
+    """Даты, которые занимает интервал"""
+    day, last_day = timezone.localdate(starts_at), timezone.localdate(ends_at - timedelta(microseconds=1))
+    days = []
+    while day <= last_day:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def lock_dates(days):
+    """Блокирует даты до конца текущей транзакции"""
+    days = sorted(set(days))
+    connection = connections[router.db_for_write(Booking)]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for day in days:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [ADVISORY_LOCK_CLASS, day.toordinal()])
+        return
+
+    locks = BookingDateLock.objects.filter(date__in=days)
+    now = timezone.now()
+    if locks.update(locked_at=now) < len(days):
+        BookingDateLock.objects.bulk_create([BookingDateLock(date=day) for day in days], ignore_conflicts=True)
+        locks.update(locked_at=now)
+
+
+def reserve(booking):
+    """Сохраняет бронирование, если время свободно, иначе SlotTaken"""
+    start, end = event_interval(booking.event_date, booking.event_time, booking.event_duration)
+    try:
+        with transaction.atomic():
+            # Мероприятие после полуночи блокирует и следующую дату
+            lock_dates(interval_days(start, end))
+            room = free_room(start, end, booking.guests_count, booking.id)
+            if room is None:
+                raise SlotTaken
+            booking.room = room
+            booking.save()
+    except IntegrityError as error:
+        if OVERLAP_CONSTRAINT in str(error):
+            raise SlotTaken from error
+        raise
+    return booking
+
+
+def double_bookings(start, end):
+    """Пары пересекающихся действующих бронирований одного зала в периоде (должно быть пусто)"""
+    rows = overlapping(start, end).order_by('starts_at', 'id').values_list('id', 'room_id', 'starts_at', 'ends_at')
+    pairs = []
+    active = []
+    for booking_id, room_id, starts_at, ends_at in rows:
+        # Проход по началу: с бронированием пересекаются те, что еще не закончились
+        active = [other for other in active if other[2] > starts_at]
+        pairs.extend(
+            (other_id, booking_id) for other_id, other_room, _ in active
+            if other_room == room_id or other_room is None or room_id is None
+        )
+        active.append((booking_id, room_id, ends_at))
+    return pairs
@@ -0,0 +1,62 @@
+"""
+Выражения для вычисляемых в БД полей (GeneratedField).
+"""
+from django.db import NotSupportedError
+from django.db.models import DateTimeField, Func, TimeField
+
+
+class AddHours(Func):
+    """Время + N часов (с переходом через полночь, как datetime.time)"""
+    output_field = TimeField()
+    arity = 2
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template="(%(expressions)s)",
+            arg_joiner=" + interval '1 hour' * ",
+            **extra_context,
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template="time(%(expressions)s || ' hours')",
+            arg_joiner=", '+' || ",
+            **extra_context,
+        )
+
+
+class EventMoment(Func):
+    """
+    Дата + время (+ N часов) как момент времени в часовом поясе zone
+    (TIME_ZONE проекта), как event_interval в homepage.models
+    """
+    output_field = DateTimeField()
+
+    def __init__(self, date, time, hours=None, *, zone):
+        expressions = (date, time) if hours is None else (date, time, hours)
+        super().__init__(*expressions, zone=zone)
+
+    def compile_parts(self, compiler, connection):
+        parts, params = [], []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            parts.append(sql)
+            params.extend(expression_params)
+        return parts, params
+
+    def as_sql(self, compiler, connection, **extra_context):
+        parts, params = self.compile_parts(compiler, connection)
+        moment = f'{parts[0]} + {parts[1]}'
+        if len(parts) == 3:
+            moment += f" + interval '1 hour' * {parts[2]}"
+        return f'(({moment}) AT TIME ZONE %s)', [*params, self.extra['zone']]
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # В SQLite нет часовых поясов: дата и время хранятся в UTC
+        if self.extra['zone'] != 'UTC':
+            raise NotSupportedError('На SQLite время мероприятий вычисляется только при TIME_ZONE = "UTC"')
+        parts, params = self.compile_parts(compiler, connection)
+        modifier = f", '+' || {parts[2]} || ' hours'" if len(parts) == 3 else ''
+        return f"datetime({parts[0]} || ' ' || {parts[1]}{modifier})", params
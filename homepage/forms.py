@@ -3,6 +3,8 @@ from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, Pass
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from datetime import datetime, timedelta, date
+from menu.phones import validate_phone_number
+from .slots import BOOKING_WINDOW_DAYS
 from .models import Booking
 
 User = get_user_model()
@@ -227,12 +229,19 @@ class BookingForm(forms.ModelForm):
             raise ValidationError('Нельзя выбрать прошедшую дату')
         
         # Проверяем, что не слишком далеко в будущем (максимум 3 месяца)
-        max_date = date.today() + timedelta(days=90)
+        max_date = date.today() + timedelta(days=BOOKING_WINDOW_DAYS)
         if event_date > max_date:
             raise ValidationError('Бронирование доступно максимум на 3 месяца вперед')
         
         return event_date
     
+    def clean_phone(self):
+        phone = self.cleaned_data.get('phone')
+        is_valid, message = validate_phone_number(phone)
+        if not is_valid:
+            raise ValidationError(message)
+        return phone
+    
     def clean_event_time(self):
         event_time = self.cleaned_data.get('event_time')
         event_date = self.cleaned_data.get('event_date')
@@ -245,23 +254,3 @@ class BookingForm(forms.ModelForm):
             raise ValidationError('Последнее бронирование принимается на 20:00')
         
         return event_time
-    
-    def clean(self):
-        cleaned_data = super().clean()
-        event_date = cleaned_data.get('event_date')
-        event_time = cleaned_data.get('event_time')
-        event_duration = cleaned_data.get('event_duration')
-        
-        if event_date and event_time and event_duration:
-            # Создаем временный объект для проверки
-            booking = Booking(
-                event_date=event_date,
-                event_time=event_time,
-                event_duration=event_duration
-            )
-            
-            # Проверяем доступность времени
-            if not booking.is_time_slot_available():
-                raise ValidationError('Выбранное время уже занято. Пожалуйста, выберите другое время.')
-        
-        return cleaned_data
\ No newline at end of file
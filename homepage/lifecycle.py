@@ -0,0 +1,69 @@
+"""
+Жизненный цикл бронирований (команда sweep_bookings).
+
+- Прошедшие действующие бронирования (ожидающие и подтвержденные)
+  переводятся в статус completed. В частичные индексы занятости
+  (homepage.availability) входят только действующие бронирования,
+  поэтому завершенные из них выходят.
+- Бронирования, закончившиеся раньше срока хранения (RETENTION_DAYS),
+  в том числе отмененные, переносятся в ArchivedBooking и удаляются из
+  Booking. Отчеты по всем бронированиям читают представление
+  BookingHistory (действующая таблица UNION ALL архив).
+
+Обе операции идут пачками: SELECT id пачки и один UPDATE (или INSERT в
+архив и DELETE) в одной транзакции. Прерванная чистка продолжается со
+следующего запуска. queryset.update не вызывает сигналы, поэтому кэш
+свободного времени (homepage.slots) сбрасывается явно.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .availability import interval_days
+from .models import ArchivedBooking, Booking
+from .slots import invalidate_days
+
+BATCH_SIZE = 1000
+RETENTION_DAYS = 365
+# Поля, которые копируются в архив как есть
+ARCHIVED_FIELDS = [field.attname for field in ArchivedBooking._meta.concrete_fields if field.name != 'archived_at']
+
+
+def complete_finished(now=None, batch_size=BATCH_SIZE):
+    """Переводит закончившиеся действующие бронирования в completed, возвращает их количество"""
+    now = now or timezone.now()
+    finished = Booking.objects.filter(status__in=Booking.ACTIVE_STATUSES, ends_at__lte=now)
+    completed = 0
+    while True:
+        with transaction.atomic():
+            rows = list(finished.order_by('id').values_list('id', 'starts_at', 'ends_at')[:batch_size])
+            if not rows:
+                break
+            # Условие повторяется: бронирование могли отменить между SELECT и UPDATE
+            completed += finished.filter(pk__in=[row[0] for row in rows]).update(status='completed', updated_at=now)
+        invalidate_days({day for _, starts_at, ends_at in rows for day in interval_days(starts_at, ends_at)})
+    return completed
+
+
+def archive_old(before, batch_size=BATCH_SIZE):
+    """Переносит в архив бронирования, закончившиеся раньше before, возвращает их количество"""
+    old = Booking.objects.filter(ends_at__lt=before)
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(old.order_by('id').select_for_update().values(*ARCHIVED_FIELDS)[:batch_size])
+            if not rows:
+                break
+            ArchivedBooking.objects.bulk_create([ArchivedBooking(**row) for row in rows])
+            Booking.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        archived += len(rows)
+    return archived
+
+
+def sweep_bookings(now=None, retention_days=RETENTION_DAYS, batch_size=BATCH_SIZE):
+    """Завершает прошедшие бронирования и архивирует старые: (завершено, перенесено в архив)"""
+    now = now or timezone.now()
+    completed = complete_finished(now, batch_size)
+    archived = archive_old(now - timedelta(days=retention_days), batch_size)
+    return completed, archived
@@ -0,0 +1,199 @@
+import json
+import random
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection
+from django.urls import reverse
+
+from homepage.availability import double_bookings
+from homepage.models import Booking, event_interval
+from homepage.slots import LAST_START, OPENING, SLOT_STEP, booking_window, to_time
+
+USER_EMAIL = 'loadtest-{}@example.com'
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест бронирования: параллельные запросы create_booking на одну дату, '
+        'отчет о пропускной способности, задержках и двойных бронированиях'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Всего запросов')
+        parser.add_argument('--concurrency', type=int, default=20, help='Параллельных потоков')
+        parser.add_argument('--users', type=int, default=20, help='Тестовых пользователей')
+        parser.add_argument('--date', help='Дата бронирований (по умолчанию - ближайшая суббота)')
+        parser.add_argument('--url', help='Адрес запущенного сервера, по умолчанию сервер запускается в процессе')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--keep', action='store_true', help='Не удалять тестовых пользователей и бронирования')
+        parser.add_argument(
+            '--database',
+            help='Имя базы данных, в которую пишет тест: без DEBUG запуск только с явно указанной базой',
+        )
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1 or options['users'] < 1:
+            raise CommandError('Количество запросов, потоков и пользователей - не меньше 1')
+        self.check_database(options['database'])
+        event_date = self.event_date(options['date'])
+        users = self.create_users(options['users'])
+        try:
+            doubles = self.run_requests(users, event_date, options)
+        finally:
+            # Тестовые данные удаляются и при ошибке или прерывании теста
+            if not options['keep']:
+                Booking.objects.filter(user__in=users).delete()
+                get_user_model().objects.filter(pk__in=[user.pk for user in users]).delete()
+        if doubles:
+            raise CommandError(f'Двойных бронирований: {len(doubles)}')
+
+    def check_database(self, name):
+        """
+        Тест создает пользователей и бронирования в настроенной базе. Без
+        DEBUG (в продакшене) она должна быть названа явно: --database <имя>
+        """
+        actual = str(connection.settings_dict['NAME'])
+        if name is None and not settings.DEBUG:
+            raise CommandError(
+                f'Нагрузочный тест пишет в базу данных {actual}. '
+                f'При DEBUG=False укажите ее явно: --database {actual}'
+            )
+        if name is not None and name != actual:
+            raise CommandError(f'Настроена база данных {actual}, а не {name}')
+
+    def run_requests(self, users, event_date, options):
+        """Отправляет запросы, печатает отчет и возвращает двойные бронирования"""
+        rng = random.Random(options['seed'])
+        # Короткие мероприятия на случайное время одного дня - много конфликтов
+        payloads = [
+            {
+                'eventDate': event_date.isoformat(),
+                'eventTime': to_time(rng.randrange(OPENING, LAST_START + 1, SLOT_STEP)).strftime('%H:%M'),
+                'eventDuration': rng.randint(1, 3),
+                'guestsCount': rng.randint(5, 20),
+                'eventType': 'birthday',
+                'phone': '+79990000000',
+            }
+            for _ in range(options['requests'])
+        ]
+
+        server = None
+        base_url = options['url']
+        if not base_url:
+            server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler)
+            server.set_app(WSGIHandler())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+        url = base_url.rstrip('/') + reverse('homepage:create_booking')
+
+        try:
+            sessions = [self.session_cookies(user) for user in users]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                results = list(executor.map(
+                    lambda item: self.post(url, item[1], sessions[item[0] % len(sessions)]),
+                    enumerate(payloads),
+                ))
+            elapsed = time.perf_counter() - started
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        start, end = event_interval(event_date, to_time(0), 24)
+        doubles = double_bookings(start, end)
+        self.report(results, elapsed, event_date, doubles)
+        return doubles
+
+    def event_date(self, value):
+        first_day, last_day = booking_window()
+        if value:
+            try:
+                event_date = date.fromisoformat(value)
+            except ValueError:
+                raise CommandError('Дата в формате ГГГГ-ММ-ДД')
+        else:
+            event_date = first_day + timedelta(days=(5 - first_day.weekday()) % 7 or 7)
+        if not first_day <= event_date <= last_day:
+            raise CommandError(f'Дата должна быть в пределах {first_day} - {last_day}')
+        return event_date
+
+    def create_users(self, count):
+        User = get_user_model()
+        users = []
+        for index in range(count):
+            user, created = User.objects.get_or_create(
+                email=USER_EMAIL.format(index), defaults={'username': f'loadtest-{index}'}
+            )
+            if created:
+                user.set_unusable_password()
+                user.save(update_fields=['password'])
+            users.append(user)
+        return users
+
+    def session_cookies(self, user):
+        """Сессия вошедшего пользователя и CSRF-токен без формы входа"""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        token = secrets.token_hex(16)
+        return {
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={session.session_key}; {settings.CSRF_COOKIE_NAME}={token}',
+            'X-CSRFToken': token,
+        }
+
+    def post(self, url, payload, headers):
+        request = urllib.request.Request(
+            url, data=json.dumps(payload).encode(), method='POST',
+            headers={'Content-Type': 'application/json', **headers},
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                body = json.loads(response.read())
+            outcome = 'created' if body.get('success') else ('taken' if 'eventTime' in body.get('errors', {}) else 'error')
+        except (urllib.error.URLError, ValueError):
+            outcome = 'error'
+        return outcome, time.perf_counter() - started
+
+    def report(self, results, elapsed, event_date, doubles):
+        latencies = [latency * 1000 for _, latency in results]
+        outcomes = [outcome for outcome, _ in results]
+        self.stdout.write(f'Дата: {event_date}, запросов: {len(results)}, время: {elapsed:.2f} с')
+        self.stdout.write(f'Пропускная способность: {len(results) / elapsed:.1f} запросов/с')
+        self.stdout.write(
+            'Задержка, мс: '
+            f'p50 {percentile(latencies, 0.5):.1f}, p90 {percentile(latencies, 0.9):.1f}, '
+            f'p99 {percentile(latencies, 0.99):.1f}, макс {max(latencies):.1f}'
+        )
+        self.stdout.write(
+            f'Создано: {outcomes.count("created")}, время занято: {outcomes.count("taken")}, '
+            f'ошибок: {outcomes.count("error")}'
+        )
+        style = self.style.ERROR if doubles else self.style.SUCCESS
+        self.stdout.write(style(f'Двойных бронирований: {len(doubles)}'))
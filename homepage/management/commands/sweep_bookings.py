@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from homepage.lifecycle import BATCH_SIZE, RETENTION_DAYS, sweep_bookings
+
+
+class Command(BaseCommand):
+    help = 'Завершает прошедшие бронирования и переносит старые в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Сколько бронирований обрабатывать в одной транзакции')
+        parser.add_argument(
+            '--retention-days', type=int, default=RETENTION_DAYS,
+            help='Бронирования, закончившиеся раньше, переносятся в архив',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['retention_days'] < 0:
+            raise CommandError('Размер пачки - не меньше 1, срок хранения - не меньше 0 дней')
+        completed, archived = sweep_bookings(
+            retention_days=options['retention_days'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(f'Завершено бронирований: {completed}')
+        self.stdout.write(self.style.SUCCESS(f'Перенесено в архив: {archived}'))
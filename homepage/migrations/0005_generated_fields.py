@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:08
+
+import django.db.models.expressions
+import homepage.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0004_booking'),
+    ]
+
+    operations = [
+        # Обычное поле нельзя изменить на вычисляемое, поэтому колонки пересоздаются
+        migrations.RemoveField(
+            model_name='booking',
+            name='base_cost',
+        ),
+        migrations.RemoveField(
+            model_name='booking',
+            name='event_end_time',
+        ),
+        migrations.RemoveField(
+            model_name='booking',
+            name='total_cost',
+        ),
+        migrations.RemoveField(
+            model_name='caferating',
+            name='overall_rating',
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='base_cost',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('event_duration'), '*', models.Value(2500)), output_field=models.DecimalField(decimal_places=2, max_digits=10), verbose_name='Базовая стоимость'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='event_end_time',
+            field=models.GeneratedField(db_persist=True, expression=homepage.expressions.AddHours('event_time', 'event_duration'), output_field=models.TimeField(), verbose_name='Время окончания'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='total_cost',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('event_duration'), '*', models.Value(2500)), '+', models.F('services_cost')), output_field=models.DecimalField(decimal_places=2, max_digits=10), verbose_name='Общая стоимость'),
+        ),
+        migrations.AddField(
+            model_name='caferating',
+            name='overall_rating',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('food_quality'), '+', models.F('service_quality')), '+', models.F('atmosphere')), '+', models.F('cleanliness')), '/', models.Value(4.0)), output_field=models.FloatField(), verbose_name='Общая оценка'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['total_cost'], name='homepage_bo_total_c_c9e67f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caferating',
+            index=models.Index(fields=['overall_rating'], name='homepage_ca_overall_76c45a_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0005_generated_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='homepage_bo_user_id_626a82_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caferating',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='homepage_ca_user_id_768fd7_idx'),
+        ),
+    ]
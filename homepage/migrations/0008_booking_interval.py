@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+OVERLAP_CONSTRAINT_SQL = """
+    ALTER TABLE homepage_booking ADD CONSTRAINT booking_no_overlap
+    EXCLUDE USING gist (tstzrange(starts_at, ends_at, '[)') WITH &&)
+    WHERE (status IN ('pending', 'confirmed'))
+"""
+
+
+def fill_intervals(apps, schema_editor):
+    Booking = apps.get_model('homepage', 'Booking')
+    batch = []
+    for booking in Booking.objects.only('id', 'event_date', 'event_time', 'event_duration').iterator(chunk_size=1000):
+        booking.starts_at = timezone.make_aware(datetime.combine(booking.event_date, booking.event_time))
+        booking.ends_at = booking.starts_at + timedelta(hours=booking.event_duration)
+        batch.append(booking)
+        if len(batch) >= 1000:
+            Booking.objects.bulk_update(batch, ['starts_at', 'ends_at'])
+            batch = []
+    Booking.objects.bulk_update(batch, ['starts_at', 'ends_at'])
+
+
+def add_overlap_constraint(apps, schema_editor):
+    # Exclusion constraint есть только в PostgreSQL. Миграция не пройдет,
+    # если в базе уже есть пересекающиеся действующие бронирования
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(OVERLAP_CONSTRAINT_SQL)
+
+
+def remove_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE homepage_booking DROP CONSTRAINT IF EXISTS booking_no_overlap')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0007_booking_phone_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Начало'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Окончание'),
+        ),
+        migrations.RunPython(fill_intervals, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='booking',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, verbose_name='Начало'),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, verbose_name='Окончание'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['starts_at', 'ends_at'], name='homepage_bo_starts__dfd05a_idx'),
+        ),
+        migrations.RunPython(add_overlap_constraint, remove_overlap_constraint),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0008_booking_interval'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingDateLock',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False, verbose_name='Дата')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя блокировка')),
+            ],
+            options={
+                'verbose_name': 'Блокировка даты бронирования',
+                'verbose_name_plural': 'Блокировки дат бронирований',
+            },
+        ),
+    ]
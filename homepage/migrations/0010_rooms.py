@@ -0,0 +1,44 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+def create_main_room(apps, schema_editor):
+    # До появления залов все кафе было одним залом
+    Room = apps.get_model('homepage', 'Room')
+    Booking = apps.get_model('homepage', 'Booking')
+    room = Room.objects.create(name='Большой зал', capacity=50)
+    Booking.objects.filter(room__isnull=True).update(room=room)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0009_booking_date_lock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Room',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('capacity', models.PositiveIntegerField(verbose_name='Вместимость (гостей)')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Принимает бронирования')),
+                ('sort_order', models.PositiveIntegerField(default=0, verbose_name='Порядок')),
+            ],
+            options={
+                'verbose_name': 'Зал',
+                'verbose_name_plural': 'Залы',
+                'ordering': ['sort_order', 'capacity', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='room',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='bookings', to='homepage.room', verbose_name='Зал'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['room', 'starts_at', 'ends_at'], name='homepage_bo_room_id_74ad3c_idx'),
+        ),
+        migrations.RunPython(create_main_room, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Пересечения запрещены внутри одного зала. Бронирование без зала (room_id
+# IS NULL) дает неограниченный int8range и пересекается со всеми залами
+ROOM_CONSTRAINT_SQL = """
+    ALTER TABLE homepage_booking ADD CONSTRAINT booking_no_overlap
+    EXCLUDE USING gist (
+        int8range(room_id, room_id, '[]') WITH &&,
+        tstzrange(starts_at, ends_at, '[)') WITH &&
+    )
+    WHERE (status IN ('pending', 'confirmed'))
+"""
+CAFE_CONSTRAINT_SQL = """
+    ALTER TABLE homepage_booking ADD CONSTRAINT booking_no_overlap
+    EXCLUDE USING gist (tstzrange(starts_at, ends_at, '[)') WITH &&)
+    WHERE (status IN ('pending', 'confirmed'))
+"""
+
+
+def replace_constraint(sql):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute('ALTER TABLE homepage_booking DROP CONSTRAINT IF EXISTS booking_no_overlap')
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+    # Отдельно от 0010: на PostgreSQL ALTER TABLE нельзя выполнить в одной
+    # транзакции с обновлением внешнего ключа room_id
+
+    dependencies = [
+        ('homepage', '0010_rooms'),
+    ]
+
+    operations = [
+        migrations.RunPython(replace_constraint(ROOM_CONSTRAINT_SQL), replace_constraint(CAFE_CONSTRAINT_SQL)),
+    ]
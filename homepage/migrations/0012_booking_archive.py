@@ -0,0 +1,116 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+HISTORY_COLUMNS = (
+    'id, user_id, room_id, event_date, event_time, event_duration, guests_count, '
+    'event_type, phone_normalized, status, total_cost, created_at'
+)
+
+# Отчеты по всем бронированиям: действующие и перенесенные в архив
+CREATE_HISTORY_VIEW = f'''
+CREATE VIEW homepage_bookinghistory AS
+SELECT {HISTORY_COLUMNS}, FALSE AS is_archived FROM homepage_booking
+UNION ALL
+SELECT {HISTORY_COLUMNS}, TRUE AS is_archived FROM homepage_archivedbooking
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('homepage', '0011_room_overlap_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingHistory',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID бронирования')),
+                ('event_date', models.DateField(verbose_name='Дата мероприятия')),
+                ('event_time', models.TimeField(verbose_name='Время начала')),
+                ('event_duration', models.IntegerField(verbose_name='Продолжительность (часы)')),
+                ('guests_count', models.IntegerField(verbose_name='Количество гостей')),
+                ('event_type', models.CharField(choices=[('birthday', 'День рождения'), ('holiday', 'Праздник'), ('graduation', 'Выпускной'), ('other', 'Другое')], max_length=20, verbose_name='Тип мероприятия')),
+                ('phone_normalized', models.CharField(max_length=12, verbose_name='Телефон (нормализованный)')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('confirmed', 'Подтверждено'), ('cancelled', 'Отменено'), ('completed', 'Завершено')], max_length=20, verbose_name='Статус')),
+                ('total_cost', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Общая стоимость')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('is_archived', models.BooleanField(verbose_name='В архиве')),
+            ],
+            options={
+                'verbose_name': 'Бронирование (с архивом)',
+                'verbose_name_plural': 'Бронирования (с архивом)',
+                'db_table': 'homepage_bookinghistory',
+                'ordering': ['-created_at'],
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID бронирования')),
+                ('event_date', models.DateField(verbose_name='Дата мероприятия')),
+                ('event_time', models.TimeField(verbose_name='Время начала')),
+                ('event_duration', models.IntegerField(verbose_name='Продолжительность (часы)')),
+                ('event_end_time', models.TimeField(verbose_name='Время окончания')),
+                ('starts_at', models.DateTimeField(verbose_name='Начало')),
+                ('ends_at', models.DateTimeField(verbose_name='Окончание')),
+                ('guests_count', models.IntegerField(verbose_name='Количество гостей')),
+                ('event_type', models.CharField(choices=[('birthday', 'День рождения'), ('holiday', 'Праздник'), ('graduation', 'Выпускной'), ('other', 'Другое')], max_length=20, verbose_name='Тип мероприятия')),
+                ('services', models.JSONField(default=list, verbose_name='Дополнительные услуги')),
+                ('phone', models.CharField(max_length=20, verbose_name='Контактный телефон')),
+                ('phone_normalized', models.CharField(blank=True, db_index=True, max_length=12, verbose_name='Телефон (нормализованный)')),
+                ('comments', models.TextField(blank=True, verbose_name='Дополнительные пожелания')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('confirmed', 'Подтверждено'), ('cancelled', 'Отменено'), ('completed', 'Завершено')], max_length=20, verbose_name='Статус')),
+                ('base_cost', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Базовая стоимость')),
+                ('services_cost', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Стоимость услуг')),
+                ('total_cost', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Общая стоимость')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата обновления')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата переноса в архив')),
+            ],
+            options={
+                'verbose_name': 'Архивное бронирование',
+                'verbose_name_plural': 'Архив бронирований',
+                'ordering': ['-event_date', '-event_time'],
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='homepage_bo_starts__dfd05a_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='homepage_bo_room_id_74ad3c_idx',
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status__in', ('pending', 'confirmed'))), fields=['starts_at', 'ends_at'], name='booking_active_interval_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status__in', ('pending', 'confirmed'))), fields=['room', 'starts_at', 'ends_at'], name='booking_active_room_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='room',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_bookings', to='homepage.room', verbose_name='Зал'),
+        ),
+        migrations.AddField(
+            model_name='archivedbooking',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_bookings', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['event_date', 'event_time'], name='homepage_ar_event_d_8a9b78_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['user', '-created_at'], name='homepage_ar_user_id_5e497c_idx'),
+        ),
+        migrations.RunSQL(CREATE_HISTORY_VIEW, 'DROP VIEW homepage_bookinghistory'),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:30
+
+from datetime import datetime, timedelta
+
+import homepage.expressions
+from django.db import migrations, models
+from django.utils import timezone
+
+# Ограничение из 0011: столбцы интервала пересоздаются, поэтому оно
+# снимается до удаления столбцов и создается заново
+ROOM_CONSTRAINT_SQL = """
+    ALTER TABLE homepage_booking ADD CONSTRAINT booking_no_overlap
+    EXCLUDE USING gist (
+        int8range(room_id, room_id, '[]') WITH &&,
+        tstzrange(starts_at, ends_at, '[)') WITH &&
+    )
+    WHERE (status IN ('pending', 'confirmed'))
+"""
+
+
+# Представление из 0012: SQLite пересоздает таблицу при изменении столбцов
+# и не переименовывает ее, пока на нее ссылается представление
+HISTORY_COLUMNS = (
+    'id, user_id, room_id, event_date, event_time, event_duration, guests_count, '
+    'event_type, phone_normalized, status, total_cost, created_at'
+)
+CREATE_HISTORY_VIEW = f'''
+CREATE VIEW homepage_bookinghistory AS
+SELECT {HISTORY_COLUMNS}, FALSE AS is_archived FROM homepage_booking
+UNION ALL
+SELECT {HISTORY_COLUMNS}, TRUE AS is_archived FROM homepage_archivedbooking
+'''
+DROP_HISTORY_VIEW = 'DROP VIEW homepage_bookinghistory'
+
+
+def add_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(ROOM_CONSTRAINT_SQL)
+
+
+def remove_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE homepage_booking DROP CONSTRAINT IF EXISTS booking_no_overlap')
+
+
+def fill_intervals(apps, schema_editor):
+    # Только для отката: обычные столбцы интервала заполняются, как в 0008
+    Booking = apps.get_model('homepage', 'Booking')
+    batch = []
+    for booking in Booking.objects.only('id', 'event_date', 'event_time', 'event_duration').iterator(chunk_size=1000):
+        booking.starts_at = timezone.make_aware(datetime.combine(booking.event_date, booking.event_time))
+        booking.ends_at = booking.starts_at + timedelta(hours=booking.event_duration)
+        batch.append(booking)
+        if len(batch) >= 1000:
+            Booking.objects.bulk_update(batch, ['starts_at', 'ends_at'])
+            batch = []
+    Booking.objects.bulk_update(batch, ['starts_at', 'ends_at'])
+
+
+class Migration(migrations.Migration):
+    # Обычное поле нельзя превратить в вычисляемое через AlterField:
+    # столбцы удаляются и добавляются заново вместе с индексами и ограничением
+
+    dependencies = [
+        ('homepage', '0012_booking_archive'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DROP_HISTORY_VIEW, CREATE_HISTORY_VIEW),
+        migrations.RunPython(remove_overlap_constraint, add_overlap_constraint),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_active_interval_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_active_room_idx',
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Начало'),
+        ),
+        migrations.AlterField(
+            model_name='booking',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Окончание'),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, fill_intervals),
+        migrations.RemoveField(
+            model_name='booking',
+            name='starts_at',
+        ),
+        migrations.RemoveField(
+            model_name='booking',
+            name='ends_at',
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='starts_at',
+            field=models.GeneratedField(db_persist=True, expression=homepage.expressions.EventMoment('event_date', 'event_time', zone='UTC'), output_field=models.DateTimeField(), verbose_name='Начало'),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='ends_at',
+            field=models.GeneratedField(db_persist=True, expression=homepage.expressions.EventMoment('event_date', 'event_time', 'event_duration', zone='UTC'), output_field=models.DateTimeField(), verbose_name='Окончание'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status__in', ('pending', 'confirmed'))), fields=['starts_at', 'ends_at'], name='booking_active_interval_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status__in', ('pending', 'confirmed'))), fields=['room', 'starts_at', 'ends_at'], name='booking_active_room_idx'),
+        ),
+        migrations.RunPython(add_overlap_constraint, remove_overlap_constraint),
+        migrations.RunSQL(CREATE_HISTORY_VIEW, DROP_HISTORY_VIEW),
+    ]
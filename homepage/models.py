@@ -1,7 +1,15 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+from menu.phones import normalize_phone
+from .expressions import AddHours, EventMoment
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -159,21 +167,21 @@ class CafeRating(models.Model):
     # Комментарий
     comment = models.TextField(blank=True, max_length=500, verbose_name='Комментарий')
     
-    # Общая оценка (вычисляемое поле)
-    overall_rating = models.FloatField(verbose_name='Общая оценка')
+    # Общая оценка - среднее основных критериев, вычисляется в БД
+    overall_rating = models.GeneratedField(
+        expression=(
+            models.F('food_quality') +
+            models.F('service_quality') +
+            models.F('atmosphere') +
+            models.F('cleanliness')
+        ) / models.Value(4.0),
+        output_field=models.FloatField(),
+        db_persist=True,
+        verbose_name='Общая оценка'
+    )
     
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     
-    def save(self, *args, **kwargs):
-        # Вычисляем общую оценку как среднее основных критериев
-        self.overall_rating = (
-            self.food_quality + 
-            self.service_quality + 
-            self.atmosphere + 
-            self.cleanliness
-        ) / 4.0
-        super().save(*args, **kwargs)
-    
     def __str__(self):
         return f"Оценка от {self.user.email} - {self.overall_rating:.1f}/5"
 
@@ -181,6 +189,69 @@ class CafeRating(models.Model):
         verbose_name = 'Оценка кафе'
         verbose_name_plural = 'Оценки кафе'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['overall_rating']),
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
+
+def event_interval(event_date, event_time, duration):
+    """Начало и конец мероприятия (aware datetime), конец может быть на следующий день"""
+    if isinstance(event_date, str):
+        event_date = parse_date(event_date)
+    if isinstance(event_time, str):
+        event_time = parse_time(event_time)
+    starts_at = timezone.make_aware(datetime.combine(event_date, event_time))
+    return starts_at, starts_at + timedelta(hours=int(duration))
+
+
+class Room(models.Model):
+    """Зал кафе: бронирования в разных залах могут идти одновременно"""
+    name = models.CharField(max_length=100, verbose_name='Название')
+    capacity = models.PositiveIntegerField(verbose_name='Вместимость (гостей)')
+    is_active = models.BooleanField(default=True, verbose_name='Принимает бронирования')
+    sort_order = models.PositiveIntegerField(default=0, verbose_name='Порядок')
+    
+    def __str__(self):
+        return f"{self.name} (до {self.capacity} гостей)"
+    
+    class Meta:
+        verbose_name = 'Зал'
+        verbose_name_plural = 'Залы'
+        ordering = ['sort_order', 'capacity', 'id']
+
+
+class BookingQuerySet(models.QuerySet):
+    """
+    Поля, которые заполняет save() (нормализованный телефон, стоимость
+    услуг), пересчитываются и при update() / bulk_update()
+    """
+
+    def update(self, **kwargs):
+        # bulk_update передает и исходное, и вычисленное поле (выражениями CASE)
+        if 'phone' in kwargs and 'phone_normalized' not in kwargs:
+            if not isinstance(kwargs['phone'], str):
+                raise ValueError('phone обновляется только строкой: нормализованный номер вычисляется в Python')
+            kwargs['phone_normalized'] = normalize_phone(kwargs['phone'])
+        if 'services' in kwargs and 'services_cost' not in kwargs:
+            if not isinstance(kwargs['services'], list):
+                raise ValueError('services обновляется только списком: стоимость услуг вычисляется в Python')
+            kwargs['services_cost'] = Booking.services_total(kwargs['services'])
+        return super().update(**kwargs)
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        objs, fields = tuple(objs), list(fields)
+        if 'phone' in fields:
+            for booking in objs:
+                booking.phone_normalized = normalize_phone(booking.phone)
+            if 'phone_normalized' not in fields:
+                fields.append('phone_normalized')
+        if 'services' in fields:
+            for booking in objs:
+                booking.calculate_cost()
+            if 'services_cost' not in fields:
+                fields.append('services_cost')
+        return super().bulk_update(objs, fields, batch_size=batch_size)
+
 
 class Booking(models.Model):
     EVENT_TYPE_CHOICES = [
@@ -191,6 +262,16 @@ class Booking(models.Model):
     ]
     
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, verbose_name='Пользователь')
+    # Зал назначается при бронировании (homepage.availability), бронирование
+    # без зала занимает все залы
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='bookings',
+        verbose_name='Зал'
+    )
     
     # Дата и время мероприятия
     event_date = models.DateField(verbose_name='Дата мероприятия')
@@ -201,8 +282,28 @@ class Booking(models.Model):
         validators=[MinValueValidator(1), MaxValueValidator(8)]
     )
     
-    # Расчетное время окончания
-    event_end_time = models.TimeField(verbose_name='Время окончания', blank=True, null=True)
+    # Расчетное время окончания (вычисляется в БД)
+    event_end_time = models.GeneratedField(
+        expression=AddHours('event_time', 'event_duration'),
+        output_field=models.TimeField(),
+        db_persist=True,
+        verbose_name='Время окончания'
+    )
+    
+    # Интервал мероприятия для проверки пересечений (вычисляется в БД,
+    # поэтому верен и после QuerySet.update / bulk_update)
+    starts_at = models.GeneratedField(
+        expression=EventMoment('event_date', 'event_time', zone=settings.TIME_ZONE),
+        output_field=models.DateTimeField(),
+        db_persist=True,
+        verbose_name='Начало'
+    )
+    ends_at = models.GeneratedField(
+        expression=EventMoment('event_date', 'event_time', 'event_duration', zone=settings.TIME_ZONE),
+        output_field=models.DateTimeField(),
+        db_persist=True,
+        verbose_name='Окончание'
+    )
     
     # Детали мероприятия
     guests_count = models.IntegerField(
@@ -224,6 +325,7 @@ class Booking(models.Model):
     
     # Контактная информация
     phone = models.CharField(max_length=20, verbose_name='Контактный телефон')
+    phone_normalized = models.CharField(max_length=12, blank=True, db_index=True, editable=False, verbose_name='Телефон (нормализованный)')
     comments = models.TextField(blank=True, verbose_name='Дополнительные пожелания')
     
     # Статус бронирования
@@ -233,6 +335,8 @@ class Booking(models.Model):
         ('cancelled', 'Отменено'),
         ('completed', 'Завершено'),
     ]
+    # Бронирования, которые занимают время
+    ACTIVE_STATUSES = ('pending', 'confirmed')
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
@@ -240,11 +344,20 @@ class Booking(models.Model):
         verbose_name='Статус'
     )
     
-    # Расчет стоимости
-    base_cost = models.DecimalField(
-        max_digits=10,
-        decimal_places=2,
-        default=5000.00,
+    # Расчет стоимости: базовая и общая стоимость вычисляются в БД,
+    # стоимость услуг - при сохранении (зависит от списка услуг в JSON)
+    HOURLY_RATE = 2500  # руб/час
+    SERVICES_PRICES = {
+        'animator': 1000,
+        'cake': 1500,
+        'decorations': 2000,
+        'photographer': 2500,
+    }
+    
+    base_cost = models.GeneratedField(
+        expression=models.F('event_duration') * HOURLY_RATE,
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
         verbose_name='Базовая стоимость'
     )
     services_cost = models.DecimalField(
@@ -253,69 +366,64 @@ class Booking(models.Model):
         default=0.00,
         verbose_name='Стоимость услуг'
     )
-    total_cost = models.DecimalField(
-        max_digits=10,
-        decimal_places=2,
-        default=5000.00,
+    total_cost = models.GeneratedField(
+        expression=models.F('event_duration') * HOURLY_RATE + models.F('services_cost'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
         verbose_name='Общая стоимость'
     )
     
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     
+    objects = BookingQuerySet.as_manager()
+    
+    def clean(self):
+        if not (self.status in self.ACTIVE_STATUSES and self.event_date and self.event_time
+                and self.event_duration and self.guests_count):
+            return
+        from .availability import free_room
+        start, end = event_interval(self.event_date, self.event_time, self.event_duration)
+        room = free_room(start, end, self.guests_count, exclude_id=self.id, rooms=[self.room] if self.room else None)
+        if room is None:
+            if self.room:
+                raise ValidationError({'room': 'Зал занят в это время или вмещает меньше гостей'})
+            raise ValidationError('Выбранное время уже занято: нет свободного зала на это количество гостей')
+        # Без выбранного зала назначается подходящий свободный
+        self.room = room
+    
     def save(self, *args, **kwargs):
-        # Рассчитываем время окончания
-        from datetime import datetime, timedelta
-        start_datetime = datetime.combine(self.event_date, self.event_time)
-        end_datetime = start_datetime + timedelta(hours=self.event_duration)
-        self.event_end_time = end_datetime.time()
-        
-        # Рассчитываем стоимость
+        # Время окончания, интервал, базовая и общая стоимость вычисляются в БД.
+        # Интервал экземпляра обновляется здесь: после UPDATE Django не
+        # перечитывает вычисляемые поля, а сигналы бронирования его читают
         self.calculate_cost()
-        
+        self.starts_at, self.ends_at = event_interval(self.event_date, self.event_time, self.event_duration)
+        self.phone_normalized = normalize_phone(self.phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = {
+                'services': ['services_cost'],
+                'phone': ['phone_normalized'],
+            }
+            kwargs['update_fields'] = {
+                *update_fields, *(name for field in update_fields for name in derived.get(field, ()))
+            }
         super().save(*args, **kwargs)
     
+    @classmethod
+    def services_total(cls, services):
+        return sum(cls.SERVICES_PRICES.get(service, 0) for service in services)
+    
     def calculate_cost(self):
-        """Расчет стоимости бронирования"""
-        # Базовая стоимость (5000 руб за 2 часа)
-        base_hourly_rate = 2500  # руб/час
-        self.base_cost = base_hourly_rate * self.event_duration
-        
-        # Стоимость дополнительных услуг
-        services_prices = {
-            'animator': 1000,
-            'cake': 1500,
-            'decorations': 2000,
-            'photographer': 2500,
-        }
-        
-        self.services_cost = sum(services_prices.get(service, 0) for service in self.services)
-        self.total_cost = self.base_cost + self.services_cost
+        """Расчет стоимости дополнительных услуг"""
+        self.services_cost = self.services_total(self.services)
     
     def is_time_slot_available(self):
         """Проверка, свободен ли временной слот"""
-        from datetime import datetime, timedelta
-        from django.utils import timezone
-        
-        # Получаем дату и время начала
-        start_datetime = datetime.combine(self.event_date, self.event_time)
-        end_datetime = start_datetime + timedelta(hours=self.event_duration)
-        
-        # Ищем пересекающиеся бронирования
-        overlapping_bookings = Booking.objects.filter(
-            event_date=self.event_date,
-            status__in=['pending', 'confirmed']
-        ).exclude(id=self.id)
-        
-        for booking in overlapping_bookings:
-            booking_start = datetime.combine(booking.event_date, booking.event_time)
-            booking_end = datetime.combine(booking.event_date, booking.event_end_time)
-            
-            # Проверяем пересечение временных интервалов
-            if (start_datetime < booking_end) and (end_datetime > booking_start):
-                return False
-        
-        return True
+        from .availability import is_available
+        return is_available(
+            self.event_date, self.event_time, self.event_duration, self.guests_count, exclude_id=self.id
+        )
     
     def __str__(self):
         return f"Бронирование #{self.id} от {self.user.email} на {self.event_date} {self.event_time}"
@@ -327,4 +435,126 @@ class Booking(models.Model):
         indexes = [
             models.Index(fields=['event_date', 'event_time']),
             models.Index(fields=['status']),
-        ]
\ No newline at end of file
+            models.Index(fields=['total_cost']),
+            models.Index(fields=['user', '-created_at', '-id']),
+            # Поиск пересекающихся бронирований (homepage.availability): в индексах
+            # только действующие бронирования, завершенные и отмененные их не раздувают
+            models.Index(
+                fields=['starts_at', 'ends_at'],
+                condition=models.Q(status__in=('pending', 'confirmed')),  # ACTIVE_STATUSES
+                name='booking_active_interval_idx',
+            ),
+            models.Index(
+                fields=['room', 'starts_at', 'ends_at'],
+                condition=models.Q(status__in=('pending', 'confirmed')),  # ACTIVE_STATUSES
+                name='booking_active_room_idx',
+            ),
+        ]
+
+
+class BookingDateLock(models.Model):
+    """Строка-замок даты бронирования для БД без advisory locks (homepage.availability)"""
+    date = models.DateField(primary_key=True, verbose_name='Дата')
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name='Последняя блокировка')
+    
+    class Meta:
+        verbose_name = 'Блокировка даты бронирования'
+        verbose_name_plural = 'Блокировки дат бронирований'
+
+
+class ArchivedBooking(models.Model):
+    """
+    Бронирование старше срока хранения, перенесенное из Booking командой
+    sweep_bookings (homepage.lifecycle). Хранит значения полей на момент
+    переноса, id совпадает с id исходного бронирования.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID бронирования')
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.CASCADE,
+        related_name='archived_bookings',
+        verbose_name='Пользователь'
+    )
+    # Зал можно удалить, архив при этом сохраняется
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_bookings',
+        verbose_name='Зал'
+    )
+    event_date = models.DateField(verbose_name='Дата мероприятия')
+    event_time = models.TimeField(verbose_name='Время начала')
+    event_duration = models.IntegerField(verbose_name='Продолжительность (часы)')
+    event_end_time = models.TimeField(verbose_name='Время окончания')
+    starts_at = models.DateTimeField(verbose_name='Начало')
+    ends_at = models.DateTimeField(verbose_name='Окончание')
+    guests_count = models.IntegerField(verbose_name='Количество гостей')
+    event_type = models.CharField(max_length=20, choices=Booking.EVENT_TYPE_CHOICES, verbose_name='Тип мероприятия')
+    services = models.JSONField(default=list, verbose_name='Дополнительные услуги')
+    phone = models.CharField(max_length=20, verbose_name='Контактный телефон')
+    phone_normalized = models.CharField(max_length=12, blank=True, db_index=True, verbose_name='Телефон (нормализованный)')
+    comments = models.TextField(blank=True, verbose_name='Дополнительные пожелания')
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES, verbose_name='Статус')
+    base_cost = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Базовая стоимость')
+    services_cost = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Стоимость услуг')
+    total_cost = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Общая стоимость')
+    created_at = models.DateTimeField(verbose_name='Дата создания')
+    updated_at = models.DateTimeField(verbose_name='Дата обновления')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата переноса в архив')
+    
+    def __str__(self):
+        return f"Архивное бронирование #{self.id} на {self.event_date} {self.event_time}"
+    
+    class Meta:
+        verbose_name = 'Архивное бронирование'
+        verbose_name_plural = 'Архив бронирований'
+        ordering = ['-event_date', '-event_time']
+        indexes = [
+            models.Index(fields=['event_date', 'event_time']),
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+
+class BookingHistory(models.Model):
+    """
+    Все бронирования для отчетов: представление БД homepage_bookinghistory,
+    UNION ALL действующей таблицы и архива (миграция 0012). Только чтение.
+    """
+    id = models.BigIntegerField(primary_key=True, verbose_name='ID бронирования')
+    user = models.ForeignKey(
+        get_user_model(),
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    room = models.ForeignKey(
+        Room,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name='+',
+        verbose_name='Зал'
+    )
+    event_date = models.DateField(verbose_name='Дата мероприятия')
+    event_time = models.TimeField(verbose_name='Время начала')
+    event_duration = models.IntegerField(verbose_name='Продолжительность (часы)')
+    guests_count = models.IntegerField(verbose_name='Количество гостей')
+    event_type = models.CharField(max_length=20, choices=Booking.EVENT_TYPE_CHOICES, verbose_name='Тип мероприятия')
+    phone_normalized = models.CharField(max_length=12, verbose_name='Телефон (нормализованный)')
+    status = models.CharField(max_length=20, choices=Booking.STATUS_CHOICES, verbose_name='Статус')
+    total_cost = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Общая стоимость')
+    created_at = models.DateTimeField(verbose_name='Дата создания')
+    is_archived = models.BooleanField(verbose_name='В архиве')
+    
+    def __str__(self):
+        return f"Бронирование #{self.id} на {self.event_date} {self.event_time}"
+    
+    class Meta:
+        managed = False
+        db_table = 'homepage_bookinghistory'
+        verbose_name = 'Бронирование (с архивом)'
+        verbose_name_plural = 'Бронирования (с архивом)'
+        ordering = ['-created_at']
@@ -0,0 +1,81 @@
+"""
+Разделы личного кабинета: заказы, бронирования и отзывы.
+
+На странице показывается только первая страница каждого раздела,
+следующие подгружаются по курсору (keyset pagination по created_at и
+id), поэтому число запросов и размер ответа не зависят от количества
+записей пользователя. Позиции заказов загружаются одним запросом
+через prefetch_related.
+"""
+from collections import namedtuple
+
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_datetime
+
+from menu.models import Order
+from menu.pagination import decode_cursor, encode_cursor
+
+from .models import Booking, CafeRating
+
+PROFILE_PAGE_SIZE = 10
+
+Section = namedtuple('Section', ['queryset', 'template'])
+
+SECTIONS = {
+    'orders': Section(
+        lambda user: Order.objects.filter(user=user).prefetch_related('items'),
+        'includes/profile_orders.html',
+    ),
+    'bookings': Section(
+        lambda user: Booking.objects.filter(user=user).select_related('room'),
+        'includes/profile_bookings.html',
+    ),
+    'ratings': Section(
+        lambda user: CafeRating.objects.filter(user=user),
+        'includes/profile_ratings.html',
+    ),
+}
+
+
+def parse_cursor(cursor):
+    """Курсор -> (created_at, id), для поврежденного курсора None"""
+    key = decode_cursor(cursor)
+    if key is None or len(key) != 2:
+        return None
+    created_at, pk = key
+    try:
+        created_at = parse_datetime(created_at)
+    except (TypeError, ValueError):
+        return None
+    if created_at is None or not isinstance(pk, int):
+        return None
+    return created_at, pk
+
+
+def section_page(name, user, cursor=None, page_size=PROFILE_PAGE_SIZE):
+    """Возвращает записи раздела после курсора и курсор следующей страницы"""
+    queryset = SECTIONS[name].queryset(user).order_by('-created_at', '-id')
+    after = parse_cursor(cursor)
+    if after is not None:
+        created_at, pk = after
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    # Лишняя запись показывает, есть ли следующая страница, без COUNT(*)
+    rows = list(queryset[:page_size + 1])
+    page = rows[:page_size]
+    next_cursor = None
+    if len(rows) > page_size:
+        last = page[-1]
+        next_cursor = encode_cursor((last.created_at.isoformat(), last.id))
+    return page, next_cursor
+
+
+def section_counts(user):
+    """Количество записей в каждом разделе"""
+    return {name: section.queryset(user).order_by().count() for name, section in SECTIONS.items()}
+
+
+def render_section(name, rows, request=None):
+    """HTML записей раздела для подгрузки на странице"""
+    return render_to_string(SECTIONS[name].template, {'items': rows}, request=request)
@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .availability import interval_days
+from .models import Booking
+from .slots import invalidate_days
+
+INTERVAL_FIELDS = {'event_date', 'event_time', 'event_duration'}
+
+
+@receiver(pre_save, sender=Booking)
+def booking_before_save(sender, instance, update_fields=None, **kwargs):
+    """Запоминает даты бронирования до изменения, чтобы сбросить и их кэш"""
+    instance._previous_days = []
+    if instance.pk is None or (update_fields is not None and not INTERVAL_FIELDS & set(update_fields)):
+        return
+    previous = Booking.objects.filter(pk=instance.pk).values_list('starts_at', 'ends_at').first()
+    if previous is not None:
+        instance._previous_days = interval_days(*previous)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    """Сбрасывает кэш свободного времени для дат бронирования"""
+    days = {*getattr(instance, '_previous_days', ()), *interval_days(instance.starts_at, instance.ends_at)}
+    # Кэш общий для процессов (CACHES), поэтому день сбрасывается для всех.
+    # Повторно - после коммита: другой процесс мог закэшировать день по
+    # данным до фиксации транзакции
+    invalidate_days(days)
+    transaction.on_commit(lambda: invalidate_days(days))
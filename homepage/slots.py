@@ -0,0 +1,178 @@
+"""
+Свободное время для бронирований на много дней вперед.
+
+Для каждого дня и каждого зала один раз вычисляются свободные промежутки
+рабочего времени: бронирования зала сортируются по началу и проходятся
+одним проходом (sweep line), промежутки между занятыми интервалами -
+свободны. Бронирование без зала занимает все залы. Промежутки дня
+кэшируются (ключ на дату) и сбрасываются сигналами при сохранении или
+удалении бронирования этой даты. Дни, которых нет в кэше, загружаются
+одним запросом на весь диапазон.
+
+Кэш общий для всех процессов (CACHES, проверка menu.W001): бронирование,
+созданное в одном процессе, сразу убирает время из календаря и
+подсказок всех остальных.
+
+Из промежутков получаются допустимые времена начала для заданной
+продолжительности: шаг SLOT_STEP минут (как у поля времени в форме),
+начало не позже 20:00, окончание не позже 22:00. Время свободно, если
+оно свободно хотя бы в одном зале, вмещающем гостей.
+"""
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .availability import overlapping
+from .models import Room
+
+OPENING_TIME = time(10, 0)
+CLOSING_TIME = time(22, 0)
+LAST_START_TIME = time(20, 0)
+# Шаг времени начала, минут
+SLOT_STEP = 30
+# На сколько дней вперед можно бронировать
+BOOKING_WINDOW_DAYS = 90
+SUGGESTIONS_COUNT = 3
+CACHE_TIMEOUT = 60 * 60
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def to_time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+OPENING = to_minutes(OPENING_TIME)
+CLOSING = to_minutes(CLOSING_TIME)
+LAST_START = to_minutes(LAST_START_TIME)
+
+
+def cache_key(day):
+    return f'homepage:free_gaps:{day.isoformat()}'
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def free_gaps(intervals):
+    """Свободные промежутки рабочего дня между занятыми интервалами (минуты от полуночи)"""
+    gaps = []
+    cursor = OPENING
+    for start, end in sorted(intervals):
+        if cursor >= CLOSING:
+            break
+        if start > cursor:
+            gaps.append((cursor, min(start, CLOSING)))
+        cursor = max(cursor, end)
+    if cursor < CLOSING:
+        gaps.append((cursor, CLOSING))
+    return gaps
+
+
+def load_gaps(days, room_ids):
+    """Свободные промежутки залов по датам {дата: {зал: промежутки}}: из кэша, остальные - одним запросом"""
+    cached = cache.get_many([cache_key(day) for day in days])
+    gaps = {}
+    for day in days:
+        day_gaps = cached.get(cache_key(day))
+        # Кэш, собранный до появления нового зала, пересчитывается
+        if day_gaps is not None and all(room_id in day_gaps for room_id in room_ids):
+            gaps[day] = day_gaps
+    missing = [day for day in days if day not in gaps]
+    if not missing:
+        return gaps
+
+    intervals = {day: {room_id: [] for room_id in room_ids} for day in missing}
+    bookings = overlapping(day_start(min(missing)), day_start(max(missing) + timedelta(days=1)))
+    for room_id, starts_at, ends_at in bookings.order_by().values_list('room_id', 'starts_at', 'ends_at'):
+        # Бронирование после полуночи занимает и следующий день
+        day = timezone.localdate(starts_at)
+        while day_start(day) < ends_at:
+            if day in intervals:
+                midnight = day_start(day)
+                interval = (
+                    int((starts_at - midnight).total_seconds() // 60),
+                    int(-(-(ends_at - midnight).total_seconds() // 60)),
+                )
+                rooms = intervals[day]
+                for room_intervals in (rooms.values() if room_id is None else [rooms.get(room_id, [])]):
+                    room_intervals.append(interval)
+            day += timedelta(days=1)
+
+    computed = {
+        day: {room_id: free_gaps(room_intervals) for room_id, room_intervals in rooms.items()}
+        for day, rooms in intervals.items()
+    }
+    cache.set_many({cache_key(day): day_gaps for day, day_gaps in computed.items()}, CACHE_TIMEOUT)
+    gaps.update(computed)
+    return gaps
+
+
+def free_starts(gaps, duration, not_before=0):
+    """Времена начала (минуты от полуночи), при которых мероприятие помещается в промежуток"""
+    starts = []
+    length = duration * 60
+    for gap_start, gap_end in gaps:
+        first = max(gap_start, not_before)
+        first = -(-first // SLOT_STEP) * SLOT_STEP
+        last = min(gap_end - length, LAST_START)
+        starts.extend(range(first, last + 1, SLOT_STEP))
+    return starts
+
+
+def booking_window(today=None):
+    """Первая и последняя дата, доступные для бронирования"""
+    today = today or timezone.localdate()
+    return today, today + timedelta(days=BOOKING_WINDOW_DAYS)
+
+
+def free_slots(start, days, duration, guests_count=None):
+    """Свободные времена начала по дням: [(дата, [time, ...]), ...] в пределах окна бронирования"""
+    first_day, last_day = booking_window()
+    start = max(start, first_day)
+    dates = [start + timedelta(days=offset) for offset in range(days) if start + timedelta(days=offset) <= last_day]
+    if not dates:
+        return []
+
+    rooms = list(Room.objects.filter(is_active=True).values_list('id', 'capacity'))
+    suitable = [room_id for room_id, capacity in rooms if not guests_count or capacity >= guests_count]
+    gaps = load_gaps(dates, [room_id for room_id, _ in rooms])
+    now = timezone.localtime()
+    result = []
+    for day in dates:
+        # Сегодня - только время, которое еще не прошло
+        not_before = to_minutes(now) + 1 if day == now.date() else 0
+        starts = set()
+        for room_id in suitable:
+            starts.update(free_starts(gaps[day][room_id], duration, not_before))
+        result.append((day, [to_time(minutes) for minutes in sorted(starts)]))
+    return result
+
+
+def suggest_slots(event_date, event_time, duration, guests_count=None, count=SUGGESTIONS_COUNT):
+    """
+    Ближайшие свободные времена: сначала в тот же день (по близости к
+    выбранному времени), затем в следующие дни (по порядку)
+    """
+    requested = to_minutes(event_time)
+    suggestions = []
+    for day, starts in free_slots(event_date, 1, duration, guests_count):
+        nearest = sorted(starts, key=lambda start: (abs(to_minutes(start) - requested), start))
+        suggestions.extend((day, start) for start in nearest[:count])
+
+    day = event_date + timedelta(days=1)
+    _, last_day = booking_window()
+    while len(suggestions) < count and day <= last_day:
+        # Следующие дни - неделями, один запрос на неделю
+        for slot_day, starts in free_slots(day, 7, duration, guests_count):
+            suggestions.extend((slot_day, start) for start in starts[:count - len(suggestions)])
+        day += timedelta(days=7)
+    return suggestions[:count]
+
+
+def invalidate_days(days):
+    cache.delete_many([cache_key(day) for day in days])
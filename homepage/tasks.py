@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+
+def send_password_reset_email(user_id, email, domain):
+    """
+    Письмо со ссылкой для сброса пароля (фоновая задача).
+    Токен и текст письма создаются здесь, в аргументах задачи ссылки нет
+    """
+    user = get_user_model().objects.filter(id=user_id, email=email).first()
+    if user is None:
+        return
+    
+    token = default_token_generator.make_token(user)
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    reset_url = f"http://{domain}/reset/{uid}/{token}/"
+    
+    message = render_to_string('registration/password_reset_email.html', {
+        'user': user,
+        'reset_url': reset_url,
+        'domain': domain,
+        'protocol': 'http',
+    })
+    send_mail(
+        subject='Сброс пароля для Детского кафе "Радуга"',
+        message=message,
+        from_email='noreply@cafe-rainbow.ru',
+        recipient_list=[email],
+    )
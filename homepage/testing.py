@@ -0,0 +1,23 @@
+"""Помощники тестов, общие для приложений"""
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+# Тесты, которые очищают кэш (cache.clear()), работают с кэшем в памяти
+# процесса, чтобы не очистить общий Redis из REDIS_URL
+local_cache = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+})
+
+
+def count_queries(client, url, method='get', data=None, status=200):
+    """
+    Количество запросов к БД при запросе страницы. Потоковый ответ
+    читается целиком, чтобы учесть и его запросы
+    """
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url, data)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    if response.status_code != status:
+        raise AssertionError(f'{method.upper()} {url}: статус {response.status_code}, ожидался {status}')
+    return len(context.captured_queries)
@@ -1,7 +1,12 @@
-from django.test import TestCase
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import CafeRating, Booking
+from .models import CafeRating, Booking, Room
+from .testing import count_queries, local_cache
 from datetime import datetime, timedelta, date
 
 User = get_user_model()
@@ -117,4 +122,632 @@ class HomepageTests(TestCase):
             phone='+79997654321'
         )
         
-        self.assertFalse(booking2.is_time_slot_available())
\ No newline at end of file
+        self.assertFalse(booking2.is_time_slot_available())
+
+class GeneratedFieldsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='gen@example.com', password='testpass123')
+    
+    def create_rating(self, **scores):
+        fields = {
+            'food_quality': 5, 'service_quality': 5, 'atmosphere': 5, 'cleanliness': 5,
+            'food_taste': 'good', 'portion_size': 'normal', 'speed_service': 'fast',
+            'staff_friendliness': 'good', 'price_quality': 'good', 'child_friendly': 'good',
+            'recommend': 'yes',
+        }
+        fields.update(scores)
+        return CafeRating.objects.create(user=self.user, **fields)
+    
+    def test_overall_rating_follows_queryset_update(self):
+        """Общая оценка пересчитывается БД, в том числе при QuerySet.update"""
+        low = self.create_rating(food_quality=1, service_quality=2)
+        high = self.create_rating()
+        
+        CafeRating.objects.filter(id=low.id).update(atmosphere=1, cleanliness=1)
+        
+        low.refresh_from_db()
+        self.assertEqual(low.overall_rating, 1.25)
+        self.assertEqual(
+            list(CafeRating.objects.order_by('-overall_rating').values_list('id', flat=True)),
+            [high.id, low.id]
+        )
+    
+    def test_booking_end_time_and_cost(self):
+        """Время окончания и стоимость бронирования вычисляются в БД"""
+        booking = Booking.objects.create(
+            user=self.user,
+            event_date=date.today() + timedelta(days=3),
+            event_time=datetime.strptime('21:00', '%H:%M').time(),
+            event_duration=4,
+            guests_count=5,
+            event_type='holiday',
+            phone='+79991234567',
+            services=['animator', 'cake']
+        )
+        self.assertEqual(booking.event_end_time, datetime.strptime('01:00', '%H:%M').time())
+        self.assertEqual(booking.total_cost, 12500)
+        
+        Booking.objects.filter(id=booking.id).update(event_duration=2)
+        booking.refresh_from_db()
+        self.assertEqual(booking.event_end_time, datetime.strptime('23:00', '%H:%M').time())
+        self.assertEqual(booking.base_cost, 5000)
+        self.assertEqual(booking.total_cost, 7500)
+    
+    def test_booking_interval_after_update(self):
+        """Интервал бронирования вычисляется в БД и верен после QuerySet.update()"""
+        from .models import event_interval
+        day = date.today() + timedelta(days=3)
+        booking = Booking.objects.create(
+            user=self.user, event_date=day, event_time=datetime.strptime('21:00', '%H:%M').time(),
+            event_duration=4, guests_count=5, event_type='holiday', phone='+79991234567',
+        )
+        self.assertEqual((booking.starts_at, booking.ends_at), event_interval(day, booking.event_time, 4))
+        
+        Booking.objects.filter(id=booking.id).update(event_time=datetime.strptime('10:00', '%H:%M').time())
+        booking.refresh_from_db()
+        self.assertEqual((booking.starts_at, booking.ends_at), event_interval(day, booking.event_time, 4))
+    
+    def test_booking_phone_and_services_after_bulk_changes(self):
+        """Нормализованный телефон и стоимость услуг пересчитываются при update() и bulk_update()"""
+        from django.db.models import F
+        booking = Booking.objects.create(
+            user=self.user, event_date=date.today() + timedelta(days=3), event_time=datetime.strptime('12:00', '%H:%M').time(),
+            event_duration=2, guests_count=5, event_type='holiday', phone='+79991234567',
+        )
+        
+        Booking.objects.filter(id=booking.id).update(phone='8 (999) 765-43-21', services=['cake'])
+        booking.refresh_from_db()
+        self.assertEqual(booking.phone_normalized, '+79997654321')
+        self.assertEqual(booking.total_cost, 2 * Booking.HOURLY_RATE + 1500)
+        
+        booking.phone, booking.services = '+7 999 111-22-33', []
+        Booking.objects.bulk_update([booking], ['phone', 'services'])
+        booking.refresh_from_db()
+        self.assertEqual(booking.phone_normalized, '+79991112233')
+        self.assertEqual(booking.services_cost, 0)
+        
+        # Выражение нельзя нормализовать в Python
+        with self.assertRaises(ValueError):
+            Booking.objects.update(phone=F('comments'))
+    
+    def test_order_item_totals_aggregate_in_sql(self):
+        """Сумма позиций заказа агрегируется в БД"""
+        from django.db.models import Sum
+        from menu.models import Order, OrderItem
+        order = Order.objects.create(customer_name='Ольга', customer_phone='+79991234567', total_price=0)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_title='Сок', product_price=90, quantity=3),
+            OrderItem(order=order, product_title='Пирог', product_price='210.50', quantity=2),
+        ])
+        
+        total = OrderItem.objects.filter(order=order).aggregate(total=Sum('line_total'))['total']
+        self.assertEqual(total, 691)
+        top = OrderItem.objects.filter(order=order).order_by('-line_total').first()
+        self.assertEqual(top.product_title, 'Пирог')
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='adminpass123')
+        self.client.login(email='admin@example.com', password='adminpass123')
+    
+    def add_rows(self, count):
+        from contact_form.models import ContactMessage
+        from menu.models import Order, OrderItem, Product
+        for i in range(count):
+            number = User.objects.count()
+            user = User.objects.create_user(email=f'user{number}@example.com', username=f'user{number}', password='x')
+            product = Product.objects.create(title=f'Блюдо {user.id}', description='Описание', price=100)
+            order = Order.objects.create(user=user, customer_name='Клиент', customer_phone='+79991234567', total_price=100)
+            OrderItem.objects.create(order=order, product=product, product_title=product.title, product_price=100, quantity=1)
+            Booking.objects.create(
+                user=user, event_date=date.today() + timedelta(days=i + 1),
+                event_time=datetime.strptime('12:00', '%H:%M').time(),
+                guests_count=5, event_type='birthday', phone='+79991234567'
+            )
+            CafeRating.objects.create(
+                user=user, food_quality=5, service_quality=4, atmosphere=5, cleanliness=4,
+                food_taste='good', portion_size='normal', speed_service='fast',
+                staff_friendliness='good', price_quality='good', child_friendly='good', recommend='yes'
+            )
+            ContactMessage.objects.create(user=user, name='Гость', email=user.email, message='Вопрос')
+    
+    def test_changelists_run_fixed_number_of_queries(self):
+        """Количество запросов списка в админке не зависит от количества строк"""
+        urls = [
+            reverse(f'admin:{name}_changelist')
+            for name in (
+                'menu_order', 'menu_orderitem', 'menu_product', 'homepage_booking',
+                'homepage_caferating', 'contact_form_contactmessage', 'homepage_customuser',
+            )
+        ]
+        self.add_rows(2)
+        small = {url: count_queries(self.client, url) for url in urls}
+        self.add_rows(8)
+        large = {url: count_queries(self.client, url) for url in urls}
+        self.assertEqual(small, large)
+    
+    def test_input_filters(self):
+        """Фильтры по заказу и пользователю - поле ввода, а не список всех значений"""
+        from menu.models import OrderItem
+        self.add_rows(3)
+        item = OrderItem.objects.order_by('id').first()
+        
+        response = self.client.get(reverse('admin:menu_orderitem_changelist'), {'order_id': item.order_id})
+        self.assertEqual(list(response.context['cl'].result_list), [item])
+        self.assertContains(response, 'name="order_id"')
+        
+        response = self.client.get(reverse('admin:menu_orderitem_changelist'), {'order_id': 'abc'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+        
+        booking = Booking.objects.order_by('id').last()
+        response = self.client.get(reverse('admin:homepage_booking_changelist'), {'user_email': booking.user.email.upper()})
+        self.assertEqual(list(response.context['cl'].result_list), [booking])
+    
+    def read_export(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+    
+    def test_export_action_streams_orders_with_items(self):
+        """Выгрузка заказов - по строке на позицию с полями заказа"""
+        import csv
+        from menu.models import Order, OrderItem
+        self.add_rows(3)
+        order = Order.objects.order_by('id').first()
+        OrderItem.objects.create(order=order, product_title='Сок', product_price=50, quantity=3)
+        
+        response = self.client.post(reverse('admin:menu_order_changelist'), {
+            'action': 'export_csv',
+            '_selected_action': [order.id, Order.objects.order_by('id').last().id],
+        })
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(self.read_export(response).lstrip('\ufeff').splitlines()))
+        self.assertEqual(len(rows), 4)
+        self.assertIn('Email пользователя', rows[0])
+        self.assertEqual([row[0] for row in rows[1:3]], [str(order.id)] * 2)
+        self.assertEqual(rows[2][-1], '150.00')
+    
+    def test_csv_export_escapes_formulas(self):
+        """Текст, который редактор таблиц выполнит как формулу, выгружается с апострофом"""
+        from .admin_export import csv_cell
+        self.assertEqual(csv_cell('=HYPERLINK("http://evil")'), '\'=HYPERLINK("http://evil")')
+        self.assertEqual([csv_cell(value) for value in ('+7 900', '-1', '@cmd', 'Сок')], ["'+7 900", "'-1", "'@cmd", 'Сок'])
+        self.assertEqual(csv_cell(['=1+1', 'Сок']), "'=1+1, Сок")
+        self.assertEqual(csv_cell(-5), -5)
+    
+    def test_export_endpoint_uses_changelist_filters(self):
+        """Адрес выгрузки учитывает фильтры списка, запросов не больше при росте таблицы"""
+        import json
+        self.add_rows(2)
+        url = reverse('admin:homepage_booking_export')
+        booking = Booking.objects.order_by('id').last()
+        
+        response = self.client.get(url, {'format': 'json', 'user_email': booking.user.email})
+        records = json.loads(self.read_export(response))
+        self.assertEqual([record['ID'] for record in records], [booking.id])
+        self.assertEqual(records[0]['Email пользователя'], booking.user.email)
+        
+        small = count_queries(self.client, url, data={'format': 'csv'})
+        self.add_rows(8)
+        self.assertEqual(count_queries(self.client, url, data={'format': 'csv'}), small)
+        
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
+
+
+class ProfilePageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='profile@example.com', username='profile', password='testpass123')
+        self.client.login(email='profile@example.com', password='testpass123')
+    
+    def add_orders(self, count, user=None):
+        from menu.models import Order, OrderItem, Product
+        product = Product.objects.create(title=f'Блюдо {Product.objects.count()}', description='Описание', price=100)
+        for _ in range(count):
+            order = Order.objects.create(user=user or self.user, customer_name='Клиент', customer_phone='+79991234567', total_price=200)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, product_title=product.title, product_price=100, quantity=1)
+                for _ in range(2)
+            ])
+    
+    def order_ids(self, html):
+        import re
+        return [int(number) for number in re.findall(r'Заказ #(\d+)', html)]
+    
+    def test_profile_runs_fixed_number_of_queries(self):
+        """Количество запросов профиля не зависит от количества заказов"""
+        url = reverse('homepage:profile')
+        self.add_orders(2)
+        small = count_queries(self.client, url)
+        self.add_orders(25)
+        self.assertEqual(count_queries(self.client, url), small)
+        
+        response = self.client.get(url)
+        self.assertContains(response, 'Мои заказы (27)')
+        self.assertEqual(len(self.order_ids(response.content.decode())), 10)
+    
+    def test_sections_load_by_cursor(self):
+        """Страницы раздела идут подряд без повторов, в том числе при одинаковом времени"""
+        from menu.models import Order
+        self.add_orders(23)
+        self.add_orders(3, user=User.objects.create_user(email='other@example.com', username='other', password='x'))
+        # Одинаковое время создания - порядок определяется по id
+        Order.objects.filter(user=self.user).update(created_at=Order.objects.first().created_at)
+        expected = list(Order.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True))
+        
+        response = self.client.get(reverse('homepage:profile'))
+        ids = self.order_ids(response.content.decode())
+        cursor = response.context['orders_next']
+        url = reverse('homepage:profile_section', args=['orders'])
+        while cursor:
+            data = self.client.get(url, {'cursor': cursor}).json()
+            ids += self.order_ids(data['html'])
+            cursor = data['next_cursor']
+        self.assertEqual(ids, expected)
+    
+    def test_section_endpoint_errors(self):
+        """Поврежденный курсор дает первую страницу, неизвестный раздел - 404"""
+        self.add_orders(3)
+        url = reverse('homepage:profile_section', args=['orders'])
+        data = self.client.get(url, {'cursor': 'garbage'}).json()
+        self.assertEqual(len(self.order_ids(data['html'])), 3)
+        self.assertIsNone(data['next_cursor'])
+        
+        response = self.client.get(reverse('homepage:profile_section', args=['payments']))
+        self.assertEqual(response.status_code, 404)
+        
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+
+class BookingAvailabilityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='slots@example.com', password='testpass123', username='slots')
+        self.day = date.today() + timedelta(days=7)
+    
+    def book(self, time, duration=2, day=None, status='pending'):
+        return Booking.objects.create(
+            user=self.user, event_date=day or self.day, event_time=datetime.strptime(time, '%H:%M').time(),
+            event_duration=duration, guests_count=5, event_type='birthday', phone='+79991234567', status=status,
+        )
+    
+    def test_overlap_rules(self):
+        """Соседние интервалы не пересекаются, отмененные бронирования время не занимают"""
+        from .availability import is_available
+        self.book('14:00')
+        self.book('18:00', status='cancelled')
+        self.assertFalse(is_available(self.day, datetime.strptime('15:00', '%H:%M').time(), 2))
+        self.assertFalse(is_available(self.day, datetime.strptime('13:00', '%H:%M').time(), 4))
+        self.assertTrue(is_available(self.day, datetime.strptime('12:00', '%H:%M').time(), 2))
+        self.assertTrue(is_available(self.day, datetime.strptime('16:00', '%H:%M').time(), 3))
+    
+    def test_interval_past_midnight(self):
+        """Мероприятие после полуночи занимает утро следующего дня"""
+        from .availability import is_available
+        booking = self.book('20:00', duration=8)
+        self.assertEqual(booking.ends_at - booking.starts_at, timedelta(hours=8))
+        next_day = self.day + timedelta(days=1)
+        self.assertFalse(is_available(next_day, datetime.strptime('03:00', '%H:%M').time(), 2))
+        self.assertTrue(is_available(next_day, datetime.strptime('04:00', '%H:%M').time(), 2))
+    
+    def test_check_is_single_query(self):
+        """Проверка - один запрос, независимо от числа бронирований на дату"""
+        from .availability import is_available
+        for hour in (10, 12, 14, 16, 18):
+            self.book(f'{hour}:00')
+        with self.assertNumQueries(1):
+            self.assertFalse(is_available(self.day, datetime.strptime('11:00', '%H:%M').time(), 1))
+    
+    def test_create_booking_rejects_taken_slot(self):
+        """Создание бронирования и форма используют общую проверку"""
+        from .availability import SlotTaken, reserve
+        from .forms import BookingForm
+        self.book('14:00')
+        self.client.login(email='slots@example.com', password='testpass123')
+        response = self.client.post(reverse('homepage:create_booking'), {
+            'eventDate': self.day.isoformat(), 'eventTime': '15:00', 'eventDuration': 2,
+            'guestsCount': 5, 'eventType': 'birthday', 'phone': '+79991234567',
+        }, content_type='application/json')
+        self.assertIn('eventTime', response.json()['errors'])
+        self.assertEqual(Booking.objects.count(), 1)
+        
+        with self.assertRaises(SlotTaken):
+            reserve(Booking(
+                user=self.user, event_date=self.day, event_time=datetime.strptime('13:00', '%H:%M').time(),
+                event_duration=2, guests_count=5, event_type='birthday', phone='+79991234567',
+            ))
+        form = BookingForm(data={
+            'event_date': self.day, 'event_time': '15:00', 'event_duration': 2,
+            'guests_count': 5, 'event_type': 'birthday', 'phone': '+79991234567',
+        })
+        # Занятость проверяет только Booking.clean(): одна ошибка, один запрос
+        with self.assertNumQueries(1):
+            self.assertFalse(form.is_valid())
+        self.assertEqual(len(form.non_field_errors()), 1)
+        self.assertIn('Выбранное время уже занято', form.non_field_errors()[0])
+
+
+@local_cache
+class BookingCalendarTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(email='calendar@example.com', password='testpass123', username='calendar')
+        self.day = date.today() + timedelta(days=7)
+    
+    def book(self, time, duration=2, day=None):
+        return Booking.objects.create(
+            user=self.user, event_date=day or self.day, event_time=datetime.strptime(time, '%H:%M').time(),
+            event_duration=duration, guests_count=5, event_type='birthday', phone='+79991234567',
+        )
+    
+    def calendar(self, **params):
+        params = {'start': self.day.isoformat(), 'days': 1, 'duration': 2, **params}
+        return self.client.get(reverse('homepage:booking_calendar'), params).json()
+    
+    def test_free_gaps_sweep(self):
+        """Свободные промежутки между пересекающимися и соседними интервалами"""
+        from .slots import free_gaps
+        # 12:00-14:00, 13:00-15:00, 15:00-16:00, 21:00-23:00 (в минутах)
+        intervals = [(780, 900), (720, 840), (900, 960), (1260, 1380)]
+        self.assertEqual(free_gaps(intervals), [(600, 720), (960, 1260)])
+        # Мероприятие прошлого вечера, закончившееся утром
+        self.assertEqual(free_gaps([(-240, 240)]), [(600, 1320)])
+    
+    def test_calendar_slots(self):
+        """Свободные времена начала с шагом 30 минут, окончание не позже 22:00"""
+        self.book('14:00')
+        slots = self.calendar()['days'][0]['slots']
+        self.assertIn('12:00', slots)
+        self.assertIn('16:00', slots)
+        self.assertNotIn('12:30', slots)
+        self.assertNotIn('15:30', slots)
+        self.assertEqual(slots[-1], '20:00')
+        self.assertEqual(self.calendar(duration=4)['days'][0]['slots'][-1], '18:00')
+        self.assertEqual(
+            self.client.get(reverse('homepage:booking_calendar'), {'duration': 9}).status_code, 400
+        )
+    
+    def test_calendar_window_is_cached(self):
+        """Все 90 дней - запрос залов и один запрос бронирований, повторно - бронирования из кэша"""
+        from .slots import free_slots
+        self.book('10:00', day=date.today() + timedelta(days=3))
+        with self.assertNumQueries(2):
+            days = free_slots(date.today(), 200, 2)
+        self.assertEqual(len(days), 91)
+        self.assertNotIn('10:00', [start.strftime('%H:%M') for start in days[3][1]])
+        with self.assertNumQueries(1):
+            free_slots(date.today(), 200, 2)
+        
+        self.assertIn('14:00', self.calendar()['days'][0]['slots'])
+        self.book('14:00')
+        self.assertNotIn('14:00', self.calendar()['days'][0]['slots'])
+    
+    def test_day_cached_before_commit_is_reset(self):
+        """День, закэшированный другим процессом до коммита бронирования, сбрасывается после коммита"""
+        from django.core.cache import cache
+        from .slots import cache_key, free_slots
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book('14:00')
+            # Другой процесс еще не видит бронирование и кэширует день в общем кэше
+            cache.set(cache_key(self.day), {})
+        self.assertIsNone(cache.get(cache_key(self.day)))
+        self.assertNotIn('14:00', [start.strftime('%H:%M') for start in free_slots(self.day, 1, 2)[0][1]])
+    
+    def test_suggestions_for_taken_time(self):
+        """Для занятого времени предлагаются ближайшие свободные"""
+        self.book('10:00', duration=8)
+        self.book('18:00', duration=4)
+        response = self.client.post(reverse('homepage:check_availability'), {
+            'eventDate': self.day.isoformat(), 'eventTime': '14:00', 'eventDuration': 2,
+        }, content_type='application/json').json()
+        self.assertFalse(response['available'])
+        next_day = (self.day + timedelta(days=1)).isoformat()
+        self.assertEqual(response['suggestions'], [
+            {'date': next_day, 'time': '10:00'},
+            {'date': next_day, 'time': '10:30'},
+            {'date': next_day, 'time': '11:00'},
+        ])
+
+
+class BookingLockTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='locks@example.com', password='testpass123', username='locks')
+        self.day = date.today() + timedelta(days=7)
+    
+    def make_booking(self, time, duration=2):
+        return Booking(
+            user=self.user, event_date=self.day, event_time=datetime.strptime(time, '%H:%M').time(),
+            event_duration=duration, guests_count=5, event_type='birthday', phone='+79991234567',
+        )
+    
+    def test_reserve_locks_every_date_of_interval(self):
+        """Мероприятие после полуночи блокирует и следующую дату"""
+        from .availability import reserve
+        from .models import BookingDateLock
+        reserve(self.make_booking('20:00', duration=6))
+        self.assertEqual(
+            list(BookingDateLock.objects.values_list('date', flat=True).order_by('date')),
+            [self.day, self.day + timedelta(days=1)],
+        )
+        reserve(self.make_booking('12:00'))
+        self.assertEqual(BookingDateLock.objects.count(), 2)
+    
+    def test_double_bookings(self):
+        """Пересекающиеся бронирования, сохраненные в обход проверки, находятся"""
+        from .availability import double_bookings
+        from .models import event_interval
+        first = self.make_booking('12:00', duration=3)
+        first.save()
+        second = self.make_booking('14:00')
+        second.save()
+        self.make_booking('16:00').save()
+        start, end = event_interval(self.day, datetime.strptime('00:00', '%H:%M').time(), 24)
+        self.assertEqual(double_bookings(start, end), [(first.id, second.id)])
+
+
+class BookingLoadTestCommandTests(TransactionTestCase):
+    def test_load_test_reports_no_double_bookings(self):
+        """Нагрузочный тест создает бронирования через HTTP и убирает за собой"""
+        Room.objects.get_or_create(name='Большой зал', defaults={'capacity': 50})
+        out = StringIO()
+        database = str(connection.settings_dict['NAME'])
+        call_command('load_test_bookings', requests=6, concurrency=1, users=2, database=database, stdout=out)
+        self.assertIn('Двойных бронирований: 0', out.getvalue())
+        self.assertIn('ошибок: 0', out.getvalue())
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(User.objects.filter(email__startswith='loadtest-').exists())
+    
+    def test_requires_explicit_database_without_debug(self):
+        """Без DEBUG тест не запускается, пока база не указана явно"""
+        from django.core.management.base import CommandError
+        with self.assertRaises(CommandError):
+            call_command('load_test_bookings', requests=1, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command('load_test_bookings', requests=1, database='production', stdout=StringIO())
+        self.assertFalse(User.objects.filter(email__startswith='loadtest-').exists())
+    
+    def test_cleanup_after_failure(self):
+        """Тестовые пользователи удаляются, даже если тест прервался"""
+        from unittest import mock
+        from .management.commands.load_test_bookings import Command
+        with mock.patch.object(Command, 'run_requests', side_effect=KeyboardInterrupt), self.assertRaises(KeyboardInterrupt):
+            call_command('load_test_bookings', users=2, database=str(connection.settings_dict['NAME']), stdout=StringIO())
+        self.assertFalse(User.objects.filter(email__startswith='loadtest-').exists())
+
+
+@local_cache
+class RoomAllocationTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(email='rooms@example.com', password='testpass123', username='rooms')
+        self.day = date.today() + timedelta(days=7)
+        self.hall = Room.objects.get(name='Большой зал')
+        self.small = Room.objects.create(name='Малый зал', capacity=10)
+        self.medium = Room.objects.create(name='Средний зал', capacity=25)
+    
+    def make_booking(self, time, guests, duration=2):
+        return Booking(
+            user=self.user, event_date=self.day, event_time=datetime.strptime(time, '%H:%M').time(),
+            event_duration=duration, guests_count=guests, event_type='birthday', phone='+79991234567',
+        )
+    
+    def test_best_fit_allocation(self):
+        """Бронированию достается самый маленький свободный зал, который вмещает гостей"""
+        from .availability import SlotTaken, reserve
+        self.assertEqual(reserve(self.make_booking('14:00', 8)).room, self.small)
+        self.assertEqual(reserve(self.make_booking('15:00', 8)).room, self.medium)
+        self.assertEqual(reserve(self.make_booking('14:00', 20)).room, self.hall)
+        with self.assertRaises(SlotTaken):
+            reserve(self.make_booking('14:00', 5))
+        # Малый зал освобождается в 16:00
+        self.assertEqual(reserve(self.make_booking('16:00', 5)).room, self.small)
+    
+    def test_availability_by_capacity(self):
+        """Время свободно, если есть свободный зал нужной вместимости; проверка - один запрос"""
+        from .availability import is_available, reserve
+        reserve(self.make_booking('14:00', 40))
+        start = datetime.strptime('15:00', '%H:%M').time()
+        with self.assertNumQueries(1):
+            self.assertTrue(is_available(self.day, start, 2, 20))
+        self.assertFalse(is_available(self.day, start, 2, 30))
+        
+        # Бронирование без зала занимает все залы
+        booking = self.make_booking('18:00', 5)
+        booking.save()
+        self.assertIsNone(booking.room)
+        self.assertFalse(is_available(self.day, datetime.strptime('19:00', '%H:%M').time(), 1, 5))
+    
+    def test_calendar_per_room(self):
+        """Календарь учитывает вместимость залов"""
+        from .availability import reserve
+        reserve(self.make_booking('14:00', 40))
+        url = reverse('homepage:booking_calendar')
+        params = {'start': self.day.isoformat(), 'days': 1, 'duration': 2}
+        small_party = self.client.get(url, {**params, 'guests': 5}).json()['days'][0]['slots']
+        big_party = self.client.get(url, {**params, 'guests': 30}).json()['days'][0]['slots']
+        self.assertIn('14:00', small_party)
+        self.assertNotIn('14:00', big_party)
+        self.assertIn('16:00', big_party)
+    
+    def test_clean_assigns_room(self):
+        """В админке зал без выбора назначается автоматически, занятый зал не принимается"""
+        from django.core.exceptions import ValidationError
+        from .availability import reserve
+        reserve(self.make_booking('14:00', 8))
+        booking = self.make_booking('14:00', 8)
+        booking.full_clean(exclude=['services'])
+        self.assertEqual(booking.room, self.medium)
+        
+        booking.room = self.small
+        with self.assertRaises(ValidationError):
+            booking.full_clean(exclude=['services'])
+
+
+@local_cache
+class BookingSweepTests(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user(email='sweep@example.com', password='testpass123', username='sweep')
+    
+    def make_booking(self, day, status='confirmed', time='12:00'):
+        return Booking.objects.create(
+            user=self.user, event_date=day, event_time=time, guests_count=5,
+            event_type='birthday', phone='+79991234567', services=['cake'], status=status,
+        )
+    
+    def test_complete_finished_in_batches(self):
+        """Прошедшие действующие бронирования завершаются одним UPDATE на пачку, кэш их дней сбрасывается"""
+        from django.core.cache import cache
+        from .lifecycle import complete_finished
+        from .slots import cache_key
+        day = date.today() + timedelta(days=5)
+        finished = [self.make_booking(day, time=time) for time in ('10:00', '13:00')]
+        finished.append(self.make_booking(day, status='pending', time='16:00'))
+        cancelled = self.make_booking(day, status='cancelled')
+        upcoming = self.make_booking(day + timedelta(days=1))
+        cache.set(cache_key(day), {'cached': True})
+        
+        from django.utils import timezone
+        now = timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=20)
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(complete_finished(now, batch_size=2), 3)
+        self.assertEqual(len([q for q in context.captured_queries if q['sql'].startswith('UPDATE')]), 2)
+        self.assertEqual(
+            set(Booking.objects.filter(status='completed').values_list('id', flat=True)),
+            {booking.id for booking in finished},
+        )
+        cancelled.refresh_from_db()
+        upcoming.refresh_from_db()
+        self.assertEqual((cancelled.status, upcoming.status), ('cancelled', 'confirmed'))
+        self.assertIsNone(cache.get(cache_key(day)))
+    
+    def test_archive_old_bookings(self):
+        """Бронирования старше срока хранения переносятся в архив, представление истории видит все"""
+        from .lifecycle import sweep_bookings
+        from .models import ArchivedBooking, BookingHistory
+        old = self.make_booking(date.today() - timedelta(days=400))
+        old_cancelled = self.make_booking(date.today() - timedelta(days=500), status='cancelled')
+        recent = self.make_booking(date.today() - timedelta(days=10))
+        
+        self.assertEqual(sweep_bookings(batch_size=1), (2, 2))
+        self.assertEqual(list(Booking.objects.values_list('id', flat=True)), [recent.id])
+        archived = ArchivedBooking.objects.get(id=old.id)
+        self.assertEqual((archived.status, archived.total_cost, archived.services), ('completed', old.total_cost, ['cake']))
+        self.assertEqual(ArchivedBooking.objects.get(id=old_cancelled.id).status, 'cancelled')
+        self.assertEqual(
+            dict(BookingHistory.objects.values_list('id', 'is_archived')),
+            {old.id: True, old_cancelled.id: True, recent.id: False},
+        )
+    
+    def test_sweep_command(self):
+        """Команда сообщает, сколько бронирований завершено и перенесено"""
+        self.make_booking(date.today() - timedelta(days=3))
+        out = StringIO()
+        call_command('sweep_bookings', retention_days=1, stdout=out)
+        self.assertIn('Завершено бронирований: 1', out.getvalue())
+        self.assertIn('Перенесено в архив: 1', out.getvalue())
+        self.assertFalse(Booking.objects.exists())
@@ -8,6 +8,7 @@ urlpatterns = [
     path('', views.index, name='home'),
     path('rate/', views.rate_cafe, name='rate_cafe'),
     path('profile/', views.profile, name='profile'),
+    path('profile/<str:section>/', views.profile_section, name='profile_section'),
     path('reviews/', views.reviews, name='reviews'),
     path('register/', views.register_user, name='register'),
     path('login/', views.login_user, name='login'),
@@ -16,6 +17,7 @@ urlpatterns = [
     # Бронирование мероприятий
     path('booking/create/', views.create_booking, name='create_booking'),
     path('booking/check_availability/', views.check_time_availability, name='check_availability'),
+    path('booking/calendar/', views.booking_calendar, name='booking_calendar'),
     path('booking/<int:booking_id>/cancel/', views.cancel_booking, name='cancel_booking'),
     
     # Восстановление пароля (используем свои вьюшки)
@@ -5,19 +5,25 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from .models import CafeRating
 from menu.models import Order
+from menu.phones import validate_phone_number
 from .forms import CustomUserCreationForm, CustomAuthenticationForm
 from django.contrib.auth import update_session_auth_hash
 from .forms import CustomPasswordChangeForm, CustomPasswordResetForm, CustomSetPasswordForm
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.mail import send_mail
-from django.utils.encoding import force_bytes, force_str
+from django.db import transaction
+from django.db.models import Avg
+from jobs.queue import enqueue
+from django.utils.encoding import force_str
 from django.contrib.auth.tokens import default_token_generator
-from django.template.loader import render_to_string
 from .models import Booking
+from .tasks import send_password_reset_email
 from .forms import BookingForm
-from django.http import JsonResponse
+from .availability import SlotTaken, is_available, largest_capacity, reserve
+from .slots import BOOKING_WINDOW_DAYS, booking_window, free_slots, suggest_slots
+from .profile_feed import SECTIONS, render_section, section_counts, section_page
+from django.http import Http404, JsonResponse
 import json
 from datetime import datetime, date, timedelta
 
@@ -28,8 +34,7 @@ def index(request):
     ratings = CafeRating.objects.all().order_by('-created_at')[:10]
 
     # Для формы бронирования
-    today = date.today()
-    max_date = today + timedelta(days=90)
+    today, max_date = booking_window()
 
     context = {
         'ratings': ratings,
@@ -73,59 +78,20 @@ def rate_cafe(request):
     
     return render(request, 'rate_cafe.html')
 
-@login_required
-def profile(request):
-    if request.method == 'POST':
-        # Обновление профиля
-        new_username = request.POST.get('username', '').strip()
-        if new_username:
-            request.user.username = new_username
-            request.user.save()
-            messages.success(request, 'Имя пользователя успешно обновлено!')
-        return redirect('homepage:profile')
-    
-    # Получаем отзывы, заказы и бронирования
-    user_ratings = CafeRating.objects.filter(user=request.user).order_by('-created_at')
-    user_orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    user_bookings = Booking.objects.filter(user=request.user).order_by('-created_at')
-    
-    # Получаем элементы заказов с продуктами
-    orders_with_items = []
-    for order in user_orders:
-        items = OrderItem.objects.filter(order=order).select_related('product')
-        orders_with_items.append({
-            'order': order,
-            'items': items
-        })
-    
-    context = {
-        'user': request.user,
-        'ratings': user_ratings,
-        'orders_with_items': orders_with_items,  # Используем новую структуру
-        'bookings': user_bookings
-    }
-    
-    return render(request, 'profile.html', context)
 
 def reviews(request):
     # Показываем все отзывы
     ratings = CafeRating.objects.all().order_by('-created_at')
     
-    # Рассчитываем средние оценки
-    if ratings:
-        total_food = sum(r.food_quality for r in ratings)
-        total_service = sum(r.service_quality for r in ratings)
-        total_atmosphere = sum(r.atmosphere for r in ratings)
-        total_cleanliness = sum(r.cleanliness for r in ratings)
-        
-        avg_ratings = {
-            'food_quality': total_food / len(ratings),
-            'service_quality': total_service / len(ratings),
-            'atmosphere': total_atmosphere / len(ratings),
-            'cleanliness': total_cleanliness / len(ratings),
-            'overall': (total_food + total_service + total_atmosphere + total_cleanliness) / (len(ratings) * 4)
-        }
-    else:
+    # Рассчитываем средние оценки одним запросом в БД
+    avg_ratings = CafeRating.objects.aggregate(
+        food_quality=Avg('food_quality'),
+        service_quality=Avg('service_quality'),
+        atmosphere=Avg('atmosphere'),
+        cleanliness=Avg('cleanliness'),
+        overall=Avg('overall_rating'),
+    )
+    if avg_ratings['overall'] is None:
         avg_ratings = None
     
     context = {
@@ -203,36 +169,11 @@ def password_reset(request):
             associated_users = User.objects.filter(email=email)
             
             if associated_users.exists():
+                domain = get_current_site(request).domain
                 for user in associated_users:
-                    # Генерируем токен и uid
-                    token = default_token_generator.make_token(user)
-                    uid = urlsafe_base64_encode(force_bytes(user.pk))
-                    
-                    # Получаем текущий сайт
-                    current_site = get_current_site(request)
-                    domain = current_site.domain
-                    
-                    # Создаем ссылку для сброса пароля
-                    reset_url = f"http://{domain}/reset/{uid}/{token}/"
-                    
-                    # Создаем email сообщение
-                    subject = 'Сброс пароля для Детского кафе "Радуга"'
-                    
-                    message = render_to_string('registration/password_reset_email.html', {
-                        'user': user,
-                        'reset_url': reset_url,
-                        'domain': domain,
-                        'protocol': 'http',
-                    })
-                    
-                    # Отправляем email
-                    send_mail(
-                        subject,
-                        message,
-                        'noreply@cafe-rainbow.ru',
-                        [email],
-                        fail_silently=False,
-                    )
+                    # Письмо отправляет фоновая задача (manage.py run_workers). Токен
+                    # создается в ней, чтобы ссылка не хранилась в аргументах задачи
+                    enqueue(send_password_reset_email, user_id=user.id, email=email, domain=domain)
             
             messages.success(request, 'Инструкции по сбросу пароля отправлены на ваш email.')
             return redirect('homepage:password_reset_done')
@@ -285,12 +226,12 @@ def create_booking(request):
             
             # Валидация телефона
             phone = data.get('phone', '')
-            phone_digits = ''.join(filter(str.isdigit, phone))
+            is_valid_phone, phone_message = validate_phone_number(phone)
             
-            if not phone or len(phone_digits) < 10:
+            if not is_valid_phone:
                 return JsonResponse({
                     'success': False,
-                    'errors': {'phone': [{'message': 'Введите корректный номер телефона (минимум 10 цифр)'}]}
+                    'errors': {'phone': [{'message': phone_message}]}
                 })
             
             # Создаем объект Booking
@@ -307,15 +248,27 @@ def create_booking(request):
                 services=data.get('services', [])
             )
             
-            # Проверяем доступность времени
-            if not booking.is_time_slot_available():
+            capacity = largest_capacity()
+            if booking.guests_count > capacity:
                 return JsonResponse({
                     'success': False,
-                    'errors': {'eventTime': [{'message': 'Выбранное время уже занято. Пожалуйста, выберите другое время.'}]}
+                    'errors': {'guestsCount': [{'message': f'Самый большой зал вмещает {capacity} гостей'}]}
                 })
             
-            # Сохраняем бронирование
-            booking.save()
+            if not 1 <= booking.event_duration <= 8:
+                return JsonResponse({
+                    'success': False,
+                    'errors': {'eventDuration': [{'message': 'Продолжительность - от 1 до 8 часов'}]}
+                })
+            
+            # Проверка времени и сохранение - в одной транзакции
+            try:
+                reserve(booking)
+            except SlotTaken:
+                return JsonResponse({
+                    'success': False,
+                    'errors': {'eventTime': [{'message': 'Выбранное время уже занято. Пожалуйста, выберите другое время.'}]}
+                })
             
             return JsonResponse({
                 'success': True,
@@ -355,6 +308,7 @@ def check_time_availability(request):
             event_date = datetime.strptime(data['eventDate'], '%Y-%m-%d').date()
             event_time = datetime.strptime(data['eventTime'], '%H:%M').time()
             event_duration = int(data.get('eventDuration', 2))
+            guests_count = int(data.get('guestsCount') or 0) or None
             
             # Проверяем рабочее время (10:00 - 22:00)
             if event_time < datetime.strptime('10:00', '%H:%M').time():
@@ -363,15 +317,8 @@ def check_time_availability(request):
                     'message': 'Кафе открывается в 10:00'
                 })
             
-            # Создаем временный объект для проверки
-            booking = Booking(
-                event_date=event_date,
-                event_time=event_time,
-                event_duration=event_duration
-            )
-            
             # Проверяем доступность
-            if booking.is_time_slot_available():
+            if is_available(event_date, event_time, event_duration, guests_count):
                 # Проверяем, не слишком ли поздно
                 check_time = datetime.combine(event_date, event_time)
                 end_time = check_time + timedelta(hours=event_duration)
@@ -380,7 +327,8 @@ def check_time_availability(request):
                 if end_time > cafe_closes:
                     return JsonResponse({
                         'available': False,
-                        'message': f'Кафе закрывается в 22:00. Мероприятие закончится в {end_time.time().strftime("%H:%M")}'
+                        'message': f'Кафе закрывается в 22:00. Мероприятие закончится в {end_time.time().strftime("%H:%M")}',
+                        'suggestions': slot_suggestions(event_date, event_time, event_duration, guests_count),
                     })
                 
                 return JsonResponse({
@@ -390,7 +338,8 @@ def check_time_availability(request):
             else:
                 return JsonResponse({
                     'available': False,
-                    'message': 'Выбранное время занято. Попробуйте другое время'
+                    'message': 'Выбранное время занято. Попробуйте другое время',
+                    'suggestions': slot_suggestions(event_date, event_time, event_duration, guests_count),
                 })
                 
         except Exception as e:
@@ -401,6 +350,39 @@ def check_time_availability(request):
     
     return JsonResponse({'available': False, 'message': 'Неверный метод запроса'})
 
+def slot_suggestions(event_date, event_time, event_duration, guests_count=None):
+    """Ближайшие свободные времена для ответа проверки доступности"""
+    if not 1 <= event_duration <= 8:
+        return []
+    return [
+        {'date': day.isoformat(), 'time': start.strftime('%H:%M')}
+        for day, start in suggest_slots(event_date, event_time, event_duration, guests_count)
+    ]
+
+def booking_calendar(request):
+    """Свободные времена начала на несколько дней вперед (AJAX)"""
+    first_day, last_day = booking_window()
+    try:
+        start = date.fromisoformat(request.GET.get('start') or first_day.isoformat())
+        days = int(request.GET.get('days', 14))
+        duration = int(request.GET.get('duration', 2))
+        guests_count = int(request.GET.get('guests') or 0) or None
+    except ValueError:
+        return JsonResponse({'error': 'Неверные параметры'}, status=400)
+    if not 1 <= duration <= 8:
+        return JsonResponse({'error': 'Продолжительность - от 1 до 8 часов'}, status=400)
+    days = min(max(days, 1), BOOKING_WINDOW_DAYS + 1)
+    
+    return JsonResponse({
+        'duration': duration,
+        'first_date': first_day.isoformat(),
+        'last_date': last_day.isoformat(),
+        'days': [
+            {'date': day.isoformat(), 'slots': [start.strftime('%H:%M') for start in starts]}
+            for day, starts in free_slots(start, days, duration, guests_count)
+        ],
+    })
+
 # Обновить функцию profile для отображения бронирований
 @login_required
 def profile(request):
@@ -413,20 +395,28 @@ def profile(request):
             messages.success(request, 'Имя пользователя успешно обновлено!')
         return redirect('homepage:profile')
     
-    # Получаем отзывы, заказы и бронирования
-    user_ratings = CafeRating.objects.filter(user=request.user).order_by('-created_at')
-    user_orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    user_bookings = Booking.objects.filter(user=request.user).order_by('-created_at')
-    
+    # Первые страницы разделов, остальные подгружаются через profile_section
     context = {
         'user': request.user,
-        'ratings': user_ratings,
-        'orders': user_orders,
-        'bookings': user_bookings
+        'counts': section_counts(request.user),
     }
-    
+    for name in SECTIONS:
+        context[name], context[f'{name}_next'] = section_page(name, request.user)
+
     return render(request, 'profile.html', context)
 
+
+@login_required
+def profile_section(request, section):
+    """Следующая страница раздела личного кабинета (JSON)"""
+    if section not in SECTIONS:
+        raise Http404('Раздел не найден')
+    rows, next_cursor = section_page(section, request.user, request.GET.get('cursor'))
+    return JsonResponse({
+        'html': render_section(section, rows, request),
+        'next_cursor': next_cursor,
+    })
+
 @login_required
 def cancel_booking(request, booking_id):
     """Отмена бронирования"""
@@ -434,12 +424,14 @@ def cancel_booking(request, booking_id):
         booking = Booking.objects.get(id=booking_id, user=request.user)
         
         if booking.status == 'pending':
-            booking.status = 'cancelled'
-            booking.save()
-            
-            # Отправляем email уведомление (если настроена отправка)
-            try:
-                send_mail(
+            # Отмена и письмо фиксируются одной транзакцией
+            with transaction.atomic():
+                booking.status = 'cancelled'
+                booking.save()
+                
+                # Email уведомление отправляется фоновой задачей
+                enqueue(
+                    send_mail,
                     subject=f'Отмена бронирования #{booking.id}',
                     message=f'''Бронирование #{booking.id} отменено.
                     
@@ -453,10 +445,7 @@ def cancel_booking(request, booking_id):
 Если у вас есть вопросы, свяжитесь с нами.''',
                     from_email='noreply@cafe-rainbow.ru',
                     recipient_list=[request.user.email],
-                    fail_silently=True,
                 )
-            except:
-                pass  # Игнорируем ошибки отправки email
             
             return JsonResponse({
                 'success': True,
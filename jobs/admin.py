@@ -0,0 +1,20 @@
+from django.contrib import admin
+from django.utils import timezone
+from homepage.admin_helpers import LargeTableAdminMixin
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['id', 'task', 'status', 'attempts', 'run_at', 'created_at', 'finished_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'last_error']
+    # Аргументы не редактируются: задача выполнится с теми, с которыми ее поставили
+    readonly_fields = ['task', 'kwargs', 'locked_by', 'locked_at', 'created_at', 'finished_at', 'last_error']
+    actions = ['retry_jobs']
+    
+    @admin.action(description='Перезапустить выбранные задачи')
+    def retry_jobs(self, request, queryset):
+        updated = queryset.exclude(status=Job.STATUS_RUNNING).update(
+            status=Job.STATUS_PENDING, attempts=0, run_at=timezone.now(), last_error=''
+        )
+        self.message_user(request, f'Перезапущено задач: {updated}')
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jobs.worker import FINISHED_RETENTION, PURGE_BATCH_SIZE, purge_finished_jobs
+
+
+class Command(BaseCommand):
+    help = 'Удаляет выполненные и завершившиеся ошибкой задачи старше срока хранения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=FINISHED_RETENTION.days,
+            help='Сколько дней хранить завершенные задачи',
+        )
+        parser.add_argument('--batch-size', type=int, default=PURGE_BATCH_SIZE, help='Сколько задач удалять за раз')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('Срок хранения - не меньше 0 дней, размер пачки - не меньше 1')
+        deleted = purge_finished_jobs(timedelta(days=options['days']), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено задач: {deleted}'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from jobs.worker import work
+
+
+class Command(BaseCommand):
+    help = 'Запускает обработчик фоновых задач (письма, уведомления о заказах и сообщениях)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Количество потоков')
+        parser.add_argument('--batch-size', type=int, default=None, help='Сколько задач забирать за раз (по умолчанию 2 на поток)')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Пауза между опросами пустой очереди, секунд')
+        parser.add_argument('--once', action='store_true', help='Выполнить готовые задачи и завершиться')
+
+    def handle(self, *args, **options):
+        try:
+            processed = work(
+                threads=options['threads'],
+                batch_size=options['batch_size'],
+                once=options['once'],
+                poll_interval=options['poll_interval'],
+            )
+        except KeyboardInterrupt:
+            self.stdout.write('Обработчик остановлен')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {processed}'))
@@ -0,0 +1,31 @@
+"""
+Постановка фоновых задач в очередь.
+
+Задача - строка в таблице Job, поэтому она фиксируется вместе с
+окружающей транзакцией: если транзакция откатится, задача не будет
+выполнена. Выполняют задачи обработчики (manage.py run_workers).
+"""
+from django.utils import timezone
+
+from .models import Job
+
+
+def task_path(func):
+    """Путь импорта функции, по которому обработчик ее вызовет"""
+    if isinstance(func, str):
+        return func
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *, delay=None, max_attempts=5, **kwargs):
+    """
+    Ставит вызов func(**kwargs) в очередь.
+    Аргументы должны сериализоваться в JSON (ID объектов, строки, числа).
+    """
+    run_at = timezone.now() + delay if delay else timezone.now()
+    return Job.objects.create(
+        task=task_path(func),
+        kwargs=kwargs,
+        run_at=run_at,
+        max_attempts=max_attempts,
+    )
@@ -0,0 +1,128 @@
+from datetime import timedelta
+from io import StringIO
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from .models import Job
+from .queue import enqueue
+from .worker import claim_jobs, run_job
+
+CALLS = []
+
+
+def record_call(value):
+    CALLS.append(value)
+
+
+def always_fail():
+    raise RuntimeError('сбой')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+    
+    def test_enqueue_is_part_of_transaction(self):
+        """Задача из откаченной транзакции не попадает в очередь"""
+        try:
+            with transaction.atomic():
+                enqueue(record_call, value=1)
+                raise ValueError
+        except ValueError:
+            pass
+        
+        self.assertFalse(Job.objects.exists())
+        job = enqueue(record_call, value=2)
+        self.assertEqual(job.task, 'jobs.tests.record_call')
+    
+    def test_claim_and_run(self):
+        """Задача забирается один раз и выполняется"""
+        enqueue(record_call, value='ok')
+        enqueue(record_call, value='later', delay=timedelta(hours=1))
+        
+        jobs = claim_jobs('test', 10)
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(claim_jobs('other', 10), [])
+        
+        self.assertTrue(run_job(jobs[0]))
+        self.assertEqual(CALLS, ['ok'])
+        job = Job.objects.get(id=jobs[0].id)
+        self.assertEqual(job.status, Job.STATUS_DONE)
+        self.assertEqual(job.attempts, 1)
+    
+    def test_retry_with_backoff_then_fail(self):
+        """Ошибка откладывает повтор, после исчерпания попыток задача помечается ошибкой"""
+        enqueue(always_fail, max_attempts=2)
+        
+        job = claim_jobs('test', 1)[0]
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_PENDING)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertIn('RuntimeError', job.last_error)
+        
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        job = claim_jobs('test', 1)[0]
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+    
+    def test_contact_form_enqueues_report(self):
+        """Форма контактов не печатает в консоль в запросе, а ставит задачу"""
+        response = self.client.post(reverse('contacts:contacts'), {
+            'name': 'Анна',
+            'email': 'anna@example.com',
+            'message': 'Хочу заказать торт на день рождения',
+        })
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Job.objects.filter(task='contact_form.tasks.report_contact_message').exists())
+
+    
+    def test_password_reset_job_has_no_link(self):
+        """Ссылка сброса пароля создается при выполнении задачи и не хранится в ее аргументах"""
+        import json
+        from django.contrib.auth import get_user_model
+        user = get_user_model().objects.create_user(email='reset@example.com', username='reset', password='testpass123')
+        self.client.post(reverse('homepage:password_reset'), {'email': 'reset@example.com'})
+        
+        job = Job.objects.get()
+        self.assertEqual(job.task, 'homepage.tasks.send_password_reset_email')
+        self.assertEqual(set(job.kwargs), {'user_id', 'email', 'domain'})
+        self.assertNotIn('reset/', json.dumps(job.kwargs))
+        
+        self.assertTrue(run_job(claim_jobs('test', 1)[0]))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('/reset/', mail.outbox[0].body)
+        self.assertEqual(mail.outbox[0].to, [user.email])
+    
+    def test_purge_finished_jobs(self):
+        """Удаляются только завершенные задачи старше срока хранения"""
+        from .worker import purge_finished_jobs
+        old = timezone.now() - timedelta(days=8)
+        for status in (Job.STATUS_DONE, Job.STATUS_FAILED):
+            Job.objects.filter(id=enqueue(record_call, value=status).id).update(status=status, finished_at=old)
+        recent = enqueue(record_call, value='recent')
+        Job.objects.filter(id=recent.id).update(status=Job.STATUS_DONE, finished_at=timezone.now())
+        pending = enqueue(record_call, value='pending')
+        
+        self.assertEqual(purge_finished_jobs(batch_size=1), 2)
+        self.assertEqual(set(Job.objects.values_list('id', flat=True)), {recent.id, pending.id})
+
+
+class RunWorkersCommandTests(TransactionTestCase):
+    def test_run_workers_once(self):
+        """Команда выполняет готовые задачи в пуле потоков и завершается"""
+        enqueue('django.core.mail.send_mail', subject='Тест', message='Текст',
+                from_email='noreply@cafe-rainbow.ru', recipient_list=['guest@example.com'])
+        out = StringIO()
+        
+        call_command('run_workers', once=True, threads=2, stdout=out)
+        
+        self.assertIn('Выполнено задач: 1', out.getvalue())
+        self.assertEqual(Job.objects.get().status, Job.STATUS_DONE)
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,157 @@
+"""
+Обработчик фоновых задач.
+
+Задачи забираются пачками. На PostgreSQL используется
+SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько обработчиков не
+ждут друг друга и не получают одну задачу дважды. На SQLite, где
+блокировки строк нет, задача закрепляется условным UPDATE по статусу
+с уникальной меткой пачки. Задачи выполняются в пуле потоков, при
+ошибке повторяются с экспоненциальной задержкой.
+"""
+import logging
+import random
+import socket
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE = 10  # секунд
+BACKOFF_MAX = 60 * 60
+# Задача в работе дольше этого срока считается брошенной упавшим обработчиком
+LOCK_TIMEOUT = timedelta(minutes=10)
+# Сколько хранятся выполненные и завершившиеся ошибкой задачи (purge_jobs)
+FINISHED_RETENTION = timedelta(days=7)
+PURGE_BATCH_SIZE = 1000
+
+
+def backoff_delay(attempts):
+    """Задержка перед повтором: 10с, 20с, 40с... со случайным разбросом"""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def release_stale_jobs():
+    """Возвращает в очередь задачи, брошенные упавшими обработчиками"""
+    return Job.objects.filter(
+        status=Job.STATUS_RUNNING,
+        locked_at__lt=timezone.now() - LOCK_TIMEOUT,
+    ).update(status=Job.STATUS_PENDING, locked_by='', locked_at=None)
+
+
+def purge_finished_jobs(retention=FINISHED_RETENTION, batch_size=PURGE_BATCH_SIZE):
+    """Удаляет пачками завершенные задачи старше срока хранения, возвращает их количество"""
+    finished = Job.objects.filter(
+        status__in=[Job.STATUS_DONE, Job.STATUS_FAILED],
+        finished_at__lt=timezone.now() - retention,
+    )
+    deleted = 0
+    while True:
+        ids = list(finished.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += Job.objects.filter(id__in=ids).delete()[0]
+
+
+def claim_jobs(worker_id, limit):
+    """Забирает до limit готовых к запуску задач"""
+    now = timezone.now()
+    token = f'{worker_id}:{uuid.uuid4().hex[:8]}'
+    pending = Job.objects.filter(status=Job.STATUS_PENDING, run_at__lte=now).order_by('run_at', 'id')
+
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(pending.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+        else:
+            ids = list(pending.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        # Условие по статусу не даст двум обработчикам закрепить одну задачу
+        Job.objects.filter(id__in=ids, status=Job.STATUS_PENDING).update(
+            status=Job.STATUS_RUNNING,
+            locked_by=token,
+            locked_at=now,
+            attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(id__in=ids, locked_by=token, status=Job.STATUS_RUNNING).order_by('run_at', 'id'))
+
+
+def run_job(job):
+    """Выполняет задачу и записывает результат"""
+    try:
+        func = import_string(job.task)
+        func(**job.kwargs)
+    except Exception as e:
+        error = ''.join(traceback.format_exception(e))
+        if job.attempts < job.max_attempts:
+            logger.warning('Задача #%s (%s) завершилась ошибкой, повтор: %s', job.id, job.task, e)
+            Job.objects.filter(id=job.id).update(
+                status=Job.STATUS_PENDING,
+                run_at=timezone.now() + backoff_delay(job.attempts),
+                locked_by='',
+                locked_at=None,
+                last_error=error,
+            )
+        else:
+            logger.error('Задача #%s (%s) не выполнена после %s попыток: %s', job.id, job.task, job.attempts, e)
+            Job.objects.filter(id=job.id).update(
+                status=Job.STATUS_FAILED,
+                finished_at=timezone.now(),
+                last_error=error,
+            )
+        return False
+    else:
+        Job.objects.filter(id=job.id).update(status=Job.STATUS_DONE, finished_at=timezone.now())
+        return True
+
+
+def run_in_thread(job):
+    # У каждого потока пула свое соединение с БД
+    close_old_connections()
+    try:
+        return run_job(job)
+    finally:
+        close_old_connections()
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{uuid.uuid4().hex[:6]}'
+
+
+def run_batch(pool, worker_id, batch_size):
+    """Забирает и выполняет одну пачку задач, возвращает количество задач"""
+    jobs = claim_jobs(worker_id, batch_size)
+    list(pool.map(run_in_thread, jobs))
+    return len(jobs)
+
+
+def work(threads=4, batch_size=None, once=False, poll_interval=1.0, worker_id=None):
+    """
+    Цикл обработчика. once=True - выполнить готовые задачи и завершиться.
+    Возвращает количество выполненных задач.
+    """
+    worker_id = worker_id or default_worker_id()
+    batch_size = batch_size or threads * 2
+    processed = 0
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='jobs') as pool:
+        release_stale_jobs()
+        while True:
+            count = run_batch(pool, worker_id, batch_size)
+            processed += count
+            if count:
+                continue
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            release_stale_jobs()
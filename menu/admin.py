@@ -1,45 +1,71 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Product, Order, OrderItem
+from homepage.admin_export import ExportMixin
+from homepage.admin_helpers import InputFilter, LargeTableAdminMixin, PhoneSearchMixin, UserEmailFilter
+from .models import Product, Order, OrderItem, DeliveryZone, DeliveryBand
+from .images import thumbnail_for
+
+class OrderIdFilter(InputFilter):
+    title = 'номеру заказа'
+    parameter_name = 'order_id'
+    lookup = 'order_id'
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
     readonly_fields = ['product_title', 'product_price', 'quantity']
+    autocomplete_fields = ['product']
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ExportMixin, PhoneSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['id', 'user', 'customer_name', 'total_price', 'delivery_method', 'created_at']
-    list_filter = ['delivery_method', 'payment_method', 'created_at']
-    search_fields = ['customer_name', 'customer_phone', 'user__email']
+    list_filter = ['delivery_method', 'payment_method', 'created_at', UserEmailFilter]
+    list_select_related = ['user']
+    search_fields = ['customer_name', 'user__email']
+    phone_search_field = 'customer_phone_normalized'
+    autocomplete_fields = ['user']
     readonly_fields = ['created_at']
     inlines = [OrderItemInline]
+    # Строка выгрузки - позиция заказа вместе с полями заказа
+    export_fields = [
+        'id', 'created_at', ('user__email', 'Email пользователя'), 'customer_name', 'customer_phone',
+        'customer_address', 'payment_method', 'delivery_method', 'delivery_city', 'delivery_distance',
+        'delivery_price', 'total_price', ('items__product_id', 'ID товара'), 'items__product_title',
+        'items__product_price', 'items__quantity', 'items__line_total',
+    ]
+    export_ordering = ('pk', 'items__id')
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ['order', 'product_link', 'product_title', 'product_price', 'quantity', 'get_total']
-    list_filter = ['order']
-    search_fields = ['product_title', 'order__id']
+class OrderItemAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['order_link', 'product_link', 'product_title', 'product_price', 'quantity', 'get_total']
+    list_filter = [OrderIdFilter]
+    list_select_related = ['product']
+    search_fields = ['product_title', '=order__id']
+    autocomplete_fields = ['order', 'product']
     readonly_fields = ['get_total']
     
+    @admin.display(description='Заказ', ordering='order_id')
+    def order_link(self, obj):
+        return format_html('<a href="/admin/menu/order/{}/change/">Заказ #{}</a>', obj.order_id, obj.order_id)
+    
     def product_link(self, obj):
-        if obj.product:
+        if obj.product_id:
             return format_html('<a href="/admin/menu/product/{}/change/">{}</a>', 
-                             obj.product.id, obj.product.title)
+                             obj.product_id, obj.product.title)
         return "—"
     product_link.short_description = 'Товар'
     
+    @admin.display(description='Сумма', ordering='line_total')
     def get_total(self, obj):
-        return f"{obj.get_total()} руб."
-    get_total.short_description = 'Сумма'
+        return f"{obj.line_total} руб."
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['title', 'display_price', 'category', 'display_image', 'is_available', 'created_at']
     list_filter = ['category', 'is_available', 'created_at']
     search_fields = ['title', 'description']
     list_editable = ['is_available']
-    readonly_fields = ['display_image_preview', 'created_at', 'updated_at']
+    readonly_fields = ['display_image_preview', 'protein_grams', 'carbs_grams', 'created_at', 'updated_at']
     
     fieldsets = (
         ('Основная информация', {
@@ -50,7 +76,7 @@ class ProductAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
         ('Пищевая ценность', {
-            'fields': ('ingredients', 'calories', 'protein', 'carbs'),
+            'fields': ('ingredients', 'calories', 'protein', 'carbs', 'protein_grams', 'carbs_grams'),
             'classes': ('collapse',)
         }),
         ('Даты', {
@@ -65,6 +91,9 @@ class ProductAdmin(admin.ModelAdmin):
     display_price.admin_order_field = 'price'
     
     def display_image(self, obj):
+        thumbnail = thumbnail_for(obj)
+        if thumbnail:
+            return format_html('<img src="{}" width="50" height="50" style="border-radius: 5px; object-fit: cover;" loading="lazy" />', thumbnail['smallest'])
         if obj.image:
             return format_html('<img src="{}" width="50" height="50" style="border-radius: 5px;" />', obj.image)
         return "Нет изображения"
@@ -85,4 +114,16 @@ class ProductAdmin(admin.ModelAdmin):
     class Media:
         css = {
             'all': ('admin/css/product_admin.css',)
-        }
\ No newline at end of file
+        }
+
+class DeliveryBandInline(admin.TabularInline):
+    model = DeliveryBand
+    extra = 0
+
+@admin.register(DeliveryZone)
+class DeliveryZoneAdmin(admin.ModelAdmin):
+    list_display = ['name', 'key', 'base_price', 'price_per_km', 'free_from', 'is_default', 'is_active', 'sort_order']
+    list_editable = ['base_price', 'price_per_km', 'free_from', 'is_active', 'sort_order']
+    prepopulated_fields = {'key': ['name']}
+    readonly_fields = ['updated_at']
+    inlines = [DeliveryBandInline]
@@ -0,0 +1,193 @@
+"""
+Каталог товаров в машиночитаемом виде для киосков и мобильного приложения.
+
+Товары отдаются потоком (NDJSON или JSON) через StreamingHttpResponse,
+queryset читается через .iterator(), поэтому память не растет с
+размером каталога. Поддерживаются выбор полей (?fields=id,title,price)
+и синхронизация изменений (?updated_since=<ISO дата>).
+
+Расчет доставки для многих адресов одним запросом - delivery_quote.
+"""
+import json
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .delivery import get_tariffs
+from .models import Product
+
+# Публичное имя поля -> поле модели
+CATALOG_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'full_description': 'full_description',
+    'price': 'price',
+    'category': 'category',
+    'image': 'image',
+    'ingredients': 'ingredients_list',
+    'calories': 'calories',
+    'protein': 'protein_grams',
+    'carbs': 'carbs_grams',
+    'is_available': 'is_available',
+    'updated_at': 'updated_at',
+}
+
+DEFAULT_FIELDS = ['id', 'title', 'description', 'price', 'category', 'image', 'is_available', 'updated_at']
+
+CHUNK_SIZE = 500
+MAX_QUOTES = 1000
+
+
+class CatalogEncoder(DjangoJSONEncoder):
+    """Decimal отдаем числом, как и цены в остальных JSON ответах"""
+
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return float(o)
+        return super().default(o)
+
+
+def encode_row(row, fields):
+    return json.dumps(
+        {name: row[CATALOG_FIELDS[name]] for name in fields},
+        cls=CatalogEncoder,
+        ensure_ascii=False,
+    )
+
+
+def stream_ndjson(rows, fields):
+    buffer = []
+    for row in rows:
+        buffer.append(encode_row(row, fields))
+        if len(buffer) >= 100:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+    if buffer:
+        yield '\n'.join(buffer) + '\n'
+
+
+def stream_json(rows, fields, generated_at):
+    yield '{"products": ['
+    first = True
+    buffer = []
+    for row in rows:
+        buffer.append(encode_row(row, fields))
+        if len(buffer) >= 100:
+            yield ('' if first else ',') + ','.join(buffer)
+            first = False
+            buffer = []
+    if buffer:
+        yield ('' if first else ',') + ','.join(buffer)
+    yield '], "generated_at": %s}' % json.dumps(generated_at, cls=CatalogEncoder)
+
+
+@require_GET
+def catalog_feed(request):
+    """Потоковая выгрузка каталога"""
+    output_format = request.GET.get('format', 'ndjson')
+    if output_format not in ('ndjson', 'json'):
+        return JsonResponse({'error': 'Параметр format должен быть ndjson или json'}, status=400)
+
+    fields = DEFAULT_FIELDS
+    if request.GET.get('fields'):
+        fields = list(dict.fromkeys(field.strip() for field in request.GET['fields'].split(',') if field.strip()))
+        unknown = [field for field in fields if field not in CATALOG_FIELDS]
+        if unknown or not fields:
+            return JsonResponse({
+                'error': 'Неизвестные поля',
+                'unknown_fields': unknown,
+                'allowed_fields': list(CATALOG_FIELDS),
+            }, status=400)
+
+    products = Product.objects.all()
+    updated_since = request.GET.get('updated_since')
+    if updated_since:
+        # Незакодированный '+' в смещении часового пояса приходит пробелом
+        try:
+            since = parse_datetime(updated_since.replace(' ', '+'))
+        except ValueError:
+            # Формат верный, но такой даты нет (2024-02-30)
+            since = None
+        if since is None:
+            return JsonResponse({'error': 'Параметр updated_since должен быть датой в формате ISO 8601'}, status=400)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since, timezone.get_current_timezone())
+        # При синхронизации отдаем и снятые с продажи товары,
+        # чтобы клиент мог скрыть их у себя
+        products = products.filter(updated_at__gt=since)
+    else:
+        products = products.filter(is_available=True)
+
+    # Метка времени до начала выборки - клиент передаст ее в следующий updated_since
+    generated_at = timezone.now()
+    rows = (
+        products.order_by('id')
+        .values(*{CATALOG_FIELDS[field] for field in fields})
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+    if output_format == 'json':
+        response = StreamingHttpResponse(
+            stream_json(rows, fields, generated_at),
+            content_type='application/json; charset=utf-8',
+        )
+    else:
+        response = StreamingHttpResponse(
+            stream_ndjson(rows, fields),
+            content_type='application/x-ndjson; charset=utf-8',
+        )
+    response['X-Catalog-Generated-At'] = generated_at.isoformat()
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def quote_price(tariffs, address, city, distance, subtotal):
+    """Цена по адресу (None, если адрес не распознан) или по городу и расстоянию"""
+    if address:
+        quote = tariffs.quote_address(address, subtotal)
+        return quote.price if quote is not None else None
+    return tariffs.quote(city, distance, subtotal)
+
+
+# Расчет цены не меняет данных, поэтому CSRF не нужен (запросы киосков и приложения)
+@csrf_exempt
+@require_POST
+def delivery_quote(request):
+    """
+    Цены доставки для списка запросов:
+    {"quotes": [{"city": "moscow", "distance": 10, "subtotal": 1500}, ...]}
+    Вместо города и расстояния можно передать адрес: {"address": "..."},
+    для нераспознанного адреса цена - null
+    -> {"prices": [450.0, ...], "version": ...}
+    """
+    try:
+        quotes = json.loads(request.body)['quotes']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Ожидается JSON вида {"quotes": [...]}'}, status=400)
+    if not isinstance(quotes, list) or len(quotes) > MAX_QUOTES:
+        return JsonResponse({'error': f'quotes должен быть списком не длиннее {MAX_QUOTES}'}, status=400)
+
+    parsed = []
+    for quote in quotes:
+        if not isinstance(quote, dict):
+            return JsonResponse({'error': 'Каждый запрос - объект с полями city, distance или address, subtotal'}, status=400)
+        subtotal = quote.get('subtotal')
+        try:
+            subtotal = float(subtotal) if subtotal is not None else None
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'subtotal должен быть числом'}, status=400)
+        parsed.append((str(quote.get('address') or ''), str(quote.get('city', '')), quote.get('distance', 0), subtotal))
+
+    # Одна таблица тарифов на весь запрос: все цены из одной версии
+    tariffs = get_tariffs()
+    prices = [
+        quote_price(tariffs, address, city, distance, subtotal)
+        for address, city, distance, subtotal in parsed
+    ]
+    return JsonResponse({'prices': prices, 'version': tariffs.version})
@@ -0,0 +1,405 @@
+"""
+Массовый импорт и экспорт товаров (команды import_products / export_products).
+
+Входной файл читается потоком (CSV, JSON массив или NDJSON), строки
+обрабатываются пачками: для каждой пачки существующие товары загружаются
+одним запросом, вычисляется разница, изменения записываются через
+bulk_create / bulk_update (новые товары на PostgreSQL - через COPY).
+Сигналы при этом не отправляются, поэтому кэш каталога сбрасывается
+один раз в конце.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .catalog import invalidate_catalog
+from .models import Product
+
+IMPORT_FIELDS = [
+    'title', 'description', 'full_description', 'price', 'category', 'image',
+    'ingredients', 'calories', 'protein', 'carbs', 'is_available',
+]
+EXPORT_FIELDS = ['id'] + IMPORT_FIELDS
+
+CATEGORIES = dict(Product.CATEGORY_CHOICES)
+TRUE_VALUES = {'1', 'true', 'yes', 'да', 'y', 't'}
+FALSE_VALUES = {'0', 'false', 'no', 'нет', 'n', 'f'}
+
+DEFAULT_BATCH_SIZE = 1000
+# Обозначение NULL в COPY (без кавычек, см. copy_value)
+COPY_NULL = r'\N'
+
+
+class RowError(Exception):
+    pass
+
+
+# Чтение входных файлов
+
+def detect_format(path):
+    lower = str(path).lower()
+    if lower.endswith('.csv'):
+        return 'csv'
+    if lower.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    return 'json'
+
+
+def iter_csv(stream):
+    for row in csv.DictReader(stream):
+        yield row
+
+
+def iter_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_json_array(stream, chunk_size=64 * 1024):
+    """Читает JSON массив объектов по одному элементу, не загружая файл целиком"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if not buffer and not eof:
+                chunk = stream.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            if not buffer.startswith('['):
+                raise ValueError('Ожидается JSON массив')
+            buffer = buffer[1:]
+            started = True
+            continue
+
+        if buffer.startswith(','):
+            buffer = buffer[1:]
+            continue
+        if buffer.startswith(']'):
+            return
+
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError('Неожиданный конец JSON массива')
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_rows(stream, file_format):
+    if file_format == 'csv':
+        return iter_csv(stream)
+    if file_format == 'ndjson':
+        return iter_ndjson(stream)
+    return iter_json_array(stream)
+
+
+# Приведение значений
+
+def parse_decimal(value, field):
+    try:
+        number = Decimal(str(value).replace(',', '.').strip())
+    except InvalidOperation:
+        raise RowError(f'{field}: "{value}" не является числом')
+    if not number.is_finite() or number < 0:
+        raise RowError(f'{field}: недопустимое значение "{value}"')
+    try:
+        return number.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        # Слишком большое число для точности контекста (1e30)
+        raise RowError(f'{field}: недопустимое значение "{value}"')
+
+
+def check_field(field, value):
+    """
+    Валидаторы поля модели (длина, разрядность, диапазон): значение, которое
+    не поместится в столбец, - ошибка строки, а не ошибка БД на всю пачку
+    """
+    try:
+        Product._meta.get_field(field).run_validators(value)
+    except ValidationError as e:
+        raise RowError(f'{field}: {" ".join(e.messages)}')
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise RowError(f'is_available: "{value}" не является логическим значением')
+
+
+def clean_row(row):
+    """Приводит строку файла к значениям полей модели (только переданные поля)"""
+    values = {}
+    for field in IMPORT_FIELDS:
+        if field not in row:
+            continue
+        value = row[field]
+        if field == 'is_available' and (value is None or str(value).strip() == ''):
+            # Пустое значение - как отсутствующий столбец: у нового товара
+            # остается значение по умолчанию, у существующего - текущее
+            continue
+        if value is None and field not in ('calories', 'price', 'is_available'):
+            value = ''
+        if field == 'price':
+            if value is None:
+                raise RowError('price: цена обязательна')
+            value = parse_decimal(value, field)
+        elif field == 'calories':
+            if value is None or str(value).strip() == '':
+                value = None
+            else:
+                try:
+                    value = int(value)
+                except (TypeError, ValueError):
+                    raise RowError(f'calories: "{value}" не является целым числом')
+        elif field == 'is_available':
+            value = parse_bool(value)
+        elif field == 'category':
+            value = str(value).strip()
+            if value not in CATEGORIES:
+                raise RowError(f'category: неизвестная категория "{value}"')
+        else:
+            value = str(value).strip()
+        check_field(field, value)
+        values[field] = value
+
+    if 'title' in values and not values['title']:
+        raise RowError('title: название не может быть пустым')
+    return values
+
+
+# Импорт
+
+class ImportStats:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.errors = []
+
+
+def get_key(row, values, match_by):
+    if match_by == 'id':
+        raw_id = row.get('id')
+        if raw_id in (None, ''):
+            return None
+        try:
+            return int(raw_id)
+        except (TypeError, ValueError):
+            raise RowError(f'id: "{raw_id}" не является числом')
+    return values.get('title') or None
+
+
+def load_existing(keys, match_by):
+    if not keys:
+        return {}
+    if match_by == 'id':
+        return Product.objects.in_bulk(keys)
+    existing = {}
+    for product in Product.objects.filter(title__in=keys).order_by('id'):
+        existing.setdefault(product.title, product)
+    return existing
+
+
+def copy_value(field, value):
+    """
+    Значение для COPY в формате csv. NULL пишется без кавычек, все остальные
+    значения - в кавычках: обратная косая черта в csv не экранирует, а
+    строку в кавычках PostgreSQL не считает NULL, даже если это текст \\N
+    """
+    if value is None:
+        return COPY_NULL
+    if isinstance(field, models.JSONField):
+        value = json.dumps(value, ensure_ascii=False)
+    elif isinstance(value, bool):
+        value = 't' if value else 'f'
+    else:
+        value = str(field.get_db_prep_save(value, connection))
+    return '"' + value.replace('"', '""') + '"'
+
+
+def copy_rows(products, fields):
+    """Текст для COPY ... FROM STDIN WITH (FORMAT csv)"""
+    buffer = io.StringIO()
+    for product in products:
+        buffer.write(','.join(copy_value(field, getattr(product, field.attname)) for field in fields) + '\n')
+    buffer.seek(0)
+    return buffer
+
+
+def copy_create(products):
+    """Вставка новых товаров через COPY (только PostgreSQL)"""
+    fields = [field for field in Product._meta.concrete_fields if not field.primary_key]
+    buffer = copy_rows(products, fields)
+
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    sql = (
+        f'COPY {connection.ops.quote_name(Product._meta.db_table)} ({columns}) '
+        f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    )
+    with connection.cursor() as cursor:
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'):
+            raw_cursor.copy_expert(sql, buffer)
+        else:
+            with raw_cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def apply_batch(batch, match_by, stats, dry_run, use_copy, report):
+    existing = load_existing([key for _, key, _ in batch if key is not None], match_by)
+
+    now = timezone.now()
+    to_create = []
+    to_update = {}
+    update_fields = set()
+
+    for line, key, values in batch:
+        product = existing.get(key) if key is not None else None
+
+        if product is None:
+            if match_by == 'id' and key is not None:
+                stats.errors.append(f'Запись {line}: товар с id={key} не найден')
+                continue
+            missing = [field for field in ('title', 'description', 'price') if field not in values]
+            if missing:
+                stats.errors.append(f'Запись {line}: для нового товара не хватает полей {", ".join(missing)}')
+                continue
+            product = Product(**values)
+            product.update_derived_fields()
+            product.created_at = now
+            product.updated_at = now
+            to_create.append(product)
+            if match_by == 'title':
+                # Повтор того же названия в файле обновит созданный товар
+                existing[values['title']] = product
+            report(f'+ {values["title"]}')
+            continue
+
+        changes = {
+            field: (getattr(product, field), value)
+            for field, value in values.items()
+            if getattr(product, field) != value
+        }
+        if not changes:
+            stats.unchanged += 1
+            continue
+
+        for field, (_, value) in changes.items():
+            setattr(product, field, value)
+        if product.pk is None:
+            # Товар создан ранее в этой же пачке
+            product.update_derived_fields()
+            continue
+        product.update_derived_fields()
+        product.updated_at = now
+        to_update[product.pk] = product
+        update_fields.update(changes)
+        report(f'~ #{product.pk} {product.title}: ' + ', '.join(
+            f'{field} {old!r} -> {new!r}' for field, (old, new) in changes.items()
+        ))
+
+    stats.created += len(to_create)
+    stats.updated += len(to_update)
+    if dry_run:
+        return
+
+    with transaction.atomic():
+        if to_create:
+            if use_copy and connection.vendor == 'postgresql':
+                copy_create(to_create)
+            else:
+                Product.objects.bulk_create(to_create)
+        if to_update:
+            fields = sorted(update_fields) + Product.DERIVED_FIELDS + ['updated_at']
+            Product.objects.bulk_update(list(to_update.values()), fields)
+
+
+def import_products(rows, match_by='id', batch_size=DEFAULT_BATCH_SIZE, dry_run=False, use_copy=True, report=None):
+    """Импортирует строки (словари) и возвращает статистику"""
+    report = report or (lambda message: None)
+    stats = ImportStats()
+    batch = []
+
+    def flush():
+        apply_batch(batch, match_by, stats, dry_run, use_copy, report)
+        batch.clear()
+
+    for line, row in enumerate(rows, start=1):
+        stats.rows += 1
+        try:
+            if not isinstance(row, dict):
+                raise RowError('ожидается объект')
+            values = clean_row(row)
+            batch.append((line, get_key(row, values, match_by), values))
+        except RowError as e:
+            stats.errors.append(f'Запись {line}: {e}')
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    if not dry_run and (stats.created or stats.updated):
+        invalidate_catalog()
+    return stats
+
+
+# Экспорт
+
+def export_rows(queryset=None, chunk_size=DEFAULT_BATCH_SIZE):
+    queryset = queryset if queryset is not None else Product.objects.all()
+    return queryset.order_by('id').values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+
+def write_export(stream, file_format, rows):
+    """Пишет товары в поток, возвращает количество строк"""
+    count = 0
+    if file_format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+
+    def encode(row):
+        return json.dumps(
+            {key: str(value) if isinstance(value, Decimal) else value for key, value in row.items()},
+            ensure_ascii=False,
+        )
+
+    if file_format == 'ndjson':
+        for row in rows:
+            stream.write(encode(row) + '\n')
+            count += 1
+        return count
+
+    stream.write('[')
+    for row in rows:
+        stream.write((',\n' if count else '\n') + encode(row))
+        count += 1
+    stream.write('\n]\n')
+    return count
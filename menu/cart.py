@@ -0,0 +1,112 @@
+"""
+Загрузка товаров корзины одним запросом.
+
+Корзина хранит пары "ID товара -> количество". Все товары корзины
+загружаются одним in_bulk запросом, в том же проходе отбрасываются
+удаленные и снятые с продажи позиции, поэтому количество запросов
+не зависит от размера корзины.
+"""
+from .images import thumbnail_for
+from .models import Product
+
+
+def parse_product_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_products(product_ids):
+    """Словарь ID -> Product для всех переданных ID за один запрос"""
+    ids = {product_id for product_id in map(parse_product_id, product_ids) if product_id is not None}
+    if not ids:
+        return {}
+    return Product.objects.in_bulk(ids)
+
+
+class CartLine:
+    """Позиция корзины с загруженным товаром"""
+
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+
+    @property
+    def product_id(self):
+        return self.product.id
+
+    @property
+    def price(self):
+        return float(self.product.price)
+
+    @property
+    def total(self):
+        return self.price * self.quantity
+
+    def as_dict(self):
+        """Данные позиции в формате шаблона cart.html"""
+        return {
+            'product': {
+                'id': self.product.id,
+                'title': self.product.title,
+                'price': self.price,
+                'image': self.product.image,
+                'thumbnail': thumbnail_for(self.product),
+            },
+            'quantity': self.quantity,
+            'total': self.total,
+        }
+
+    def as_session_item(self):
+        """Данные позиции для сохранения заказа в сессии"""
+        return {
+            'product_id': self.product.id,
+            'product_title': self.product.title,
+            'product_price': self.price,
+            'quantity': self.quantity,
+            'total': self.total,
+        }
+
+
+class HydratedCart:
+    """Корзина с загруженными товарами"""
+
+    def __init__(self, lines, missing, unavailable):
+        self.lines = lines
+        # Ключи корзины, для которых товар не найден
+        self.missing = missing
+        # Ключи корзины со снятыми с продажи товарами
+        self.unavailable = unavailable
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def total_price(self):
+        return sum(line.total for line in self.lines)
+
+    @property
+    def invalid_keys(self):
+        return self.missing + self.unavailable
+
+
+def hydrate_cart(cart):
+    """Загружает товары корзины {ID: количество} одним запросом"""
+    products = load_products(cart)
+    lines = []
+    missing = []
+    unavailable = []
+
+    for key, quantity in cart.items():
+        product = products.get(parse_product_id(key))
+        if product is None:
+            missing.append(key)
+        elif not product.is_available:
+            unavailable.append(key)
+        else:
+            lines.append(CartLine(product, quantity))
+    return HydratedCart(lines, missing, unavailable)
@@ -0,0 +1,283 @@
+"""
+Хранилища корзины.
+
+Корзина больше не хранится в сессии: чтение и изменение корзины не
+перезаписывает строку сессии в БД. Хранилище выбирается настройками
+MENU_CART_ANONYMOUS_BACKEND и MENU_CART_USER_BACKEND:
+
+- SignedCookieCartStore - подписанная cookie (по умолчанию для гостей);
+- CacheCartStore - кэш Django, ключ по пользователю или по cookie гостя;
+- DatabaseCartStore - таблица CartItem с upsert (по умолчанию для пользователей).
+
+Корзина в любом хранилище - словарь {ID товара (строка): количество}.
+При входе гостевая корзина переносится в корзину пользователя.
+"""
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from .models import CartItem, Product
+
+DEFAULT_ANONYMOUS_BACKEND = 'menu.cart_store.SignedCookieCartStore'
+DEFAULT_USER_BACKEND = 'menu.cart_store.DatabaseCartStore'
+
+CART_COOKIE_NAME = 'cart'
+CART_ID_COOKIE_NAME = 'cart_id'
+CART_COOKIE_SALT = 'menu.cart'
+CART_MAX_AGE = settings.SESSION_COOKIE_AGE
+
+# Ограничения, чтобы подписанная cookie не превысила 4 КБ
+MAX_LINES = 100
+MAX_QUANTITY = 99
+
+# Ключ корзины, которая раньше хранилась в сессии
+LEGACY_SESSION_KEY = 'cart'
+
+
+def clean_quantity(quantity):
+    return max(0, min(int(quantity), MAX_QUANTITY))
+
+
+class BaseCartStore:
+    """Общая логика хранилищ: корзина читается один раз за запрос"""
+
+    def __init__(self, request, user=None):
+        self.request = request
+        self.user = user
+        self._items = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def write(self, product_id, quantity):
+        """Сохраняет количество товара, 0 - удаление позиции"""
+        raise NotImplementedError
+
+    def write_many(self, items):
+        for product_id, quantity in items.items():
+            self.write(product_id, quantity)
+
+    def delete_all(self):
+        raise NotImplementedError
+
+    def save(self, response):
+        """Вызывается CartMiddleware перед отправкой ответа"""
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = self.load()
+        return self._items
+
+    def get(self, product_id, default=0):
+        return self.items.get(str(product_id), default)
+
+    def count(self):
+        return sum(self.items.values())
+
+    def __contains__(self, product_id):
+        return str(product_id) in self.items
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def set(self, product_id, quantity):
+        product_id = str(product_id)
+        quantity = clean_quantity(quantity)
+        if quantity == 0:
+            self.remove(product_id)
+            return
+        if product_id not in self.items and len(self.items) >= MAX_LINES:
+            return
+        self.items[product_id] = quantity
+        self.write(product_id, quantity)
+
+    def add(self, product_id, quantity=1):
+        self.set(product_id, self.get(product_id) + quantity)
+
+    def remove(self, product_id):
+        product_id = str(product_id)
+        if self.items.pop(product_id, None) is not None:
+            self.write(product_id, 0)
+
+    def clear(self):
+        if self.items:
+            self._items = {}
+            self.delete_all()
+
+    def merge(self, items):
+        """Добавляет позиции другой корзины (количества складываются)"""
+        changed = {}
+        for product_id, quantity in items.items():
+            product_id = str(product_id)
+            if product_id not in self.items and len(self.items) >= MAX_LINES:
+                continue
+            self.items[product_id] = clean_quantity(self.get(product_id) + quantity)
+            changed[product_id] = self.items[product_id]
+        if changed:
+            self.write_many(changed)
+
+
+class SignedCookieCartStore(BaseCartStore):
+    """Корзина в подписанной cookie вида "ID:количество,ID:количество" """
+
+    def __init__(self, request, user=None):
+        super().__init__(request, user)
+        self.modified = False
+
+    def load(self):
+        value = self.request.get_signed_cookie(CART_COOKIE_NAME, default='', salt=CART_COOKIE_SALT)
+        items = {}
+        for part in value.split(','):
+            product_id, _, quantity = part.partition(':')
+            if product_id.isdigit() and quantity.isdigit() and int(quantity) > 0:
+                items[product_id] = clean_quantity(quantity)
+        return items
+
+    def write(self, product_id, quantity):
+        self.modified = True
+
+    def delete_all(self):
+        self.modified = True
+
+    def save(self, response):
+        if not self.modified:
+            return
+        if self.items:
+            value = ','.join(f'{product_id}:{quantity}' for product_id, quantity in self.items.items())
+            response.set_signed_cookie(
+                CART_COOKIE_NAME, value, salt=CART_COOKIE_SALT, max_age=CART_MAX_AGE,
+                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+            )
+        else:
+            response.delete_cookie(CART_COOKIE_NAME, samesite='Lax')
+
+
+class CacheCartStore(BaseCartStore):
+    """Корзина в кэше Django (гостю выдается cookie с ID корзины)"""
+
+    def __init__(self, request, user=None):
+        super().__init__(request, user)
+        self.new_cart_id = None
+
+    @property
+    def cache_key(self):
+        if self.user is not None:
+            return f'menu:cart:user:{self.user.pk}'
+        cart_id = self.new_cart_id or self.request.get_signed_cookie(
+            CART_ID_COOKIE_NAME, default=None, salt=CART_COOKIE_SALT
+        )
+        if cart_id is None:
+            return None
+        return f'menu:cart:anon:{cart_id}'
+
+    def load(self):
+        key = self.cache_key
+        return dict(cache.get(key, {})) if key else {}
+
+    def store(self):
+        if self.cache_key is None:
+            self.new_cart_id = secrets.token_urlsafe(16)
+        cache.set(self.cache_key, self.items, CART_MAX_AGE)
+
+    def write(self, product_id, quantity):
+        self.store()
+
+    def write_many(self, items):
+        self.store()
+
+    def delete_all(self):
+        if self.cache_key:
+            cache.delete(self.cache_key)
+
+    def save(self, response):
+        if self.new_cart_id:
+            response.set_signed_cookie(
+                CART_ID_COOKIE_NAME, self.new_cart_id, salt=CART_COOKIE_SALT, max_age=CART_MAX_AGE,
+                httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+            )
+
+
+class DatabaseCartStore(BaseCartStore):
+    """Корзина пользователя в таблице CartItem, изменения - через upsert"""
+
+    def load(self):
+        return {
+            str(product_id): quantity
+            for product_id, quantity in CartItem.objects.filter(user=self.user).values_list('product_id', 'quantity')
+        }
+
+    def write(self, product_id, quantity):
+        if quantity:
+            self.write_many({product_id: quantity})
+        else:
+            CartItem.objects.filter(user=self.user, product_id=product_id).delete()
+
+    def write_many(self, items):
+        # Отбрасываем товары, удаленные из каталога
+        existing = set(Product.objects.filter(id__in=[int(product_id) for product_id in items]).values_list('id', flat=True))
+        CartItem.objects.bulk_create(
+            [
+                CartItem(user=self.user, product_id=int(product_id), quantity=quantity)
+                for product_id, quantity in items.items()
+                if int(product_id) in existing
+            ],
+            update_conflicts=True,
+            unique_fields=['user', 'product'],
+            update_fields=['quantity', 'updated_at'],
+        )
+
+    def delete_all(self):
+        CartItem.objects.filter(user=self.user).delete()
+
+
+def get_backend(user):
+    if user is not None:
+        path = getattr(settings, 'MENU_CART_USER_BACKEND', DEFAULT_USER_BACKEND)
+    else:
+        path = getattr(settings, 'MENU_CART_ANONYMOUS_BACKEND', DEFAULT_ANONYMOUS_BACKEND)
+    return import_string(path)
+
+
+def get_store(request, user):
+    """Хранилище корзины для пользователя (None - гость), одно на запрос"""
+    stores = request.__dict__.setdefault('_cart_stores', {})
+    key = user.pk if user is not None else None
+    if key not in stores:
+        stores[key] = get_backend(user)(request, user)
+    return stores[key]
+
+
+def migrate_session_cart(request, store):
+    """Переносит корзину, сохраненную в сессии старой версией, в хранилище"""
+    session = getattr(request, 'session', None)
+    if session is not None and LEGACY_SESSION_KEY in session:
+        legacy = session.pop(LEGACY_SESSION_KEY)
+        if isinstance(legacy, dict):
+            store.merge({key: value for key, value in legacy.items() if str(key).isdigit()})
+
+
+def get_cart(request):
+    """Корзина текущего пользователя"""
+    user = getattr(request, 'user', None)
+    store = get_store(request, user if user is not None and user.is_authenticated else None)
+    if not request.__dict__.get('_cart_session_checked'):
+        request._cart_session_checked = True
+        migrate_session_cart(request, store)
+    return store
+
+
+def save_carts(request, response):
+    for store in request.__dict__.get('_cart_stores', {}).values():
+        store.save(response)
+    return response
+
+
+def merge_anonymous_cart(request, user):
+    """Переносит гостевую корзину в корзину пользователя"""
+    anonymous = get_store(request, None)
+    if anonymous:
+        get_store(request, user).merge(anonymous.items)
+        anonymous.clear()
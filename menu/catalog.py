@@ -0,0 +1,155 @@
+"""
+Кэш каталога меню.
+
+Доступные товары хранятся в памяти процесса в виде готовых словарей
+(тех же, что раньше собирались во вьюшках на каждый запрос). Снимок
+каталога привязан к версии, которая хранится в кэше Django и
+увеличивается сигналами post_save/post_delete модели Product.
+Пока версия не изменилась, чтение меню не делает запросов к БД.
+
+Кэш должен быть общим для всех процессов (CACHES, проверка menu.W001),
+иначе изменение товара увидит только процесс, который его сохранил.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+
+from .images import thumbnail_for
+from .models import Product
+from .pagination import sort_products
+
+CATALOG_VERSION_KEY = 'menu:catalog_version'
+
+_lock = threading.Lock()
+_snapshot = None
+_stats = {'hits': 0, 'misses': 0, 'rebuilds': 0}
+
+
+class CatalogSnapshot:
+    """Неизменяемый снимок каталога для одной версии"""
+
+    def __init__(self, version, products):
+        self.version = version
+        self.products = tuple(products)
+        self.by_id = {product['id']: product for product in self.products}
+        self.category_counts = Counter(product['category'] for product in self.products)
+        self._orderings = {}
+
+        # Валидаторы для условных GET запросов
+        self.last_modified = max((product['updated_at'] for product in self.products), default=None)
+        fingerprint = hashlib.md5()
+        for product in sorted(self.products, key=lambda product: product['id']):
+            fingerprint.update(f"{product['id']}:{product['updated_at'].isoformat()};".encode())
+        self.fingerprint = fingerprint.hexdigest()
+
+    def get_ordering(self, sort, category=None):
+        """Товары категории в порядке сортировки и их ключи (вычисляются один раз на версию)"""
+        ordering = self._orderings.get((sort, category))
+        if ordering is None:
+            products = self.products
+            if category:
+                products = [product for product in products if product['category'] == category]
+            ordering = sort_products(products, sort)
+            self._orderings[(sort, category)] = ordering
+        return ordering
+
+
+def product_to_dict(product):
+    """Собирает словарь товара для шаблонов"""
+    return {
+        'id': product.id,
+        'title': product.title,
+        'description': product.description,
+        'price': float(product.price),
+        'category': product.category,
+        'image': product.image,
+        'thumbnail': thumbnail_for(product),
+        'full_description': product.full_description,
+        'ingredients': product.ingredients_list,
+        'nutrition': product.get_nutrition_info(),
+        'updated_at': product.updated_at
+    }
+
+
+def get_catalog_version():
+    """Возвращает текущую версию каталога"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Начальное значение берем от времени, чтобы после очистки кэша
+        # версия не совпала со старым снимком в другом процессе
+        cache.add(CATALOG_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """Увеличивает версию каталога, снимки старых версий становятся неактуальными"""
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        get_catalog_version()
+        return cache.incr(CATALOG_VERSION_KEY)
+
+
+def _build_snapshot(version):
+    products = Product.objects.filter(is_available=True)
+    return CatalogSnapshot(version, [product_to_dict(product) for product in products])
+
+
+def get_snapshot():
+    """Возвращает снимок каталога, перестраивая его при смене версии"""
+    global _snapshot
+
+    version = get_catalog_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        _stats['hits'] += 1
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshot
+        if snapshot is not None and snapshot.version == version:
+            _stats['hits'] += 1
+            return snapshot
+
+        _stats['misses'] += 1
+        snapshot = _build_snapshot(version)
+        _stats['rebuilds'] += 1
+        _snapshot = snapshot
+        return snapshot
+
+
+def get_available_products():
+    """Список доступных товаров (словари только для чтения)"""
+    return list(get_snapshot().products)
+
+
+def get_product(product_id):
+    """Доступный товар по ID или None"""
+    return get_snapshot().by_id.get(product_id)
+
+
+def invalidate_catalog():
+    """Сбрасывает снимок текущего процесса и увеличивает версию"""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+    bump_catalog_version()
+
+
+def get_catalog_stats():
+    """Счетчики попаданий и промахов кэша каталога"""
+    snapshot = _snapshot
+    return {
+        **_stats,
+        'version': snapshot.version if snapshot else None,
+        'size': len(snapshot.products) if snapshot else 0,
+    }
+
+
+def reset_catalog_stats():
+    for key in _stats:
+        _stats[key] = 0
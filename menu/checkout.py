@@ -0,0 +1,87 @@
+"""
+Оформление заказа.
+
+Корзина оценивается за один проход (товары загружаются одним запросом),
+заказ и все его позиции записываются в одной транзакции через
+bulk_create, поэтому количество запросов не зависит от размера корзины,
+а частично сохраненный заказ невозможен. Вывод сводки заказа в консоль
+ставится в очередь фоновых задач (jobs) в той же транзакции.
+"""
+from django.db import transaction
+
+from jobs.queue import enqueue
+
+from .cart import hydrate_cart
+from .models import Order, OrderItem
+
+
+class CheckoutError(Exception):
+    pass
+
+
+def place_order(cart_items, user=None, **order_fields):
+    """
+    Создает заказ по корзине {ID товара: количество}.
+    Возвращает заказ и корзину с загруженными товарами.
+    """
+    with transaction.atomic():
+        # Цены читаются в той же транзакции, в которой пишется заказ
+        hydrated = hydrate_cart(cart_items)
+        if not hydrated.lines:
+            raise CheckoutError('Все товары в корзине недоступны')
+
+        delivery_price = order_fields.get('delivery_price', 0)
+        order = Order.objects.create(
+            user=user,
+            total_price=hydrated.total_price + delivery_price,
+            **order_fields
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=line.product,
+                product_title=line.product.title,
+                product_price=line.product.price,
+                quantity=line.quantity
+            )
+            for line in hydrated
+        ])
+        enqueue(report_order, order_id=order.id)
+    return order, hydrated
+
+
+def format_order_summary(order):
+    """Текстовая сводка заказа для вывода в консоль"""
+    lines = [
+        "=" * 60,
+        "НОВЫЙ ЗАКАЗ СОХРАНЕН В БАЗУ ДАННЫХ:",
+        f"Номер заказа: #{order.id}",
+        f"Пользователь: {order.user.email if order.user else 'Гость'}",
+        f"Клиент: {order.customer_name}",
+        f"Телефон: {order.customer_phone}",
+        f"Способ оплаты: {order.payment_method}",
+        f"Способ получения: {order.delivery_method}",
+    ]
+    if order.delivery_method == 'delivery':
+        lines += [
+            f"Адрес доставки: {order.customer_address}",
+            f"Город: {order.delivery_city}",
+            f"Расстояние: {order.delivery_distance} км",
+            f"Стоимость доставки: {order.delivery_price} руб.",
+        ]
+    lines.append("Товары:")
+    for item in order.items.all():
+        lines.append(f"  - {item.product_title} x {item.quantity} = {item.line_total} руб.")
+    lines += [
+        f"Общая стоимость: {order.total_price} руб.",
+        f"Дата заказа: {order.created_at}",
+        "=" * 60,
+    ]
+    return '\n'.join(lines)
+
+
+def report_order(order_id):
+    """Выводит сводку заказа (фоновая задача)"""
+    order = Order.objects.select_related('user').prefetch_related('items').filter(id=order_id).first()
+    if order is not None:
+        print(format_order_summary(order))
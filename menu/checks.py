@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Кэши, которые видит только один процесс
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """Версии каталога и тарифов должны храниться в кэше, общем для всех процессов"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        Warning(
+            'Кэш по умолчанию не общий для процессов: изменения каталога и тарифов '
+            'доставки не будут видны другим процессам, свободное время бронирований '
+            'в них будет устаревшим.',
+            hint='Укажите в CACHES Redis, Memcached или DatabaseCache.',
+            id='menu.W001',
+        )
+    ]
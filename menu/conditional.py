@@ -0,0 +1,66 @@
+"""
+Условные GET запросы (ETag / Last-Modified) для страниц меню.
+
+Валидаторы считаются по кэшу каталога без обращения к БД, поэтому
+ответ 304 отдается до вызова вьюшки и шаблонизатора. В ETag входят
+также пользователь и количество товаров в корзине, так как они
+выводятся в шапке страницы.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .catalog import get_snapshot, get_product
+from .context_processors import cart_context
+
+
+def menu_list_validators(request, *args, **kwargs):
+    snapshot = get_snapshot()
+    return snapshot.fingerprint, snapshot.last_modified
+
+
+def product_detail_validators(request, product_id):
+    product = get_product(product_id)
+    if product is None:
+        return None, None
+    return f"{product['id']}:{product['updated_at'].isoformat()}", product['updated_at']
+
+
+def make_etag(request, seed):
+    user_id = request.user.pk if request.user.is_authenticated else ''
+    cart_count = cart_context(request)['cart_count']
+    data = f'{seed}|{request.get_full_path()}|{user_id}|{cart_count}'
+    # Слабый ETag: CSRF токен в разметке меняется при каждой отрисовке
+    return 'W/"%s"' % hashlib.md5(data.encode()).hexdigest()
+
+
+def catalog_conditional(get_validators):
+    """Отвечает 304 на If-None-Match / If-Modified-Since, если каталог не менялся"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+
+            seed, last_modified = get_validators(request, *args, **kwargs)
+            if seed is None:
+                return view_func(request, *args, **kwargs)
+
+            etag = make_etag(request, seed)
+            last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                if last_modified_ts is not None:
+                    response.headers.setdefault('Last-Modified', http_date(last_modified_ts))
+                # Страница содержит данные пользователя, поэтому только приватный кэш
+                response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
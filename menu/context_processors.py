@@ -1,12 +1,12 @@
+from .cart_store import get_cart
+
+
 def cart_context(request):
     try:
-        # Просто получаем корзину из сессии
-        cart = request.session.get('cart', {})
-        cart_count = sum(cart.values()) if cart else 0
-        
+        # Количество товаров берется из хранилища корзины, сессия не изменяется
         return {
-            'cart_count': cart_count
+            'cart_count': get_cart(request).count()
         }
     except Exception as e:
         print(f"Error in cart_context: {e}")
-        return {'cart_count': 0}
\ No newline at end of file
+        return {'cart_count': 0}
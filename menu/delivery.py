@@ -0,0 +1,208 @@
+"""
+Тарифы доставки.
+
+Зоны и ценовые диапазоны хранятся в БД (DeliveryZone, DeliveryBand) и
+компилируются в неизменяемую таблицу в памяти процесса. Таблица
+привязана к версии в кэше Django, как снимок каталога (menu.catalog):
+сигналы увеличивают версию при изменении тарифов, и таблица
+перестраивается при следующем обращении. Кэш общий для всех процессов
+(CACHES, проверка menu.W001), поэтому изменение зоны в админке меняет
+цены доставки во всех процессах, а не только в сохранившем ее. Расчет
+цены не делает запросов к БД: поиск зоны - словарь, поиск диапазона -
+бинарный поиск по нескольким границам.
+
+Цена считается так: заказ от суммы free_from доставляется бесплатно;
+если расстояние попадает в диапазон - цена диапазона; иначе
+base_price + price_per_km * расстояние.
+
+Цена доставки заказа считается только по адресу: он ищется в
+справочнике (menu.geo), зона определяется по границам зон, а
+расстояние - от кафе до адреса. Город и расстояние, введенные
+покупателем, для заказа не используются: нераспознанный адрес - ошибка.
+По городу и расстоянию считается только предварительная цена в корзине
+и в API.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .geo import distance_from_cafe, geocode, parse_polygon, point_in_polygon
+from .models import DeliveryZone
+
+logger = logging.getLogger(__name__)
+
+TARIFFS_VERSION_KEY = 'menu:delivery_tariffs_version'
+MAX_DISTANCE = 500
+
+ADDRESS_NOT_FOUND = 'Адрес доставки не распознан: укажите населенный пункт, например "г. Тула, ул. Ленина, д. 1"'
+
+DeliveryQuote = namedtuple('DeliveryQuote', ['city', 'distance', 'price', 'location'])
+
+_lock = threading.Lock()
+_table = None
+
+
+class CompiledZone:
+    """Тариф одной зоны, цены в рублях (float, как цены в корзине)"""
+    __slots__ = ('key', 'name', 'label', 'base_price', 'price_per_km', 'free_from',
+                 'distance_required', 'is_default', 'band_limits', 'band_prices', 'polygon', 'bbox')
+
+    def __init__(self, zone):
+        self.key = zone.key
+        self.name = zone.name
+        self.label = zone.label or zone.name
+        self.base_price = float(zone.base_price)
+        self.price_per_km = float(zone.price_per_km)
+        self.free_from = float(zone.free_from) if zone.free_from is not None else None
+        self.distance_required = zone.distance_required
+        self.is_default = zone.is_default
+        bands = sorted(zone.bands.all(), key=lambda band: band.max_distance)
+        self.band_limits = tuple(band.max_distance for band in bands)
+        self.band_prices = tuple(float(band.price) for band in bands)
+        try:
+            self.polygon = parse_polygon(zone.polygon)
+        except ValueError as e:
+            # Границы, сохраненные в обход clean(), не ломают расчет: зона выбирается только по коду
+            logger.warning('Некорректные границы зоны доставки %s: %s', zone.key, e)
+            self.polygon = ()
+        self.bbox = None
+        if self.polygon:
+            lats, lons = zip(*self.polygon)
+            self.bbox = (min(lats), max(lats), min(lons), max(lons))
+
+    def contains(self, lat, lon):
+        if self.bbox is None:
+            return False
+        min_lat, max_lat, min_lon, max_lon = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        return point_in_polygon(lat, lon, self.polygon)
+
+    def price(self, distance=0, subtotal=None):
+        if self.free_from is not None and subtotal is not None and subtotal >= self.free_from:
+            return 0.0
+        distance = clean_distance(distance) if self.distance_required else 0
+        index = bisect_left(self.band_limits, distance)
+        if index < len(self.band_limits):
+            return self.band_prices[index]
+        return round(self.base_price + self.price_per_km * distance, 2)
+
+
+class TariffTable:
+    """Неизменяемая таблица тарифов для одной версии"""
+
+    def __init__(self, version, zones):
+        self.version = version
+        self.zones = tuple(CompiledZone(zone) for zone in zones)
+        self.by_key = {zone.key: zone for zone in self.zones}
+        # Неизвестный город считается по зоне по умолчанию (или последней)
+        self.default = next((zone for zone in self.zones if zone.is_default), self.zones[-1] if self.zones else None)
+
+    def get_zone(self, city):
+        """Зона по коду, для неизвестного города - зона по умолчанию"""
+        return self.by_key.get(city, self.default)
+
+    def zone_for_point(self, lat, lon):
+        """Первая зона, в границы которой попадает точка, иначе зона по умолчанию"""
+        for zone in self.zones:
+            if zone.contains(lat, lon):
+                return zone
+        return self.default
+
+    def quote_address(self, address, subtotal=None):
+        """Зона, расстояние и цена доставки по адресу или None, если адрес не распознан"""
+        location = geocode(address)
+        if location is None:
+            return None
+        zone = self.zone_for_point(location.lat, location.lon)
+        # Координаты в адресе могут быть любыми: расстояние ограничено, как введенное вручную
+        distance = clean_distance(distance_from_cafe(location.lat, location.lon))
+        if zone is None:
+            return DeliveryQuote('', distance, 0.0, location)
+        return DeliveryQuote(zone.key, distance, zone.price(distance, subtotal), location)
+
+    def quote(self, city, distance=0, subtotal=None):
+        zone = self.get_zone(city)
+        if zone is None:
+            return 0.0
+        return zone.price(distance, subtotal)
+
+    def quote_many(self, quotes):
+        """Цены для списка (город, расстояние, сумма заказа)"""
+        return [self.quote(*quote) for quote in quotes]
+
+
+def clean_distance(distance):
+    try:
+        distance = int(distance or 0)
+    except (TypeError, ValueError):
+        return 0
+    return min(max(distance, 0), MAX_DISTANCE)
+
+
+def get_tariffs_version():
+    version = cache.get(TARIFFS_VERSION_KEY)
+    if version is None:
+        cache.add(TARIFFS_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(TARIFFS_VERSION_KEY)
+    return version
+
+
+def bump_tariffs_version():
+    try:
+        return cache.incr(TARIFFS_VERSION_KEY)
+    except ValueError:
+        get_tariffs_version()
+        return cache.incr(TARIFFS_VERSION_KEY)
+
+
+def get_tariffs():
+    """Таблица тарифов текущей версии"""
+    global _table
+
+    version = get_tariffs_version()
+    table = _table
+    if table is not None and table.version == version:
+        return table
+
+    with _lock:
+        table = _table
+        if table is None or table.version != version:
+            zones = DeliveryZone.objects.filter(is_active=True).prefetch_related('bands')
+            table = TariffTable(version, zones)
+            _table = table
+        return table
+
+
+def invalidate_tariffs():
+    global _table
+    with _lock:
+        _table = None
+    bump_tariffs_version()
+
+
+def calculate_delivery_price(city_key, distance_km=0, subtotal=None):
+    """Рассчитывает стоимость доставки"""
+    return get_tariffs().quote(city_key, distance_km, subtotal)
+
+
+def quote_address(address, subtotal=None):
+    """Зона, расстояние и цена доставки по адресу покупателя (None - адрес не распознан)"""
+    return get_tariffs().quote_address(address, subtotal)
+
+
+def quote_delivery(quotes):
+    """Цены доставки для многих (город, расстояние, сумма заказа) за один вызов"""
+    return get_tariffs().quote_many(quotes)
+
+
+def get_delivery_cities():
+    """Возвращает список городов для выбора"""
+    return [
+        {'key': zone.key, 'name': zone.label, 'distance_required': zone.distance_required}
+        for zone in get_tariffs().zones
+    ]
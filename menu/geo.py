@@ -0,0 +1,221 @@
+"""
+Офлайн-геокодирование адресов доставки.
+
+Координаты населенных пунктов берутся из прилагаемого справочника
+(data/localities.csv) без обращения к внешним сервисам. Справочник
+загружается один раз на процесс: названия - в словарь для разбора
+адреса, координаты - в сеточный индекс для поиска ближайшего пункта.
+Из названий, найденных в адресе, выбирается самое длинное, затем
+самый крупный пункт. Результаты разбора адресов кэшируются.
+
+Расстояние от кафе считается по формуле гаверсинусов (по прямой,
+округляется вверх до километра). Попадание точки в зону доставки
+определяется по многоугольнику зоны (point in polygon).
+"""
+import csv
+import math
+import re
+import threading
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+DATA_PATH = Path(__file__).resolve().parent / 'data' / 'localities.csv'
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.2
+# Размер ячейки сеточного индекса, градусов
+GRID_CELL = 0.25
+# Координаты кафе по умолчанию - центр Тулы
+DEFAULT_CAFE_LOCATION = (54.1931, 37.6173)
+
+Locality = namedtuple('Locality', ['name', 'aliases', 'lat', 'lon', 'population'])
+Location = namedtuple('Location', ['lat', 'lon', 'name'])
+
+COORDINATES_RE = re.compile(r'(-?\d{1,2}\.\d+)\s*[,; ]\s*(-?\d{1,3}\.\d+)')
+WORD_RE = re.compile(r'[a-zа-я0-9]+')
+
+_lock = threading.Lock()
+_gazetteer = None
+
+
+def normalize(text):
+    """Слова адреса в нижнем регистре, ё заменяется на е"""
+    return WORD_RE.findall(text.lower().replace('ё', 'е'))
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Расстояние между точками по поверхности Земли, км"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def parse_polygon(value):
+    """Границы зоны из JSON: кортеж точек (широта, долгота) или ValueError"""
+    if not value:
+        return ()
+    if not isinstance(value, (list, tuple)) or len(value) < 3:
+        raise ValueError('Границы зоны - список не менее чем из 3 точек [широта, долгота]')
+    points = []
+    for point in value:
+        if not (
+            isinstance(point, (list, tuple)) and len(point) == 2
+            and all(isinstance(number, (int, float)) and not isinstance(number, bool) for number in point)
+        ):
+            raise ValueError(f'Точка {point!r}: нужна пара чисел [широта, долгота]')
+        lat, lon = float(point[0]), float(point[1])
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError(f'Точка {point!r}: широта от -90 до 90, долгота от -180 до 180')
+        points.append((lat, lon))
+    return tuple(points)
+
+
+def point_in_polygon(lat, lon, polygon):
+    """Лежит ли точка внутри многоугольника [(широта, долгота), ...] (метод лучей)"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lon_i > lon) != (lon_j > lon):
+            crossing = lat_i + (lon - lon_i) * (lat_j - lat_i) / (lon_j - lon_i)
+            if lat < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+
+def ring_cells(row, col, ring):
+    """Ячейки на границе квадрата радиуса ring вокруг (row, col)"""
+    if ring == 0:
+        yield row, col
+        return
+    for c in range(col - ring, col + ring + 1):
+        yield row - ring, c
+        yield row + ring, c
+    for r in range(row - ring + 1, row + ring):
+        yield r, col - ring
+        yield r, col + ring
+
+
+class Gazetteer:
+    """Справочник населенных пунктов: поиск по названию и по координатам"""
+
+    def __init__(self, localities):
+        self.localities = tuple(localities)
+
+        self.by_name = {}
+        for locality in self.localities:
+            for name in (locality.name, *locality.aliases):
+                key = tuple(normalize(name))
+                current = self.by_name.get(key)
+                if current is None or locality.population > current.population:
+                    self.by_name[key] = locality
+        self.max_words = max((len(key) for key in self.by_name), default=1)
+
+        self.grid = {}
+        for locality in self.localities:
+            self.grid.setdefault(self.cell(locality.lat, locality.lon), []).append(locality)
+
+    @staticmethod
+    def cell(lat, lon):
+        return math.floor(lat / GRID_CELL), math.floor(lon / GRID_CELL)
+
+    def find_in_words(self, words):
+        """Самое длинное, затем самое крупное название пункта среди слов адреса"""
+        for size in range(min(self.max_words, len(words)), 0, -1):
+            found = [
+                self.by_name[key]
+                for key in (tuple(words[start:start + size]) for start in range(len(words) - size + 1))
+                if key in self.by_name
+            ]
+            if found:
+                return max(found, key=lambda locality: locality.population)
+        return None
+
+    def nearest(self, lat, lon):
+        """Ближайший пункт: обход колец ячеек сетки вокруг точки"""
+        if not self.grid:
+            return None
+        row, col = self.cell(lat, lon)
+        last_ring = max(max(abs(r - row), abs(c - col)) for r, c in self.grid)
+        best, best_distance = None, None
+        for ring in range(last_ring + 1):
+            if 8 * ring > len(self.grid):
+                # Точка далеко от всех пунктов: в кольце больше ячеек, чем заполнено
+                # во всей сетке, проверить все пункты дешевле
+                return min(self.localities, key=lambda locality: haversine(lat, lon, locality.lat, locality.lon))
+            for r, c in ring_cells(row, col, ring):
+                for locality in self.grid.get((r, c), ()):
+                    distance = haversine(lat, lon, locality.lat, locality.lon)
+                    if best_distance is None or distance < best_distance:
+                        best, best_distance = locality, distance
+            # Пункты в следующих кольцах не ближе этой границы
+            min_lat = min(abs(lat) + GRID_CELL * (ring + 1), 89.0)
+            bound = ring * GRID_CELL * KM_PER_DEGREE * math.cos(math.radians(min_lat))
+            if best is not None and best_distance <= bound:
+                break
+        return best
+
+
+def load_localities(path=DATA_PATH):
+    with open(path, encoding='utf-8', newline='') as stream:
+        for row in csv.DictReader(stream):
+            yield Locality(
+                name=row['name'],
+                aliases=tuple(alias.strip() for alias in (row['aliases'] or '').split(';') if alias.strip()),
+                lat=float(row['lat']),
+                lon=float(row['lon']),
+                population=int(row['population'] or 0),
+            )
+
+
+def get_gazetteer():
+    """Справочник, загруженный один раз на процесс"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer(load_localities())
+    return _gazetteer
+
+
+def cafe_location():
+    return getattr(settings, 'MENU_CAFE_LOCATION', DEFAULT_CAFE_LOCATION)
+
+
+@lru_cache(maxsize=4096)
+def _geocode_words(words):
+    locality = get_gazetteer().find_in_words(list(words))
+    if locality is None:
+        return None
+    return Location(locality.lat, locality.lon, locality.name)
+
+
+def geocode(address):
+    """
+    Координаты адреса: населенный пункт из справочника или, если пункт не
+    назван, координаты, указанные в адресе ("54.19, 37.61"). Названный
+    пункт важнее координат: иначе приписанные к адресу координаты меняли
+    бы зону и расстояние доставки. Если не найдено - None.
+    """
+    if not address:
+        return None
+    location = _geocode_words(tuple(normalize(address)))
+    if location is not None:
+        return location
+    match = COORDINATES_RE.search(address)
+    if match:
+        lat, lon = float(match.group(1)), float(match.group(2))
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            locality = get_gazetteer().nearest(lat, lon)
+            return Location(lat, lon, locality.name if locality else '')
+    return None
+
+
+def distance_from_cafe(lat, lon):
+    """Расстояние от кафе до точки, целых км (с округлением вверх)"""
+    cafe_lat, cafe_lon = cafe_location()
+    return math.ceil(haversine(cafe_lat, cafe_lon, lat, lon))
@@ -0,0 +1,269 @@
+"""
+Локальные миниатюры изображений товаров.
+
+Product.image - внешняя ссылка. Каждое изображение скачивается один раз,
+по нему строятся уменьшенные варианты в WebP и JPEG (в пуле процессов),
+которые сохраняются на диск под хэшем содержимого. Адрес варианта
+зависит только от содержимого, поэтому отдается с долгим кэшированием.
+"""
+import hashlib
+import io
+import ipaddress
+import logging
+import os
+import socket
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+from urllib.request import HTTPRedirectHandler, Request, build_opener
+
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WIDTHS = getattr(settings, 'MENU_THUMBNAIL_WIDTHS', [96, 320, 640, 960])
+THUMBNAIL_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+THUMBNAIL_QUALITY = 82
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+FETCH_TIMEOUT = 10
+# Схемы адресов изображений; file:// включается только в тестах (MENU_THUMBNAIL_SOURCE_SCHEMES)
+SOURCE_SCHEMES = ['http', 'https']
+
+# Ширина, которая подставляется в src для браузеров без srcset
+FALLBACK_WIDTH = 320
+
+THUMBNAIL_FIELDS = ['image_source', 'image_hash', 'image_width', 'image_height', 'image_variants', 'updated_at']
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+def get_thumbnail_root():
+    return Path(getattr(settings, 'MENU_THUMBNAIL_ROOT', settings.BASE_DIR / 'media' / 'thumbnails'))
+
+
+def variant_path(image_hash, width, ext, root=None):
+    root = Path(root) if root else get_thumbnail_root()
+    return root / image_hash[:2] / image_hash / f'{width}.{ext}'
+
+
+def variant_url(image_hash, width, ext):
+    return reverse('menu:thumbnail', kwargs={'image_hash': image_hash, 'width': width, 'ext': ext})
+
+
+def check_source_url(url):
+    """
+    Адрес изображения задает персонал или импорт меню, поэтому скачиваются
+    только внешние http(s) адреса: не локальные файлы и не внутренние сервисы
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in getattr(settings, 'MENU_THUMBNAIL_SOURCE_SCHEMES', SOURCE_SCHEMES):
+        raise ThumbnailError(f'Недопустимый адрес изображения {url}')
+    if scheme == 'file':
+        return
+    try:
+        if not parts.hostname:
+            raise ValueError('нет имени хоста')
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, parts.port, proto=socket.IPPROTO_TCP)}
+    except (OSError, ValueError) as e:
+        raise ThumbnailError(f'Не удалось скачать {url}: {e}')
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise ThumbnailError(f'Адрес изображения {url} ведет во внутреннюю сеть')
+
+
+class SourceRedirectHandler(HTTPRedirectHandler):
+    """Перенаправление проверяется так же, как исходный адрес"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_source_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def fetch_source(url):
+    """Скачивает исходное изображение по внешнему http(s) адресу"""
+    check_source_url(url)
+    request = Request(url, headers={'User-Agent': 'childrens-cafe-thumbnailer'})
+    try:
+        with build_opener(SourceRedirectHandler).open(request, timeout=FETCH_TIMEOUT) as response:
+            data = response.read(MAX_SOURCE_BYTES + 1)
+    except (OSError, ValueError) as e:
+        raise ThumbnailError(f'Не удалось скачать {url}: {e}')
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ThumbnailError(f'Изображение {url} больше {MAX_SOURCE_BYTES} байт')
+    return data
+
+
+def _save_atomic(image, path, image_format):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            image.save(tmp, image_format, quality=THUMBNAIL_QUALITY)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def render_variants(image_hash, data, root, widths):
+    """
+    Строит варианты изображения. Выполняется в отдельном процессе,
+    поэтому получает только простые аргументы.
+    Возвращает исходные ширину и высоту и список построенных ширин.
+    """
+    try:
+        source = Image.open(io.BytesIO(data))
+        source.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise ThumbnailError(f'Не удалось прочитать изображение: {e}')
+
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if 'transparency' in source.info else 'RGB')
+    width, height = source.size
+
+    # Не увеличиваем изображение, но хотя бы один вариант строим всегда
+    built = sorted({min(w, width) for w in widths})
+    for target_width in built:
+        target_height = max(1, round(height * target_width / width))
+        resized = source.resize((target_width, target_height), Image.LANCZOS)
+        for ext, image_format in THUMBNAIL_FORMATS.items():
+            variant = resized.convert('RGB') if image_format == 'JPEG' else resized
+            _save_atomic(variant, variant_path(image_hash, target_width, ext, root), image_format)
+    return width, height, built
+
+
+def thumbnail_for(product):
+    """Данные для тега <picture> или None, если миниатюры еще не построены"""
+    if not product.image_hash or not product.image_variants or product.image_source != product.image:
+        return None
+
+    widths = product.image_variants
+    src_width = max([w for w in widths if w <= FALLBACK_WIDTH] or [widths[0]])
+    return {
+        'src': variant_url(product.image_hash, src_width, 'jpg'),
+        'smallest': variant_url(product.image_hash, widths[0], 'jpg'),
+        'srcset_webp': ', '.join(f"{variant_url(product.image_hash, w, 'webp')} {w}w" for w in widths),
+        'srcset_jpeg': ', '.join(f"{variant_url(product.image_hash, w, 'jpg')} {w}w" for w in widths),
+        'width': src_width,
+        'height': max(1, round(product.image_height * src_width / product.image_width)),
+    }
+
+
+def needs_thumbnails(product):
+    """У товара есть изображение, а миниатюр для него еще нет"""
+    return bool(product.image) and (product.image_source != product.image or not product.image_hash)
+
+
+def build_thumbnails(products, workers=None, force=False):
+    """
+    Скачивает изображения товаров и строит миниатюры.
+    workers=0 - построение в текущем процессе (для тестов и отладки).
+    Ошибка одного изображения не прерывает остальные: она попадает в
+    журнал и в список ошибок.
+    Возвращает количество обновленных товаров и список ошибок.
+    """
+    root = get_thumbnail_root()
+    pending = [product for product in products if product.image and (force or needs_thumbnails(product))]
+    urls = list(dict.fromkeys(product.image for product in pending))
+    errors = []
+
+    def failed(source, e):
+        # ThumbnailError уже описывает источник, остальные ошибки (например,
+        # DecompressionBombError от Pillow) - нет
+        message = str(e) if isinstance(e, ThumbnailError) else f'{source}: {e.__class__.__name__}: {e}'
+        logger.warning('Миниатюры не построены: %s', message)
+        errors.append(message)
+
+    # Скачивание - ввод-вывод, для него достаточно потоков
+    sources = {}
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for url, future in [(url, pool.submit(fetch_source, url)) for url in urls]:
+            try:
+                sources[url] = future.result()
+            except Exception as e:
+                failed(url, e)
+
+    hashes = {url: hashlib.sha256(data).hexdigest() for url, data in sources.items()}
+
+    # Одинаковые изображения по разным ссылкам обрабатываем один раз
+    jobs = {}
+    hash_urls = {}
+    for url, image_hash in hashes.items():
+        jobs.setdefault(image_hash, sources[url])
+        hash_urls.setdefault(image_hash, url)
+
+    results = {}
+    if workers == 0:
+        for image_hash, data in jobs.items():
+            try:
+                results[image_hash] = render_variants(image_hash, data, str(root), THUMBNAIL_WIDTHS)
+            except Exception as e:
+                failed(hash_urls[image_hash], e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                image_hash: pool.submit(render_variants, image_hash, data, str(root), THUMBNAIL_WIDTHS)
+                for image_hash, data in jobs.items()
+            }
+            for image_hash, future in futures.items():
+                try:
+                    results[image_hash] = future.result()
+                except Exception as e:
+                    failed(hash_urls[image_hash], e)
+
+    # Локальный импорт: catalog сам импортирует этот модуль
+    from .catalog import invalidate_catalog
+
+    # updated_at обновляем явно: от него считаются ETag и кэш страницы товара
+    now = timezone.now()
+    updated = []
+    for product in pending:
+        image_hash = hashes.get(product.image)
+        if image_hash not in results:
+            continue
+        width, height, widths = results[image_hash]
+        product.image_source = product.image
+        product.image_hash = image_hash
+        product.image_width = width
+        product.image_height = height
+        product.image_variants = widths
+        product.updated_at = now
+        updated.append(product)
+
+    if updated:
+        # bulk_update не отправляет сигналы, поэтому сбрасываем кэш каталога вручную
+        Product.objects.bulk_update(updated, THUMBNAIL_FIELDS)
+        invalidate_catalog()
+    return len(updated), errors
+
+
+def build_product_thumbnails(product_id):
+    """
+    Строит миниатюры одного товара (фоновая задача, ставится при сохранении
+    товара с новым изображением). При ошибке задача повторяется обработчиком
+    """
+    updated, errors = build_thumbnails(Product.objects.filter(id=product_id), workers=0)
+    if errors:
+        raise ThumbnailError('; '.join(errors))
+    return updated
+
+
+def serve_thumbnail(request, image_hash, width, ext):
+    """Отдает миниатюру с долгим кэшированием (адрес зависит от содержимого)"""
+    path = variant_path(image_hash, width, ext)
+    if not path.is_file():
+        raise Http404('Миниатюра не найдена')
+    response = FileResponse(open(path, 'rb'), content_type=f'image/{"jpeg" if ext == "jpg" else ext}')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
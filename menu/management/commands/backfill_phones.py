@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from contact_form.models import ContactMessage
+from homepage.models import Booking
+from menu.models import Order
+from menu.phones import normalize_phone
+
+# (модель, поле телефона, нормализованное поле)
+PHONE_FIELDS = [
+    (Order, 'customer_phone', 'customer_phone_normalized'),
+    (Booking, 'phone', 'phone_normalized'),
+    (ContactMessage, 'phone', 'phone_normalized'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Заполняет нормализованные телефоны у существующих заказов, бронирований и обращений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки для bulk_update')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model, phone_field, normalized_field in PHONE_FIELDS:
+            updated = self.backfill(model, phone_field, normalized_field, batch_size)
+            self.stdout.write(f'{model._meta.verbose_name_plural}: обновлено {updated}')
+        self.stdout.write(self.style.SUCCESS('Готово'))
+
+    def backfill(self, model, phone_field, normalized_field, batch_size):
+        batch = []
+        updated = 0
+        # Загружаются только id и телефоны, записываются только изменившиеся строки
+        rows = model.objects.only('id', phone_field, normalized_field).order_by('id')
+        for row in rows.iterator(chunk_size=batch_size):
+            normalized = normalize_phone(getattr(row, phone_field))
+            if getattr(row, normalized_field) == normalized:
+                continue
+            setattr(row, normalized_field, normalized)
+            batch.append(row)
+            if len(batch) >= batch_size:
+                model.objects.bulk_update(batch, [normalized_field])
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            model.objects.bulk_update(batch, [normalized_field])
+            updated += len(batch)
+        return updated
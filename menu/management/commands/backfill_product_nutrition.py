@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from menu.catalog import invalidate_catalog
+from menu.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Заполняет разобранные ингредиенты и пищевую ценность у существующих товаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Размер пачки для bulk_update')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        batch = []
+        updated = 0
+
+        # updated_at обновляем явно: от него считаются ETag страниц меню
+        fields = Product.DERIVED_FIELDS + ['updated_at']
+        now = timezone.now()
+
+        products = Product.objects.only('id', 'ingredients', 'protein', 'carbs').order_by('id')
+        for product in products.iterator(chunk_size=batch_size):
+            product.update_derived_fields()
+            product.updated_at = now
+            batch.append(product)
+            if len(batch) >= batch_size:
+                Product.objects.bulk_update(batch, fields)
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            Product.objects.bulk_update(batch, fields)
+            updated += len(batch)
+
+        # bulk_update не отправляет сигналы, поэтому сбрасываем кэш каталога вручную
+        invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено товаров: {updated}'))
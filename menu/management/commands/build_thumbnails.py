@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from menu.images import build_thumbnails
+from menu.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Скачивает изображения товаров и строит локальные миниатюры WebP/JPEG'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Количество процессов (0 - без пула процессов)')
+        parser.add_argument('--force', action='store_true', help='Перестроить миниатюры для всех товаров')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').order_by('id')
+        updated, errors = build_thumbnails(products, workers=options['workers'], force=options['force'])
+
+        for error in errors:
+            self.stderr.write(self.style.WARNING(error))
+        self.stdout.write(self.style.SUCCESS(f'Обновлено товаров: {updated}'))
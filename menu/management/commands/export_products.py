@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from menu.bulk import DEFAULT_BATCH_SIZE, export_rows, write_export
+
+
+class Command(BaseCommand):
+    help = 'Экспорт товаров в CSV, JSON или NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['csv', 'json', 'ndjson'], default='csv', help='Формат выгрузки')
+        parser.add_argument('-o', '--output', help='Файл для выгрузки (по умолчанию stdout)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Размер пачки чтения из БД')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = export_rows(chunk_size=options['batch_size'])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as stream:
+                count = write_export(stream, options['format'], rows)
+        else:
+            count = write_export(self.stdout, options['format'], rows)
+        elapsed = time.perf_counter() - started
+
+        rate = count / elapsed if elapsed else count
+        # Итог пишем в stderr, чтобы не смешивать с выгрузкой в stdout
+        self.stderr.write(self.style.SUCCESS(f'Выгружено товаров: {count}. {elapsed:.2f} с, {rate:.0f} строк/с'))
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from menu.bulk import DEFAULT_BATCH_SIZE, detect_format, import_products, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Массовый импорт товаров из CSV, JSON или NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с товарами')
+        parser.add_argument('--format', choices=['csv', 'json', 'ndjson'], help='Формат файла (по умолчанию по расширению)')
+        parser.add_argument('--match-by', choices=['id', 'title'], default='id', help='Поле для сопоставления с существующими товарами')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Размер пачки')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать изменения')
+        parser.add_argument('--no-copy', action='store_true', help='Не использовать COPY на PostgreSQL')
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or detect_format(options['path'])
+        dry_run = options['dry_run']
+        report = self.stdout.write if dry_run else None
+
+        started = time.perf_counter()
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                stats = import_products(
+                    iter_rows(stream, file_format),
+                    match_by=options['match_by'],
+                    batch_size=options['batch_size'],
+                    dry_run=dry_run,
+                    use_copy=not options['no_copy'],
+                    report=report,
+                )
+        except OSError as e:
+            raise CommandError(f'Не удалось открыть файл: {e}')
+        except ValueError as e:
+            raise CommandError(f'Ошибка чтения файла: {e}')
+        elapsed = time.perf_counter() - started
+
+        for error in stats.errors:
+            self.stderr.write(self.style.WARNING(error))
+
+        rate = stats.rows / elapsed if elapsed else stats.rows
+        prefix = 'Пробный запуск. ' if dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Строк: {stats.rows}, создано: {stats.created}, обновлено: {stats.updated}, '
+            f'без изменений: {stats.unchanged}, ошибок: {len(stats.errors)}. '
+            f'{elapsed:.2f} с, {rate:.0f} строк/с'
+        ))
@@ -1,3 +1,6 @@
+from .cart_store import save_carts
+
+
 class ForceSessionMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -18,4 +21,14 @@ class ForceSessionMiddleware:
             return response
         except Exception as e:
             print(f"Error in ForceSessionMiddleware: {e}")
-            return self.get_response(request)
\ No newline at end of file
+            return self.get_response(request)
+
+
+class CartMiddleware:
+    """Сохраняет изменения корзины (cookie) в ответе"""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return save_carts(request, response)
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# Выражение должно совпадать с menu.search.SEARCH_VECTOR_SQL
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', translate(coalesce(title, ''), 'ёЁ', 'еЕ')), 'A') || "
+    "setweight(to_tsvector('russian', translate(coalesce(ingredients, ''), 'ёЁ', 'еЕ')), 'B') || "
+    "setweight(to_tsvector('russian', translate(coalesce(description, ''), 'ёЁ', 'еЕ')), 'C') || "
+    "setweight(to_tsvector('russian', translate(coalesce(full_description, ''), 'ёЁ', 'еЕ')), 'D')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    # GIN индекс по tsvector есть только в PostgreSQL,
+    # на других БД используется индекс в памяти
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS menu_product_search_gin "
+        f"ON menu_product USING GIN (({SEARCH_VECTOR_SQL}))"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS menu_product_search_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0003_alter_orderitem_options_orderitem_product_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
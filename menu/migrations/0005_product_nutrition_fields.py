@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0004_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='carbs_grams',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True, verbose_name='Углеводы (г)'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='ingredients_list',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Список ингредиентов'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='protein_grams',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=6, null=True, verbose_name='Белки (г)'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['protein_grams'], name='menu_produc_protein_247a11_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['carbs_grams'], name='menu_produc_carbs_g_ce1d04_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:08
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0008_cartitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='line_total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('product_price'), '*', models.F('quantity')), output_field=models.DecimalField(decimal_places=2, max_digits=12), verbose_name='Сумма'),
+        ),
+    ]
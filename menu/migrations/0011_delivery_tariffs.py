@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0010_order_user_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.SlugField(unique=True, verbose_name='Код')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('label', models.CharField(blank=True, max_length=150, verbose_name='Подпись в корзине')),
+                ('base_price', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Базовая цена')),
+                ('price_per_km', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Цена за км')),
+                ('free_from', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Бесплатно от суммы заказа')),
+                ('distance_required', models.BooleanField(default=True, verbose_name='Нужно указать расстояние')),
+                ('is_default', models.BooleanField(default=False, verbose_name='Для неизвестных городов')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активна')),
+                ('sort_order', models.PositiveIntegerField(default=0, verbose_name='Порядок')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Зона доставки',
+                'verbose_name_plural': 'Зоны доставки',
+                'ordering': ['sort_order', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DeliveryBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_distance', models.PositiveIntegerField(verbose_name='До расстояния (км)')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена')),
+                ('zone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='menu.deliveryzone', verbose_name='Зона')),
+            ],
+            options={
+                'verbose_name': 'Ценовой диапазон',
+                'verbose_name_plural': 'Ценовые диапазоны',
+                'ordering': ['zone', 'max_distance'],
+                'constraints': [models.UniqueConstraint(fields=('zone', 'max_distance'), name='menu_deliveryband_zone_distance_uniq')],
+            },
+        ),
+    ]
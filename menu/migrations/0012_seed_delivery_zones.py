@@ -0,0 +1,36 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+# Тарифы, которые раньше были заданы в menu.views.DELIVERY_CITIES
+ZONES = [
+    {
+        'key': 'tula', 'name': 'Тула', 'label': 'Тула (доставка 100 руб)',
+        'base_price': Decimal('100'), 'price_per_km': Decimal('0'), 'distance_required': False,
+    },
+    {
+        'key': 'moscow', 'name': 'Москва', 'label': 'Москва (от 300 руб)',
+        'base_price': Decimal('300'), 'price_per_km': Decimal('15'),
+    },
+    {
+        'key': 'other', 'name': 'Другой город', 'label': 'Другой город (расчет по расстоянию)',
+        'base_price': Decimal('200'), 'price_per_km': Decimal('20'), 'is_default': True,
+    },
+]
+
+
+def seed_zones(apps, schema_editor):
+    DeliveryZone = apps.get_model('menu', 'DeliveryZone')
+    for sort_order, zone in enumerate(ZONES):
+        DeliveryZone.objects.get_or_create(key=zone['key'], defaults={**zone, 'sort_order': sort_order})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0011_delivery_tariffs'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_zones, migrations.RunPython.noop),
+    ]
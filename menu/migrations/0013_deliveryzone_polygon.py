@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:25
+
+from django.db import migrations, models
+
+# Приблизительные границы Тулы и Москвы (в пределах МКАД)
+POLYGONS = {
+    'tula': [
+        [54.27, 37.50], [54.28, 37.62], [54.25, 37.73], [54.16, 37.76],
+        [54.10, 37.66], [54.10, 37.55], [54.14, 37.47], [54.22, 37.45],
+    ],
+    'moscow': [
+        [55.91, 37.55], [55.88, 37.72], [55.78, 37.84], [55.66, 37.84],
+        [55.57, 37.68], [55.59, 37.50], [55.69, 37.40], [55.80, 37.37], [55.88, 37.43],
+    ],
+}
+
+
+def seed_polygons(apps, schema_editor):
+    DeliveryZone = apps.get_model('menu', 'DeliveryZone')
+    for key, polygon in POLYGONS.items():
+        DeliveryZone.objects.filter(key=key, polygon__isnull=True).update(polygon=polygon)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0012_seed_delivery_zones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliveryzone',
+            name='polygon',
+            field=models.JSONField(blank=True, help_text='Список точек [широта, долгота]. Адреса внутри границ относятся к этой зоне', null=True, verbose_name='Границы зоны'),
+        ),
+        migrations.RunPython(seed_polygons, migrations.RunPython.noop),
+    ]
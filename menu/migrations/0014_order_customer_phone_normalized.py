@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0013_deliveryzone_polygon'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='customer_phone_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12, verbose_name='Телефон (нормализованный)'),
+        ),
+    ]
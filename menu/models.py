@@ -1,12 +1,16 @@
 from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
-import re
+from .geo import parse_polygon
+from .phones import normalize_phone, validate_phone_number
+from .utils import parse_ingredients, parse_grams, format_grams
 
 class Order(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, verbose_name='Пользователь')
     customer_name = models.CharField(max_length=100, verbose_name='Имя клиента')
     customer_phone = models.CharField(max_length=20, verbose_name='Телефон')
+    # +7XXXXXXXXXX для точного поиска по телефону, пусто для некорректного номера
+    customer_phone_normalized = models.CharField(max_length=12, blank=True, db_index=True, editable=False, verbose_name='Телефон (нормализованный)')
     customer_address = models.TextField(blank=True, verbose_name='Адрес доставки')
     payment_method = models.CharField(max_length=20, choices=[
         ('cash', 'Наличными'),
@@ -25,18 +29,17 @@ class Order(models.Model):
 
     def clean(self):
         """Валидация данных перед сохранением"""
-        # Валидация телефона
         if self.customer_phone:
-            cleaned_phone = re.sub(r'[\s\-()+]', '', self.customer_phone)
-            if len(cleaned_phone) not in [10, 11]:
-                raise ValidationError({'customer_phone': 'Номер телефона должен содержать 10 или 11 цифр'})
-            
-            if not cleaned_phone.isdigit():
-                raise ValidationError({'customer_phone': 'Номер телефона должен содержать только цифры'})
+            is_valid, message = validate_phone_number(self.customer_phone)
+            if not is_valid:
+                raise ValidationError({'customer_phone': message})
     
     def save(self, *args, **kwargs):
-        # Вызываем clean() перед сохранением
-        self.clean()
+        # Номер проверяется формой и clean(), здесь только нормализуется (с кэшем)
+        self.customer_phone_normalized = normalize_phone(self.customer_phone)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'customer_phone' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'customer_phone_normalized'}
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -45,6 +48,10 @@ class Order(models.Model):
     class Meta:
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
+        indexes = [
+            # Список заказов в личном кабинете
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
@@ -58,9 +65,16 @@ class OrderItem(models.Model):
     product_title = models.CharField(max_length=200, verbose_name='Название товара')
     product_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Цена товара')
     quantity = models.IntegerField(verbose_name='Количество')
+    # Сумма позиции вычисляется в БД, по ней можно сортировать и агрегировать
+    line_total = models.GeneratedField(
+        expression=models.F('product_price') * models.F('quantity'),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        db_persist=True,
+        verbose_name='Сумма'
+    )
     
     def __str__(self):
-        return f"{self.product_title} x {self.quantity} (заказ #{self.order.id})"
+        return f"{self.product_title} x {self.quantity} (заказ #{self.order_id})"
     
     def save(self, *args, **kwargs):
         # Автоматически заполняем название и цену из продукта, если он указан
@@ -109,18 +123,45 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     
+    # Разобранные значения, вычисляются при сохранении
+    ingredients_list = models.JSONField(default=list, blank=True, editable=False, verbose_name='Список ингредиентов')
+    protein_grams = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True, editable=False, verbose_name='Белки (г)')
+    carbs_grams = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True, editable=False, verbose_name='Углеводы (г)')
+    
+    # Локальные миниатюры изображения (строятся командой build_thumbnails)
+    image_source = models.URLField(max_length=500, blank=True, editable=False, verbose_name='Ссылка, по которой построены миниатюры')
+    image_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name='Хэш изображения')
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Ширина изображения')
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='Высота изображения')
+    image_variants = models.JSONField(default=list, blank=True, editable=False, verbose_name='Ширины миниатюр')
+    
+    # Поля, из которых вычисляются разобранные значения
+    SOURCE_FIELDS = {'ingredients', 'protein', 'carbs'}
+    DERIVED_FIELDS = ['ingredients_list', 'protein_grams', 'carbs_grams']
+    
+    def update_derived_fields(self):
+        """Разбирает состав и пищевую ценность в типизированные поля"""
+        self.ingredients_list = parse_ingredients(self.ingredients)
+        self.protein_grams = parse_grams(self.protein)
+        self.carbs_grams = parse_grams(self.carbs)
+    
+    def save(self, *args, **kwargs):
+        self.update_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.SOURCE_FIELDS.intersection(update_fields):
+            kwargs['update_fields'] = {*update_fields, *self.DERIVED_FIELDS}
+        super().save(*args, **kwargs)
+    
     def get_ingredients_list(self):
         """Возвращает список ингредиентов"""
-        if self.ingredients:
-            return [ing.strip() for ing in self.ingredients.split(',')]
-        return []
+        return self.ingredients_list
     
     def get_nutrition_info(self):
         """Возвращает информацию о пищевой ценности"""
         return {
             'calories': f'{self.calories} ккал' if self.calories else 'Не указано',
-            'protein': f'{self.protein}г' if self.protein else 'Не указано',
-            'carbs': f'{self.carbs}г' if self.carbs else 'Не указано'
+            'protein': f'{format_grams(self.protein_grams)}г' if self.protein_grams is not None else 'Не указано',
+            'carbs': f'{format_grams(self.carbs_grams)}г' if self.carbs_grams is not None else 'Не указано'
         }
     
     def __str__(self):
@@ -135,4 +176,78 @@ class Product(models.Model):
             models.Index(fields=['category', 'is_available']),
             models.Index(fields=['title']),
             models.Index(fields=['price']),
-        ]
\ No newline at end of file
+            models.Index(fields=['protein_grams']),
+            models.Index(fields=['carbs_grams']),
+            models.Index(fields=['updated_at']),
+        ]
+class CartItem(models.Model):
+    """Позиция корзины авторизованного пользователя"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='cart_items', on_delete=models.CASCADE, verbose_name='Пользователь')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Товар')
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    def __str__(self):
+        return f"{self.product_id} x {self.quantity} (пользователь #{self.user_id})"
+    
+    class Meta:
+        verbose_name = 'Позиция корзины'
+        verbose_name_plural = 'Позиции корзины'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='menu_cartitem_user_product_uniq'),
+        ]
+
+
+class DeliveryZone(models.Model):
+    """Зона доставки (город) и ее тариф"""
+    key = models.SlugField(max_length=50, unique=True, verbose_name='Код')
+    name = models.CharField(max_length=100, verbose_name='Название')
+    label = models.CharField(max_length=150, blank=True, verbose_name='Подпись в корзине')
+    base_price = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='Базовая цена')
+    price_per_km = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name='Цена за км')
+    free_from = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True,
+        verbose_name='Бесплатно от суммы заказа'
+    )
+    distance_required = models.BooleanField(default=True, verbose_name='Нужно указать расстояние')
+    polygon = models.JSONField(
+        null=True, blank=True, verbose_name='Границы зоны',
+        help_text='Список точек [широта, долгота]. Адреса внутри границ относятся к этой зоне'
+    )
+    is_default = models.BooleanField(default=False, verbose_name='Для неизвестных городов')
+    is_active = models.BooleanField(default=True, verbose_name='Активна')
+    sort_order = models.PositiveIntegerField(default=0, verbose_name='Порядок')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    def clean(self):
+        # Некорректные границы сломали бы расчет доставки во всех корзинах
+        try:
+            parse_polygon(self.polygon)
+        except ValueError as e:
+            raise ValidationError({'polygon': str(e)})
+    
+    def __str__(self):
+        return self.name
+    
+    class Meta:
+        verbose_name = 'Зона доставки'
+        verbose_name_plural = 'Зоны доставки'
+        ordering = ['sort_order', 'id']
+
+
+class DeliveryBand(models.Model):
+    """Фиксированная цена доставки до указанного расстояния"""
+    zone = models.ForeignKey(DeliveryZone, related_name='bands', on_delete=models.CASCADE, verbose_name='Зона')
+    max_distance = models.PositiveIntegerField(verbose_name='До расстояния (км)')
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Цена')
+    
+    def __str__(self):
+        return f"{self.zone} до {self.max_distance} км: {self.price} руб."
+    
+    class Meta:
+        verbose_name = 'Ценовой диапазон'
+        verbose_name_plural = 'Ценовые диапазоны'
+        ordering = ['zone', 'max_distance']
+        constraints = [
+            models.UniqueConstraint(fields=['zone', 'max_distance'], name='menu_deliveryband_zone_distance_uniq'),
+        ]
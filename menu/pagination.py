@@ -0,0 +1,81 @@
+"""
+Сортировка и постраничный вывод меню по курсору (keyset pagination).
+
+Курсор хранит ключ сортировки последнего товара на странице, следующая
+страница начинается сразу после него. Поиск позиции выполняется
+бинарным поиском по заранее отсортированному списку, поэтому время
+отрисовки страницы не зависит от размера меню.
+"""
+import base64
+import json
+from bisect import bisect_right
+
+MENU_PAGE_SIZE = 12
+
+SORT_CHOICES = [
+    ('default', 'По категориям'),
+    ('price', 'Сначала дешевле'),
+    ('-price', 'Сначала дороже'),
+    ('title', 'По названию'),
+]
+
+# Ключи сортировки, ID товара добавляется к ключу для однозначности порядка
+SORT_KEYS = {
+    'default': lambda product: (product['category'], product['title'].casefold()),
+    'price': lambda product: (product['price'],),
+    '-price': lambda product: (-product['price'],),
+    'title': lambda product: (product['title'].casefold(),),
+}
+
+RELEVANCE_SORT = 'relevance'
+
+
+def sort_key(sort, product):
+    return SORT_KEYS[sort](product) + (product['id'],)
+
+
+def sort_products(products, sort):
+    """Сортирует товары, возвращает товары и их ключи"""
+    keyed = sorted((sort_key(sort, product), product) for product in products)
+    return [product for _, product in keyed], [key for key, _ in keyed]
+
+
+def rank_keys(products):
+    """Ключи для списка, уже упорядоченного по релевантности"""
+    return [(position, product['id']) for position, product in enumerate(products)]
+
+
+def encode_cursor(key):
+    data = json.dumps(list(key), ensure_ascii=False, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор, для поврежденного курсора возвращает None"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(key, list) or not key:
+        return None
+    return tuple(key)
+
+
+def paginate(products, keys, cursor=None, page_size=MENU_PAGE_SIZE):
+    """Возвращает товары страницы после курсора и курсор следующей страницы"""
+    start = 0
+    after = decode_cursor(cursor)
+    if after is not None:
+        try:
+            start = bisect_right(keys, after)
+        except TypeError:
+            # Курсор от другой сортировки
+            start = 0
+
+    end = start + page_size
+    page = products[start:end]
+    next_cursor = encode_cursor(keys[end - 1]) if end < len(products) else None
+    return page, next_cursor
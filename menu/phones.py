@@ -0,0 +1,79 @@
+"""
+Номера телефонов.
+
+Номер разбирается один раз и приводится к виду +7XXXXXXXXXX. В этом
+виде он хранится в индексированных полях phone_normalized заказов,
+бронирований и обращений, поэтому поиск клиента по телефону - точное
+совпадение по индексу, а не поиск подстроки по всей таблице.
+
+Регулярные выражения компилируются при импорте, код оператора
+проверяется диапазоном, результаты разбора кэшируются: один и тот же
+номер проверяется формой, затем сохраняется и ищется.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+SEPARATORS_RE = re.compile(r'[\s\-()+]')
+DIGITS_RE = re.compile(r'[0-9]+')
+# Мобильные коды операторов 9XX
+OPERATOR_CODES = range(900, 1000)
+
+ParsedPhone = namedtuple('ParsedPhone', ['number', 'error'])
+
+
+@lru_cache(maxsize=8192)
+def parse_phone(phone):
+    """Номер -> 10 цифр без кода страны или текст ошибки"""
+    if not phone:
+        return ParsedPhone('', 'Номер телефона обязателен')
+
+    digits = SEPARATORS_RE.sub('', phone)
+    if len(digits) not in (10, 11):
+        return ParsedPhone('', 'Номер телефона должен содержать 10 или 11 цифр')
+    if not DIGITS_RE.fullmatch(digits):
+        return ParsedPhone('', 'Номер телефона должен содержать только цифры')
+
+    # 8XXXXXXXXXX или +7XXXXXXXXXX
+    if len(digits) == 11:
+        if digits[0] not in '78':
+            return ParsedPhone('', 'Неверный код страны/оператора')
+        digits = digits[1:]
+
+    if int(digits[:3]) not in OPERATOR_CODES:
+        return ParsedPhone('', 'Неверный код оператора')
+    return ParsedPhone(digits, '')
+
+
+def validate_phone_number(phone):
+    """
+    Валидация российского номера телефона
+    Форматы: +7XXXXXXXXXX, 8XXXXXXXXXX, +7 (XXX) XXX-XX-XX, 8 (XXX) XXX-XX-XX
+    Возвращает (True, 10 цифр номера) или (False, текст ошибки)
+    """
+    number, error = parse_phone(phone)
+    if error:
+        return False, error
+    return True, number
+
+
+def normalize_phone(phone):
+    """+7XXXXXXXXXX для корректного номера, иначе пустая строка"""
+    number = parse_phone(phone).number
+    return f'+7{number}' if number else ''
+
+
+def format_phone_number(phone):
+    """
+    Форматирует телефон в единый формат: +7XXXXXXXXXX
+    """
+    cleaned_phone = SEPARATORS_RE.sub('', phone)
+
+    # Если 11 цифр и начинается с 8, меняем на 7
+    if len(cleaned_phone) == 11 and cleaned_phone[0] == '8':
+        cleaned_phone = '7' + cleaned_phone[1:]
+    # Если 10 цифр, добавляем 7
+    elif len(cleaned_phone) == 10:
+        cleaned_phone = '7' + cleaned_phone
+
+    return f"+{cleaned_phone}"
@@ -0,0 +1,312 @@
+"""
+Полнотекстовый поиск по меню.
+
+Индексируются название, описание, полное описание и состав товара.
+Нормализация учитывает особенности русского языка: регистр, ё/е и
+простой стемминг по окончаниям. Результаты ранжируются по
+релевантности (вес поля + редкость слова).
+
+На PostgreSQL используется GIN индекс по tsvector (см. миграцию
+0004_product_search_index), на остальных БД - инвертированный индекс
+в памяти процесса. Индекс в памяти строится по снимку кэша каталога и
+при изменении товаров обновляется инкрементально: переиндексируются
+только изменившиеся товары.
+"""
+import math
+import re
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+from .catalog import get_snapshot
+from .models import Product
+
+# Веса полей при ранжировании
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'ingredients': 1.5,
+    'description': 1.0,
+    'full_description': 0.5,
+}
+
+STOP_WORDS = frozenset([
+    'и', 'в', 'во', 'с', 'со', 'на', 'по', 'для', 'из', 'к', 'ко', 'от',
+    'а', 'но', 'или', 'не', 'до', 'за', 'о', 'об', 'у',
+])
+
+# Окончания для простого стемминга, от длинных к коротким
+ENDINGS = sorted([
+    'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ами', 'ями', 'иях', 'ией',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ый', 'ий', 'ой', 'ей', 'ую', 'юю',
+    'ых', 'их', 'ым', 'им', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ов', 'ев',
+    'ью', 'ия', 'ию', 'ть', 'ет', 'ут', 'ют', 'ит', 'ат', 'ят',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+], key=len, reverse=True)
+
+MIN_STEM_LENGTH = 3
+PREFIX_FACTOR = 0.8
+FUZZY_FACTOR = 0.5
+
+TOKEN_RE = re.compile(r'[0-9a-zа-я]+')
+
+# Совпадает с выражением GIN индекса из миграции 0004_product_search_index
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', translate(coalesce(title, ''), 'ёЁ', 'еЕ')), 'A') || "
+    "setweight(to_tsvector('russian', translate(coalesce(ingredients, ''), 'ёЁ', 'еЕ')), 'B') || "
+    "setweight(to_tsvector('russian', translate(coalesce(description, ''), 'ёЁ', 'еЕ')), 'C') || "
+    "setweight(to_tsvector('russian', translate(coalesce(full_description, ''), 'ёЁ', 'еЕ')), 'D')"
+)
+
+
+def normalize(text):
+    """Приводит текст к нижнему регистру и заменяет ё на е"""
+    return text.casefold().replace('ё', 'е')
+
+
+def stem(word):
+    """Отрезает типичное окончание, оставляя основу не короче MIN_STEM_LENGTH"""
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    """Разбивает текст на слова без стоп-слов"""
+    return [token for token in TOKEN_RE.findall(normalize(text or '')) if token not in STOP_WORDS]
+
+
+def analyze(text):
+    """Возвращает основы слов текста"""
+    return [stem(token) for token in tokenize(text)]
+
+
+def is_single_edit(a, b):
+    """Проверяет, что строки отличаются не более чем на одну правку
+    (вставка, удаление, замена или перестановка соседних букв)"""
+    if a == b:
+        return True
+    len_a, len_b = len(a), len(b)
+    if abs(len_a - len_b) > 1:
+        return False
+    if len_a > len_b:
+        a, b, len_a, len_b = b, a, len_b, len_a
+
+    i = 0
+    while i < len_a and a[i] == b[i]:
+        i += 1
+    if len_a == len_b:
+        if a[i + 1:] == b[i + 1:]:
+            return True
+        # Перестановка соседних букв
+        return (
+            i + 1 < len_a
+            and a[i] == b[i + 1] and a[i + 1] == b[i]
+            and a[i + 2:] == b[i + 2:]
+        )
+    return a[i:] == b[i + 1:]
+
+
+def product_fields(product):
+    """Текстовые поля словаря товара из кэша каталога"""
+    return {
+        'title': product['title'],
+        'ingredients': ' '.join(product['ingredients']),
+        'description': product['description'],
+        'full_description': product['full_description'],
+    }
+
+
+class InMemorySearchIndex:
+    """Инвертированный индекс по снимку каталога"""
+
+    def __init__(self):
+        self.version = None
+        self._lock = threading.Lock()
+        self._postings = {}      # основа -> {id товара: взвешенная частота}
+        self._doc_terms = {}     # id товара -> множество основ
+        self._fingerprints = {}  # id товара -> проиндексированные поля
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self.reindexed = 0
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def sync(self, snapshot):
+        """Приводит индекс в соответствие со снимком каталога"""
+        if snapshot.version == self.version:
+            return
+        with self._lock:
+            if snapshot.version == self.version:
+                return
+
+            for product_id in set(self._doc_terms) - set(snapshot.by_id):
+                self._remove(product_id)
+
+            for product in snapshot.products:
+                fields = product_fields(product)
+                fingerprint = tuple(fields.values())
+                if self._fingerprints.get(product['id']) != fingerprint:
+                    self._remove(product['id'])
+                    self._add(product['id'], fields, fingerprint)
+
+            self.version = snapshot.version
+
+    def _add(self, product_id, fields, fingerprint):
+        weights = {}
+        for field, text in fields.items():
+            for term in analyze(text):
+                weights[term] = weights.get(term, 0) + FIELD_WEIGHTS[field]
+
+        for term, weight in weights.items():
+            if term not in self._postings:
+                self._postings[term] = {}
+                self._vocabulary_dirty = True
+            self._postings[term][product_id] = weight
+
+        self._doc_terms[product_id] = set(weights)
+        self._fingerprints[product_id] = fingerprint
+        self.reindexed += 1
+
+    def _remove(self, product_id):
+        for term in self._doc_terms.pop(product_id, ()):
+            postings = self._postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                self._vocabulary_dirty = True
+        self._fingerprints.pop(product_id, None)
+
+    def _get_vocabulary(self):
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        return self._vocabulary
+
+    def _expand(self, term):
+        """Подбирает слова словаря для слова запроса: точное совпадение,
+        совпадение по префиксу и опечатка в одну букву"""
+        vocabulary = self._get_vocabulary()
+        expansions = {}
+        if term in self._postings:
+            expansions[term] = 1.0
+
+        if len(term) >= MIN_STEM_LENGTH:
+            index = bisect_left(vocabulary, term)
+            while index < len(vocabulary) and vocabulary[index].startswith(term):
+                expansions.setdefault(vocabulary[index], PREFIX_FACTOR)
+                index += 1
+
+        if not expansions and len(term) >= 4:
+            for candidate in vocabulary:
+                if abs(len(candidate) - len(term)) <= 1 and is_single_edit(term, candidate):
+                    expansions[candidate] = FUZZY_FACTOR
+        return expansions
+
+    def search(self, query):
+        """Возвращает ID товаров, отсортированные по релевантности"""
+        terms = list(dict.fromkeys(analyze(query)))
+        if not terms:
+            return []
+        with self._lock:
+            return self._search(terms)
+
+    def _search(self, terms):
+        total_docs = len(self._doc_terms)
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for candidate, factor in self._expand(term).items():
+                postings = self._postings[candidate]
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for product_id, weight in postings.items():
+                    score = factor * idf * weight * 2.2 / (weight + 1.2)
+                    if score > term_scores.get(product_id, 0):
+                        term_scores[product_id] = score
+
+            # Все слова запроса должны найтись в товаре
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    product_id: score + term_scores[product_id]
+                    for product_id, score in scores.items()
+                    if product_id in term_scores
+                }
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda product_id: -scores[product_id])
+
+
+class PythonSearchBackend:
+    """Поиск по индексу в памяти процесса (работает на любой БД)"""
+
+    def __init__(self):
+        self.index = InMemorySearchIndex()
+
+    def search(self, query):
+        snapshot = get_snapshot()
+        self.index.sync(snapshot)
+        # Индекс мог успеть обновиться до более нового снимка в другом потоке
+        return [
+            snapshot.by_id[product_id]
+            for product_id in self.index.search(query)
+            if product_id in snapshot.by_id
+        ]
+
+
+class PostgresSearchBackend:
+    """Поиск через tsvector и GIN индекс PostgreSQL"""
+
+    def build_tsquery(self, query):
+        # Слова содержат только буквы и цифры, поэтому безопасны для синтаксиса tsquery
+        return ' & '.join(f'{token}:*' for token in dict.fromkeys(tokenize(query)))
+
+    def search(self, query):
+        tsquery = self.build_tsquery(query)
+        if not tsquery:
+            return []
+
+        product_ids = (
+            Product.objects.filter(is_available=True)
+            .filter(RawSQL(
+                f"({SEARCH_VECTOR_SQL}) @@ to_tsquery('russian', %s)",
+                (tsquery,),
+                output_field=BooleanField(),
+            ))
+            .annotate(rank=RawSQL(
+                f"ts_rank({SEARCH_VECTOR_SQL}, to_tsquery('russian', %s))",
+                (tsquery,),
+                output_field=FloatField(),
+            ))
+            .order_by('-rank', 'title')
+            .values_list('id', flat=True)
+        )
+
+        snapshot = get_snapshot()
+        return [snapshot.by_id[product_id] for product_id in product_ids if product_id in snapshot.by_id]
+
+
+_backend = None
+
+
+def get_search_backend():
+    """Выбирает бэкенд поиска по настройке MENU_SEARCH_BACKEND или по типу БД"""
+    global _backend
+    if _backend is None:
+        name = getattr(settings, 'MENU_SEARCH_BACKEND', None)
+        if name is None:
+            name = 'postgresql' if connection.vendor == 'postgresql' else 'python'
+        _backend = PostgresSearchBackend() if name == 'postgresql' else PythonSearchBackend()
+    return _backend
+
+
+def search_products(query):
+    """Ищет доступные товары, возвращает словари из кэша каталога по убыванию релевантности"""
+    return get_search_backend().search(query)
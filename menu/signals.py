@@ -0,0 +1,50 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+
+from .cart_store import merge_anonymous_cart
+from .catalog import bump_catalog_version
+from .delivery import bump_tariffs_version
+from .images import build_product_thumbnails, needs_thumbnails
+from .models import DeliveryBand, DeliveryZone, Product
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """Инвалидирует кэш каталога при изменении товара"""
+    bump_catalog_version()
+    # Версия в общем кэше (CACHES), ее видят все процессы. Повторно
+    # увеличиваем после коммита: другой процесс мог собрать снимок из
+    # старых данных до фиксации транзакции
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Product)
+def product_image_changed(sender, instance, raw=False, **kwargs):
+    """Ставит в очередь построение миниатюр для нового изображения товара"""
+    # Задача фиксируется вместе с сохранением товара. build_thumbnails
+    # сохраняет через bulk_update, поэтому повторно задача не ставится
+    if not raw and needs_thumbnails(instance):
+        enqueue(build_product_thumbnails, product_id=instance.id, max_attempts=3)
+
+
+@receiver(post_save, sender=DeliveryZone)
+@receiver(post_delete, sender=DeliveryZone)
+@receiver(post_save, sender=DeliveryBand)
+@receiver(post_delete, sender=DeliveryBand)
+def tariff_changed(sender, instance, **kwargs):
+    """Перестраивает таблицу тарифов доставки при изменении зоны или диапазона"""
+    # Как у каталога: версия в общем кэше, повторно - после коммита
+    bump_tariffs_version()
+    transaction.on_commit(bump_tariffs_version)
+
+
+@receiver(user_logged_in)
+def cart_user_logged_in(sender, request, user, **kwargs):
+    """При входе переносит гостевую корзину в корзину пользователя"""
+    if request is not None and hasattr(request, 'COOKIES'):
+        merge_anonymous_cart(request, user)
@@ -1,6 +1,15 @@
+import json
+import shutil
+import tempfile
+from pathlib import Path
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 from django.test import TestCase
+from django.core.management import call_command
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from homepage.testing import count_queries
 from .models import Product, Order
 from .utils import validate_phone_number, format_phone_number
 
@@ -27,9 +36,9 @@ class MenuTests(TestCase):
         
         self.assertEqual(response.status_code, 302)
         
-        # Проверяем сессию
-        cart = self.client.session.get('cart', {})
-        self.assertEqual(cart.get(str(self.product.id)), 1)
+        # Корзина хранится в подписанной cookie, а не в сессии
+        response = self.client.get(reverse('menu:cart_view'))
+        self.assertEqual(response.context['cart_count'], 1)
     
     def test_cart_clearing(self):
         """Тест очистки корзины"""
@@ -61,7 +70,7 @@ class MenuTests(TestCase):
             'delivery_distance': 0,
             'customer_name': 'Иван Иванов',
             'customer_phone': '+7 (999) 123-45-67',
-            'customer_address': 'ул. Ленина, д. 10, кв. 5',
+            'customer_address': 'г. Тула, ул. Ленина, д. 10, кв. 5',
             'payment_method': 'cash'
         })
         
@@ -123,4 +132,967 @@ class MenuTests(TestCase):
         
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Детский завтрак')
-        self.assertContains(response, '250')
\ No newline at end of file
+        self.assertContains(response, '250')
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        from . import catalog
+        self.catalog = catalog
+        catalog.invalidate_catalog()
+        catalog.reset_catalog_stats()
+        self.product = Product.objects.create(
+            title='Блинчики',
+            description='Блинчики со сметаной',
+            price=180.00,
+            category='breakfast',
+            ingredients='мука, молоко, яйца',
+            is_available=True
+        )
+    
+    def test_menu_reads_without_queries_when_warm(self):
+        """Повторное чтение меню не обращается к БД"""
+        url = reverse('menu:menu_list')
+        self.client.get(url)
+        
+        with self.assertNumQueries(0):
+            products = self.catalog.get_available_products()
+            product = self.catalog.get_product(self.product.id)
+        
+        self.assertEqual(len(products), 1)
+        self.assertEqual(product['ingredients'], ['мука', 'молоко', 'яйца'])
+        stats = self.catalog.get_catalog_stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertGreaterEqual(stats['hits'], 2)
+    
+    def test_product_save_invalidates_catalog(self):
+        """Изменение товара сбрасывает кэш"""
+        self.assertIsNotNone(self.catalog.get_product(self.product.id))
+        
+        self.product.is_available = False
+        self.product.save()
+        self.assertIsNone(self.catalog.get_product(self.product.id))
+        
+        self.product.delete()
+        self.assertEqual(self.catalog.get_available_products(), [])
+    
+    def test_process_local_cache_is_reported(self):
+        """check --deploy предупреждает, если кэш версий не общий для процессов"""
+        from django.test import override_settings
+        from .checks import shared_cache_check
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([warning.id for warning in shared_cache_check(None)], ['menu.W001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache:6379/1'}}):
+            self.assertEqual(shared_cache_check(None), [])
+    
+    def test_menu_search_uses_catalog(self):
+        """Поиск по меню работает по кэшу каталога"""
+        url = reverse('menu:menu_list')
+        response = self.client.get(url, {'search': 'СМЕТАН'})
+        self.assertContains(response, 'Блинчики')
+        
+        response = self.client.get(url, {'search': 'пицца'})
+        self.assertNotContains(response, 'Блинчики')
+
+
+class MenuSearchTests(TestCase):
+    def setUp(self):
+        from .catalog import invalidate_catalog
+        invalidate_catalog()
+        self.pancakes = Product.objects.create(
+            title='Блинчики со сметаной',
+            description='Тонкие блины',
+            price=180.00,
+            category='breakfast',
+            ingredients='мука, молоко, сметана'
+        )
+        self.porridge = Product.objects.create(
+            title='Каша молочная',
+            description='Овсяная каша на молоке со смётаной',
+            price=150.00,
+            category='breakfast',
+            ingredients='овсяные хлопья, молоко'
+        )
+    
+    def search_titles(self, query):
+        from .search import search_products
+        return [product['title'] for product in search_products(query)]
+    
+    def test_normalization_and_stemming(self):
+        """Поиск не зависит от регистра, ё/е и окончаний"""
+        self.assertEqual(self.search_titles('БЛИНЧИК'), ['Блинчики со сметаной'])
+        self.assertEqual(self.search_titles('молочной каши'), ['Каша молочная'])
+        self.assertIn('Каша молочная', self.search_titles('сметана'))
+    
+    def test_ranking_prefers_title(self):
+        """Совпадение в названии выше совпадения в описании"""
+        self.assertEqual(
+            self.search_titles('сметана'),
+            ['Блинчики со сметаной', 'Каша молочная']
+        )
+    
+    def test_typo_tolerance(self):
+        """Опечатка в одну букву не мешает поиску"""
+        self.assertEqual(self.search_titles('блинчеки'), ['Блинчики со сметаной'])
+        self.assertEqual(self.search_titles('пицца'), [])
+    
+    def test_index_updates_incrementally(self):
+        """При сохранении товара переиндексируется только он"""
+        from .search import get_search_backend
+        self.search_titles('каша')
+        index = get_search_backend().index
+        reindexed = index.reindexed
+        
+        self.porridge.title = 'Каша рисовая'
+        self.porridge.save()
+        
+        self.assertEqual(self.search_titles('рисовая'), ['Каша рисовая'])
+        self.assertEqual(index.reindexed, reindexed + 1)
+
+
+class ProductNutritionTests(TestCase):
+    def test_derived_fields_on_save(self):
+        """Состав и пищевая ценность разбираются при сохранении"""
+        product = Product.objects.create(
+            title='Сырники',
+            description='Сырники с джемом',
+            price=200.00,
+            ingredients='творог, мука , яйца,',
+            calories=320,
+            protein='12,5 г',
+            carbs='30'
+        )
+        
+        self.assertEqual(product.ingredients_list, ['творог', 'мука', 'яйца'])
+        self.assertEqual(product.protein_grams, Decimal('12.50'))
+        self.assertEqual(product.get_nutrition_info(), {
+            'calories': '320 ккал',
+            'protein': '12.5г',
+            'carbs': '30г'
+        })
+        
+        product.carbs = 'нет данных'
+        product.save(update_fields=['carbs'])
+        product.refresh_from_db()
+        self.assertIsNone(product.carbs_grams)
+        self.assertEqual(product.get_nutrition_info()['carbs'], 'Не указано')
+    
+    def test_overlong_number_is_not_parsed(self):
+        """Слишком длинное число не роняет сохранение и считается неразобранным"""
+        product = Product.objects.create(title='Каша', description='Овсяная', price=120, protein='1' * 30)
+        
+        self.assertIsNone(product.protein_grams)
+        self.assertEqual(product.get_nutrition_info()['protein'], 'Не указано')
+    
+    def test_nutrition_range_query(self):
+        """По пищевой ценности можно фильтровать в БД"""
+        Product.objects.create(title='Салат', description='Овощи', price=150, protein='3')
+        Product.objects.create(title='Котлета', description='Мясо', price=250, protein='18.2')
+        
+        titles = Product.objects.filter(protein_grams__gte=10).values_list('title', flat=True)
+        self.assertEqual(list(titles), ['Котлета'])
+    
+    def test_backfill_command(self):
+        """Команда заполняет разобранные поля у старых записей"""
+        product = Product.objects.create(title='Морс', description='Ягодный', price=90)
+        Product.objects.filter(id=product.id).update(ingredients='клюква, вода', protein='1')
+        
+        call_command('backfill_product_nutrition', stdout=StringIO())
+        
+        product.refresh_from_db()
+        self.assertEqual(product.ingredients_list, ['клюква', 'вода'])
+        self.assertEqual(product.protein_grams, Decimal('1.00'))
+
+
+class MenuListingTests(TestCase):
+    def setUp(self):
+        from .catalog import invalidate_catalog
+        invalidate_catalog()
+        for index in range(15):
+            Product.objects.create(
+                title=f'Салат {index:02d}',
+                description='Свежие овощи',
+                price=100 + index,
+                category='salad'
+            )
+        Product.objects.create(title='Компот', description='Из сухофруктов', price=60, category='drink')
+    
+    def get_titles(self, response):
+        return [product['title'] for product in response.context['products']]
+    
+    def test_category_filter_and_counts(self):
+        """Фильтр по категории и количество товаров в категориях"""
+        response = self.client.get(reverse('menu:menu_list'), {'category': 'drink'})
+        
+        self.assertEqual(self.get_titles(response), ['Компот'])
+        counts = {category['key']: category['count'] for category in response.context['categories']}
+        self.assertEqual(counts['salad'], 15)
+        self.assertEqual(counts['drink'], 1)
+        self.assertEqual(response.context['all_categories_count'], 16)
+    
+    def test_keyset_pagination_with_sorting(self):
+        """Страницы по курсору идут подряд без пропусков и повторов"""
+        url = reverse('menu:menu_list')
+        response = self.client.get(url, {'sort': '-price'})
+        first_page = self.get_titles(response)
+        self.assertEqual(len(first_page), 12)
+        self.assertEqual(first_page[0], 'Салат 14')
+        
+        next_query = response.context['next_page_query']
+        self.assertTrue(next_query)
+        response = self.client.get(f'{url}?{next_query}')
+        second_page = self.get_titles(response)
+        
+        self.assertEqual(second_page, ['Салат 02', 'Салат 01', 'Салат 00', 'Компот'])
+        self.assertEqual(response.context['next_page_query'], '')
+    
+    def test_broken_cursor_returns_first_page(self):
+        """Поврежденный курсор не ломает страницу"""
+        response = self.client.get(reverse('menu:menu_list'), {'cursor': '%%%', 'sort': 'title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_titles(response)[0], 'Компот')
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        from .catalog import invalidate_catalog
+        invalidate_catalog()
+        self.product = Product.objects.create(
+            title='Пудинг',
+            description='Ванильный пудинг',
+            price=120.00,
+            category='dessert'
+        )
+    
+    def test_menu_not_modified(self):
+        """Меню отдает 304, пока каталог не менялся"""
+        url = reverse('menu:menu_list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        
+        with self.assertTemplateNotUsed('menu.html'):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        # Другие параметры запроса - другой ETag
+        response = self.client.get(url, {'category': 'dessert'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        
+        self.product.price = 130
+        self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '130')
+    
+    def test_product_detail_not_modified(self):
+        """Страница товара отдает 304 по If-Modified-Since"""
+        url = reverse('menu:product_detail', args=[self.product.id])
+        response = self.client.get(url)
+        last_modified = response['Last-Modified']
+        
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+    
+    def test_etag_depends_on_cart(self):
+        """Изменение корзины меняет ETag, так как счетчик выводится в шапке"""
+        url = reverse('menu:menu_list')
+        etag = self.client.get(url)['ETag']
+        
+        self.client.post(reverse('menu:add_to_cart', args=[self.product.id]))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Корзина (1)')
+
+
+class CatalogFeedTests(TestCase):
+    def setUp(self):
+        self.soup = Product.objects.create(title='Суп', description='Куриный', price=150.50, protein='8')
+        self.tea = Product.objects.create(title='Чай', description='Черный', price=50, is_available=False)
+    
+    def read_ndjson(self, response):
+        body = b''.join(response.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+    
+    def test_ndjson_with_field_selection(self):
+        """NDJSON поток с выбранными полями"""
+        response = self.client.get(reverse('menu:catalog_feed'), {'fields': 'id,title,price,protein'})
+        
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(self.read_ndjson(response), [
+            {'id': self.soup.id, 'title': 'Суп', 'price': 150.5, 'protein': 8.0}
+        ])
+    
+    def test_json_updated_since(self):
+        """Синхронизация возвращает и снятые с продажи товары"""
+        since = (self.soup.updated_at - timedelta(seconds=1)).isoformat()
+        response = self.client.get(reverse('menu:catalog_feed'), {
+            'format': 'json',
+            'fields': 'id,is_available',
+            'updated_since': since,
+        })
+        data = json.loads(b''.join(response.streaming_content))
+        
+        self.assertEqual(data['products'], [
+            {'id': self.soup.id, 'is_available': True},
+            {'id': self.tea.id, 'is_available': False},
+        ])
+        self.assertIn('generated_at', data)
+    
+    def test_invalid_parameters(self):
+        """Неизвестные поля и неверная дата дают 400"""
+        url = reverse('menu:catalog_feed')
+        self.assertEqual(self.client.get(url, {'fields': 'id,secret'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'updated_since': 'вчера'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'updated_since': '2024-02-30T00:00:00'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
+
+
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        from PIL import Image
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+        
+        # Локальный файл вместо внешнего сервера с изображениями
+        source = Path(self.tmp_dir) / 'source.png'
+        Image.new('RGB', (800, 400), (255, 200, 0)).save(source)
+        
+        settings_override = self.settings(
+            MENU_THUMBNAIL_ROOT=Path(self.tmp_dir) / 'thumbnails',
+            MENU_THUMBNAIL_SOURCE_SCHEMES=['http', 'https', 'file'],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        self.product = Product.objects.create(
+            title='Мороженое',
+            description='Пломбир',
+            price=90,
+            image=source.as_uri()
+        )
+    
+    def test_build_and_serve_thumbnails(self):
+        """Миниатюры строятся один раз и отдаются с долгим кэшированием"""
+        from .images import build_thumbnails, thumbnail_for
+        updated, errors = build_thumbnails(Product.objects.all(), workers=0)
+        self.assertEqual((updated, errors), (1, []))
+        
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_variants, [96, 320, 640, 800])
+        thumbnail = thumbnail_for(self.product)
+        self.assertEqual((thumbnail['width'], thumbnail['height']), (320, 160))
+        
+        response = self.client.get(thumbnail['src'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        
+        # Повторный запуск ничего не скачивает
+        self.assertEqual(build_thumbnails(Product.objects.all(), workers=0), (0, []))
+        
+        response = self.client.get(reverse('menu:menu_list'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, thumbnail['srcset_jpeg'])
+    
+    def test_rejects_local_sources(self):
+        """Без разрешения в настройках не скачиваются локальные файлы и внутренние адреса"""
+        from .images import ThumbnailError, fetch_source
+        with self.settings(MENU_THUMBNAIL_SOURCE_SCHEMES=['http', 'https']):
+            for url in (self.product.image, 'http://127.0.0.1:8000/admin/', 'http://[::1]/', 'http://10.0.0.5/image.png'):
+                with self.assertRaises(ThumbnailError):
+                    fetch_source(url)
+    
+    def test_command_uses_process_pool(self):
+        """Команда строит миниатюры в пуле процессов"""
+        call_command('build_thumbnails', workers=1, stdout=StringIO())
+        
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.image_hash)
+        
+        # Смена ссылки отключает старые миниатюры до следующего запуска
+        self.product.image = 'https://example.com/new.jpg'
+        self.product.save()
+        response = self.client.get(reverse('menu:product_detail', args=[self.product.id]))
+        self.assertContains(response, 'https://example.com/new.jpg')
+    
+    def test_broken_image_does_not_stop_others(self):
+        """Ошибка Pillow на одном изображении не прерывает построение остальных"""
+        from unittest import mock
+        from PIL import Image
+        from .images import build_thumbnails
+        small = Path(self.tmp_dir) / 'small.png'
+        Image.new('RGB', (10, 10), (0, 100, 200)).save(small)
+        other = Product.objects.create(title='Сок', description='Яблочный', price=60, image=small.as_uri())
+        
+        # Исходное изображение 800x400 становится «бомбой распаковки»
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000), self.assertLogs('menu.images', 'WARNING'):
+            updated, errors = build_thumbnails(Product.objects.order_by('id'), workers=0)
+        
+        self.assertEqual(updated, 1)
+        self.assertEqual(len(errors), 1)
+        self.assertIn('DecompressionBombError', errors[0])
+        other.refresh_from_db()
+        self.assertTrue(other.image_hash)
+    
+    def test_save_enqueues_thumbnail_job(self):
+        """Сохранение товара с новым изображением ставит построение миниатюр в очередь"""
+        from jobs.models import Job
+        from jobs.worker import claim_jobs, run_job
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.kwargs), ('menu.images.build_product_thumbnails', {'product_id': self.product.id}))
+        
+        self.assertTrue(run_job(claim_jobs('test', 1)[0]))
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.image_hash)
+        
+        # Без смены изображения задача не ставится
+        self.product.title = 'Эскимо'
+        self.product.save()
+        self.assertEqual(Job.objects.count(), 1)
+        
+        self.product.image = 'https://example.com/new.jpg'
+        self.product.save()
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_PENDING).count(), 1)
+
+
+class BulkImportExportTests(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+    
+    def write_file(self, name, content):
+        path = Path(self.tmp_dir) / name
+        path.write_text(content, encoding='utf-8')
+        return str(path)
+    
+    def test_csv_import_creates_and_updates(self):
+        """Импорт CSV создает новые товары и обновляет существующие"""
+        existing = Product.objects.create(title='Омлет', description='Из двух яиц', price=150)
+        path = self.write_file('products.csv', (
+            'id,title,description,price,category,protein,is_available\n'
+            f'{existing.id},Омлет,Из двух яиц,170,breakfast,9,да\n'
+            ',Лимонад,Домашний,120,drink,,1\n'
+            ',Без цены,Описание,,main,,1\n'
+        ))
+        out, err = StringIO(), StringIO()
+        
+        call_command('import_products', path, stdout=out, stderr=err)
+        
+        existing.refresh_from_db()
+        self.assertEqual(existing.price, Decimal('170.00'))
+        self.assertEqual(existing.category, 'breakfast')
+        self.assertEqual(existing.protein_grams, Decimal('9.00'))
+        self.assertTrue(Product.objects.filter(title='Лимонад', category='drink').exists())
+        self.assertIn('создано: 1, обновлено: 1', out.getvalue())
+        self.assertIn('строк/с', out.getvalue())
+        self.assertIn('Запись 3', err.getvalue())
+    
+    def test_oversized_values_are_row_errors(self):
+        """Значения, которые не помещаются в столбцы, отклоняются по строкам, остальные загружаются"""
+        from .bulk import RowError, clean_row
+        for row in (
+            {'title': 'Торт', 'price': '1e30'},
+            {'title': 'Торт', 'price': '123456789012'},
+            {'title': 'Т' * 201, 'price': '10'},
+            {'title': 'Торт', 'price': '10', 'image': 'https://example.com/' + 'a' * 500},
+            {'title': 'Торт', 'price': '10', 'calories': '99999999999999999999'},
+        ):
+            with self.assertRaises(RowError):
+                clean_row(row)
+        
+        path = self.write_file('products.ndjson', (
+            '{"title": "Торт", "price": "1e30"}\n'
+            '{"title": "Кисель", "description": "Ягодный", "price": 70}\n'
+        ))
+        err = StringIO()
+        call_command('import_products', path, stdout=StringIO(), stderr=err)
+        self.assertIn('Запись 1', err.getvalue())
+        self.assertEqual(list(Product.objects.values_list('title', flat=True)), ['Кисель'])
+    
+    def test_blank_availability_keeps_default(self):
+        """Пустой is_available не меняет доступность: новый товар доступен, существующий не меняется"""
+        hidden = Product.objects.create(title='Омлет', description='Из двух яиц', price=150, is_available=False)
+        path = self.write_file('products.csv', (
+            'id,title,description,price,is_available\n'
+            f'{hidden.id},Омлет,Из двух яиц,150,\n'
+            ',Лимонад,Домашний,120, \n'
+        ))
+        call_command('import_products', path, stdout=StringIO(), stderr=StringIO())
+        
+        hidden.refresh_from_db()
+        self.assertFalse(hidden.is_available)
+        self.assertTrue(Product.objects.get(title='Лимонад').is_available)
+    
+    def test_copy_rows_quote_values(self):
+        """В данных для COPY без кавычек пишется только NULL, текст \\N остается текстом"""
+        from .bulk import COPY_NULL, copy_rows
+        fields = [Product._meta.get_field(name) for name in ('title', 'description', 'calories', 'is_available')]
+        product = Product(title='\\N', description='Кофе "по-венски"\\', calories=None, is_available=True)
+        
+        self.assertEqual(
+            copy_rows([product], fields).getvalue(),
+            f'"\\N","Кофе ""по-венски""\\",{COPY_NULL},"t"\n',
+        )
+    
+    def test_dry_run_prints_diff(self):
+        """Пробный запуск показывает изменения и ничего не пишет"""
+        Product.objects.create(title='Морс', description='Клюквенный', price=80)
+        path = self.write_file('products.ndjson', (
+            '{"title": "Морс", "price": "90"}\n'
+            '{"title": "Кисель", "description": "Ягодный", "price": 70}\n'
+        ))
+        out = StringIO()
+        
+        call_command('import_products', path, match_by='title', dry_run=True, stdout=out, stderr=StringIO())
+        
+        self.assertIn("~ #", out.getvalue())
+        self.assertIn("price Decimal('80.00') -> Decimal('90.00')", out.getvalue())
+        self.assertIn('+ Кисель', out.getvalue())
+        self.assertEqual(Product.objects.get(title='Морс').price, Decimal('80.00'))
+        self.assertFalse(Product.objects.filter(title='Кисель').exists())
+    
+    def test_json_array_is_read_incrementally(self):
+        """JSON массив разбирается по элементам при чтении маленькими порциями"""
+        from .bulk import iter_json_array
+        stream = StringIO('[ {"title": "А, б"} ,\n{"title": "[в]"}]')
+        self.assertEqual(list(iter_json_array(stream, chunk_size=3)), [{'title': 'А, б'}, {'title': '[в]'}])
+    
+    def test_export_import_roundtrip(self):
+        """Выгрузка JSON загружается обратно без изменений"""
+        Product.objects.create(title='Торт', description='Шоколадный', price=350.5, calories=400)
+        path = str(Path(self.tmp_dir) / 'export.json')
+        call_command('export_products', format='json', output=path, stderr=StringIO())
+        
+        data = json.loads(Path(path).read_text(encoding='utf-8'))
+        self.assertEqual(data[0]['price'], '350.50')
+        
+        out = StringIO()
+        call_command('import_products', path, stdout=out, stderr=StringIO())
+        self.assertIn('без изменений: 1', out.getvalue())
+
+
+class CartHydrationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='cart@example.com', password='testpass123')
+        self.products = [
+            Product.objects.create(title=f'Блюдо {i}', description='Описание', price=100 + i)
+            for i in range(10)
+        ]
+    
+    def set_cart(self, cart):
+        from django.core.signing import get_cookie_signer
+        from .cart_store import CART_COOKIE_NAME, CART_COOKIE_SALT
+        value = ','.join(f'{product_id}:{quantity}' for product_id, quantity in cart.items())
+        signer = get_cookie_signer(salt=CART_COOKIE_NAME + CART_COOKIE_SALT)
+        self.client.cookies[CART_COOKIE_NAME] = signer.sign(value)
+    
+    def set_user_cart(self, cart):
+        from .models import CartItem
+        CartItem.objects.filter(user=self.user).delete()
+        CartItem.objects.bulk_create([
+            CartItem(user=self.user, product_id=product_id, quantity=quantity)
+            for product_id, quantity in cart.items()
+        ])
+    
+    def test_hydrate_cart_skips_missing_and_unavailable(self):
+        """Недоступные и удаленные товары отбрасываются в том же проходе"""
+        from .cart import hydrate_cart
+        hidden = Product.objects.create(title='Скрытое', description='Описание', price=50, is_available=False)
+        cart = {str(self.products[0].id): 2, str(hidden.id): 1, '999999': 1, 'abc': 1}
+        
+        with self.assertNumQueries(1):
+            hydrated = hydrate_cart(cart)
+        
+        self.assertEqual([line.product_id for line in hydrated], [self.products[0].id])
+        self.assertEqual(hydrated.total_price, 200.0)
+        self.assertEqual(hydrated.unavailable, [str(hidden.id)])
+        self.assertEqual(hydrated.missing, ['999999', 'abc'])
+    
+    def test_cart_view_query_count_is_constant(self):
+        """Количество запросов корзины не зависит от числа позиций"""
+        # Первый запрос создает сессию
+        self.client.get(reverse('menu:cart_view'))
+        self.set_cart({str(self.products[0].id): 1})
+        small = count_queries(self.client, reverse('menu:cart_view'))
+        
+        self.set_cart({str(product.id): 2 for product in self.products})
+        response = self.client.get(reverse('menu:cart_view'))
+        large = count_queries(self.client, reverse('menu:cart_view'))
+        
+        self.assertEqual(small, large)
+        self.assertEqual(response.context['total_price'], sum(float(p.price) * 2 for p in self.products))
+    
+    def test_cart_view_removes_unavailable_products(self):
+        """Снятый с продажи товар удаляется из корзины"""
+        self.set_cart({str(self.products[0].id): 1, str(self.products[1].id): 1})
+        Product.objects.filter(id=self.products[1].id).update(is_available=False)
+        
+        self.client.get(reverse('menu:cart_view'))
+        
+        from .cart_store import CART_COOKIE_NAME
+        self.assertIn(f'{self.products[0].id}:1', self.client.cookies[CART_COOKIE_NAME].value)
+        self.assertNotIn(f'{self.products[1].id}:1', self.client.cookies[CART_COOKIE_NAME].value)
+    
+    def test_create_order_query_count_is_constant(self):
+        """Оформление заказа не делает запрос на каждую позицию"""
+        from .models import OrderItem
+        self.client.login(email='cart@example.com', password='testpass123')
+        data = {
+            'delivery_method': 'pickup',
+            'customer_name': 'Мария',
+            'customer_phone': '+7 (999) 123-45-67',
+            'payment_method': 'cash',
+        }
+        
+        self.set_user_cart({self.products[0].id: 1})
+        small = count_queries(self.client, reverse('menu:create_order'), 'post', data, status=302)
+        self.set_user_cart({product.id: 1 for product in self.products})
+        large = count_queries(self.client, reverse('menu:create_order'), 'post', data, status=302)
+        
+        self.assertEqual(small, large)
+        self.assertEqual(OrderItem.objects.filter(order=Order.objects.latest('id')).count(), 10)
+        self.assertEqual(len(self.client.session['last_order']['items']), 10)
+
+
+class CartStoreTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='store@example.com', password='testpass123')
+        self.soup = Product.objects.create(title='Суп', description='Куриный', price=180)
+        self.tea = Product.objects.create(title='Чай', description='Черный', price=60)
+    
+    def test_anonymous_cart_in_signed_cookie(self):
+        """Корзина гостя хранится в подписанной cookie, сессия не меняется"""
+        from .cart_store import CART_COOKIE_NAME
+        self.client.get(reverse('menu:menu_list'))
+        session_key = self.client.session.session_key
+        
+        self.client.post(reverse('menu:add_to_cart', args=[self.soup.id]))
+        self.client.post(reverse('menu:add_to_cart', args=[self.soup.id]))
+        response = self.client.get(reverse('menu:cart_view'))
+        
+        self.assertEqual(response.context['cart_count'], 2)
+        self.assertNotIn('cart', self.client.session)
+        self.assertEqual(self.client.session.session_key, session_key)
+        
+        # Подделанная cookie игнорируется
+        self.client.cookies[CART_COOKIE_NAME] = f'{self.tea.id}:5'
+        response = self.client.get(reverse('menu:cart_view'))
+        self.assertEqual(response.context['cart_count'], 0)
+    
+    def test_user_cart_uses_table_and_merges_on_login(self):
+        """При входе гостевая корзина переносится в таблицу корзины пользователя"""
+        from .models import CartItem
+        CartItem.objects.create(user=self.user, product=self.soup, quantity=1)
+        self.client.post(reverse('menu:add_to_cart', args=[self.soup.id]))
+        self.client.post(reverse('menu:add_to_cart', args=[self.tea.id]))
+        
+        response = self.client.post(reverse('homepage:login'), {
+            'username': 'store@example.com', 'password': 'testpass123'
+        })
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+        
+        quantities = dict(CartItem.objects.filter(user=self.user).values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {self.soup.id: 2, self.tea.id: 1})
+        
+        self.client.post(reverse('menu:update_cart', args=[self.tea.id]), {'quantity': 3})
+        self.client.post(reverse('menu:remove_from_cart', args=[self.soup.id]))
+        quantities = dict(CartItem.objects.filter(user=self.user).values_list('product_id', 'quantity'))
+        self.assertEqual(quantities, {self.tea.id: 3})
+    
+    def test_cache_backend(self):
+        """Хранилище в кэше выдает гостю cookie с ID корзины"""
+        from django.test import override_settings
+        from .cart_store import CART_ID_COOKIE_NAME
+        with override_settings(MENU_CART_ANONYMOUS_BACKEND='menu.cart_store.CacheCartStore'):
+            self.client.post(reverse('menu:add_to_cart', args=[self.tea.id]))
+            self.assertIn(CART_ID_COOKIE_NAME, self.client.cookies)
+            response = self.client.get(reverse('menu:cart_view'))
+        self.assertEqual(response.context['cart_count'], 1)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='checkout@example.com', password='testpass123')
+        self.juice = Product.objects.create(title='Сок', description='Яблочный', price=90)
+        self.pie = Product.objects.create(title='Пирог', description='С вишней', price=210)
+        self.order_fields = {
+            'customer_name': 'Олег',
+            'customer_phone': '+7 (999) 123-45-67',
+            'delivery_method': 'delivery',
+            'delivery_city': 'tula',
+            'delivery_price': 100,
+        }
+    
+    def test_place_order_writes_order_and_items(self):
+        """Заказ и позиции создаются одной транзакцией, сводка ставится в очередь задач"""
+        from jobs.models import Job
+        from .checkout import place_order
+        cart = {str(self.juice.id): 2, str(self.pie.id): 1}
+        
+        order, hydrated = place_order(cart, user=self.user, **self.order_fields)
+        
+        self.assertEqual(order.total_price, 490)
+        job = Job.objects.get(task='menu.checkout.report_order')
+        self.assertEqual(job.kwargs, {'order_id': order.id})
+        self.assertEqual(
+            sorted(order.items.values_list('product_title', 'quantity')),
+            [('Пирог', 1), ('Сок', 2)]
+        )
+    
+    def test_failed_items_insert_rolls_back_order(self):
+        """Ошибка записи позиций не оставляет заказ без позиций"""
+        from unittest import mock
+        from jobs.models import Job
+        from .checkout import place_order
+        from .models import OrderItem
+        
+        with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=RuntimeError('сбой')):
+            with self.assertRaises(RuntimeError):
+                place_order({str(self.juice.id): 1}, user=self.user, **self.order_fields)
+        
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(Job.objects.exists())
+    
+    def test_unavailable_cart_raises(self):
+        """Корзина только из недоступных товаров не оформляется"""
+        from .checkout import CheckoutError, place_order
+        Product.objects.filter(id=self.juice.id).update(is_available=False)
+        with self.assertRaises(CheckoutError):
+            place_order({str(self.juice.id): 1}, **self.order_fields)
+        self.assertFalse(Order.objects.exists())
+    
+    def test_order_summary(self):
+        """Сводка заказа содержит позиции и итог"""
+        from .checkout import format_order_summary, place_order
+        order, _ = place_order({str(self.pie.id): 2}, user=self.user, **self.order_fields)
+        
+        summary = format_order_summary(order)
+        self.assertIn(f'Номер заказа: #{order.id}', summary)
+        self.assertIn('Пирог x 2 = 420.00 руб.', summary)
+        self.assertIn('Город: tula', summary)
+
+
+class DeliveryTariffTests(TestCase):
+    def setUp(self):
+        from . import delivery
+        self.delivery = delivery
+        delivery.invalidate_tariffs()
+    
+    def tearDown(self):
+        # Изменения тарифов откатываются вместе с транзакцией теста
+        self.delivery.invalidate_tariffs()
+    
+    def test_tariff_changes_rebuild_table(self):
+        """Изменение зоны или диапазона сразу меняет цену"""
+        from .models import DeliveryBand, DeliveryZone
+        self.assertEqual(self.delivery.calculate_delivery_price('moscow', 10), 450)
+        
+        moscow = DeliveryZone.objects.get(key='moscow')
+        moscow.free_from = 3000
+        moscow.save()
+        DeliveryBand.objects.create(zone=moscow, max_distance=5, price=250)
+        
+        self.assertEqual(self.delivery.calculate_delivery_price('moscow', 3), 250)
+        self.assertEqual(self.delivery.calculate_delivery_price('moscow', 10, subtotal=1000), 450)
+        self.assertEqual(self.delivery.calculate_delivery_price('moscow', 10, subtotal=3000), 0)
+        # Неизвестный город считается по зоне по умолчанию
+        self.assertEqual(self.delivery.calculate_delivery_price('kaluga', 5), 300)
+    
+    def test_version_bump_from_other_process(self):
+        """Таблица перестраивается, когда версию в общем кэше увеличил другой процесс"""
+        from django.core.cache import cache
+        from .models import DeliveryZone
+        self.assertEqual(self.delivery.calculate_delivery_price('moscow', 10), 450)
+        # Другой процесс сохранил зону: строка в БД и версия в кэше, сигналов в этом процессе нет
+        DeliveryZone.objects.filter(key='moscow').update(base_price=400)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.delivery.calculate_delivery_price('moscow', 10), 450)
+        cache.incr(self.delivery.TARIFFS_VERSION_KEY)
+        self.assertEqual(self.delivery.calculate_delivery_price('moscow', 10), 550)
+    
+    def test_batch_quote_without_queries(self):
+        """Пакетный расчет идет по таблице в памяти без запросов к БД"""
+        self.delivery.get_tariffs()
+        with self.assertNumQueries(0):
+            prices = self.delivery.quote_delivery([('tula', 30, None), ('moscow', 10, None), ('other', 5, 100)])
+        self.assertEqual(prices, [100, 450, 300])
+        
+        url = reverse('menu:delivery_quote')
+        response = self.client.post(url, json.dumps({'quotes': [
+            {'city': 'moscow', 'distance': 2},
+            {'city': 'other', 'distance': 'abc', 'subtotal': 500},
+        ]}), content_type='application/json')
+        self.assertEqual(response.json()['prices'], [330, 200])
+        
+        response = self.client.post(url, json.dumps({'quotes': [{'city': 'tula'}] * 1001}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+    
+    def test_cart_lists_cities_from_database(self):
+        """Список городов в корзине берется из зон доставки"""
+        from .models import DeliveryZone
+        DeliveryZone.objects.create(key='kaluga', name='Калуга', label='Калуга (от 250 руб)', base_price=250)
+        DeliveryZone.objects.filter(key='moscow').update(is_active=False)
+        self.delivery.invalidate_tariffs()
+        product = Product.objects.create(title='Суп', description='Суп дня', price=150, category='main')
+        self.client.post(reverse('menu:add_to_cart', args=[product.id]))
+        
+        response = self.client.get(reverse('menu:cart_view'))
+        self.assertContains(response, 'Калуга (от 250 руб)')
+        self.assertNotContains(response, 'value="moscow"')
+        self.assertContains(response, 'value="tula" data-distance="0"')
+
+
+class DeliveryGeoTests(TestCase):
+    def setUp(self):
+        from . import delivery
+        self.delivery = delivery
+        delivery.invalidate_tariffs()
+    
+    def tearDown(self):
+        self.delivery.invalidate_tariffs()
+    
+    def test_geocode_and_distance(self):
+        """Адрес разбирается по справочнику, расстояние - по формуле гаверсинусов"""
+        from .geo import geocode, haversine, point_in_polygon
+        self.assertAlmostEqual(haversine(54.1931, 37.6173, 55.7558, 37.6173), 173.8, delta=0.5)
+        self.assertTrue(point_in_polygon(0.5, 0.5, [(0, 0), (0, 1), (1, 1), (1, 0)]))
+        self.assertFalse(point_in_polygon(1.5, 0.5, [(0, 0), (0, 1), (1, 1), (1, 0)]))
+        
+        self.assertEqual(geocode('Тульская обл., г. Щекино, ул. Ленина, д. 5').name, 'Щёкино')
+        self.assertEqual(geocode('г. Тула, ул. Московская, д. 1').name, 'Тула')
+        self.assertEqual(geocode('пос. Косая Гора, ул. Гагарина 2').name, 'Косая Гора')
+        self.assertEqual(geocode('точка 54.205, 37.63').name, 'Тула')
+        self.assertIsNone(geocode('ул. Садовая, д. 7'))
+        # Координаты в адресе не заменяют названный населенный пункт
+        self.assertEqual(geocode('г. Щекино, ул. Ленина, 5, 54.205, 37.63'), geocode('г. Щекино'))
+    
+    def test_quote_by_address(self):
+        """Зона определяется по границам, расстояние - от кафе"""
+        from .delivery import quote_address
+        self.assertEqual(quote_address('г. Тула, ул. Ленина, 10')[:3:2], ('tula', 100))
+        
+        moscow = quote_address('Москва, Тверская ул., 1')
+        self.assertEqual(moscow.city, 'moscow')
+        self.assertEqual(moscow.price, 300 + 15 * moscow.distance)
+        
+        shchekino = quote_address('г. Щёкино, ул. Мира, 3')
+        self.assertEqual(shchekino.city, 'other')
+        self.assertEqual(shchekino.distance, 23)
+        self.assertEqual(quote_address('г. Щёкино, ул. Мира, 3, 54.205, 37.63'), shchekino)
+        
+        # Нераспознанный адрес не считается
+        self.assertIsNone(quote_address('ул. Садовая, д. 7'))
+    
+    def test_malformed_polygon(self):
+        """Некорректные границы отклоняются в clean(), а сохраненные в обход него не ломают расчет"""
+        from django.core.exceptions import ValidationError
+        from .delivery import MAX_DISTANCE, quote_address
+        from .models import DeliveryZone
+        zone = DeliveryZone.objects.get(key='moscow')
+        for polygon in ([[55, 37], [56, 38]], [[55, 37, 1], [56, 38], [55, 38]], {'lat': 55}, 'Москва',
+                        [[55, 37], [56, 38], [95, 38]], [[55, 37], [56, '38'], [55, 38]]):
+            zone.polygon = polygon
+            with self.assertRaises(ValidationError):
+                zone.clean()
+        zone.polygon = [[55, 37], [56, 38], [55, 38]]
+        zone.clean()
+        
+        DeliveryZone.objects.filter(key='moscow').update(polygon={'lat': 55})
+        self.delivery.invalidate_tariffs()
+        with self.assertLogs('menu.delivery', 'WARNING'):
+            self.assertEqual(self.delivery.calculate_delivery_price('moscow', 10), 450)
+        # Координаты на другом конце света - расстояние ограничено
+        self.assertEqual(quote_address('-33.865, 151.209').distance, MAX_DISTANCE)
+    
+    def test_order_uses_server_side_distance(self):
+        """Расстояние в заказе вычисляется по адресу, а не берется из формы"""
+        get_user_model().objects.create_user(email='geo@example.com', username='geo', password='testpass123')
+        self.client.login(email='geo@example.com', password='testpass123')
+        product = Product.objects.create(title='Суп', description='Суп дня', price=150, category='main')
+        self.client.post(reverse('menu:add_to_cart', args=[product.id]))
+        self.client.post(reverse('menu:create_order'), {
+            'delivery_method': 'delivery',
+            'delivery_city': 'tula',
+            'delivery_distance': '1',
+            'customer_name': 'Мария',
+            'customer_phone': '+7 (999) 123-45-67',
+            'customer_address': 'г. Алексин, ул. Мира, д. 1',
+            'payment_method': 'cash',
+        })
+        order = Order.objects.get()
+        self.assertEqual(order.delivery_city, 'other')
+        self.assertEqual(order.delivery_distance, 50)
+        self.assertEqual(order.delivery_price, 200 + 20 * 50)
+    
+    def test_unrecognised_address_is_rejected(self):
+        """Нераспознанный адрес - ошибка: город и расстояние из формы цену не задают"""
+        get_user_model().objects.create_user(email='geo@example.com', username='geo', password='testpass123')
+        self.client.login(email='geo@example.com', password='testpass123')
+        product = Product.objects.create(title='Суп', description='Суп дня', price=150, category='main')
+        self.client.post(reverse('menu:add_to_cart', args=[product.id]))
+        
+        response = self.client.post(reverse('menu:update_delivery_info'), {
+            'city': 'tula', 'distance': '0', 'address': 'ул. Садовая, д. 7',
+        })
+        self.assertFalse(response.json()['success'])
+        response = self.client.post(reverse('menu:update_delivery_info'), {'city': 'moscow', 'distance': '10'})
+        self.assertEqual(response.json()['delivery_price'], 450)
+        
+        response = self.client.post(reverse('menu:create_order'), {
+            'delivery_method': 'delivery',
+            'delivery_city': 'tula',
+            'delivery_distance': '0',
+            'customer_name': 'Мария',
+            'customer_phone': '+7 (999) 123-45-67',
+            'customer_address': 'ул. Садовая, д. 7, кв. 1',
+            'payment_method': 'cash',
+        })
+        self.assertRedirects(response, reverse('menu:cart_view'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.exists())
+
+
+class PhoneNormalizationTests(TestCase):
+    def test_normalize_phone(self):
+        """Разные записи одного номера приводятся к +7XXXXXXXXXX"""
+        from .phones import normalize_phone
+        for phone in ['+79991234567', '89991234567', '9991234567', '+7 (999) 123-45-67', '8 999 123 45 67']:
+            self.assertEqual(normalize_phone(phone), '+79991234567')
+        # Код оператора вне 900-999, чужой код страны, лишние символы
+        for phone in ['+74872123456', '+19991234567', '+7999123456a', '', None]:
+            self.assertEqual(normalize_phone(phone), '')
+        self.assertEqual(validate_phone_number('+7 (812) 123-45-67'), (False, 'Неверный код оператора'))
+    
+    def test_order_save_fills_normalized_phone(self):
+        """Нормализованный телефон заполняется при сохранении, в том числе с update_fields"""
+        order = Order.objects.create(customer_name='Клиент', customer_phone='8 (999) 123-45-67', total_price=100)
+        self.assertEqual(Order.objects.get(pk=order.pk).customer_phone_normalized, '+79991234567')
+        
+        order.customer_phone = '+7 916 000-00-01'
+        order.save(update_fields=['customer_phone'])
+        self.assertEqual(Order.objects.get(pk=order.pk).customer_phone_normalized, '+79160000001')
+    
+    def test_backfill_phones(self):
+        """Команда заполняет нормализованные телефоны у старых записей"""
+        from homepage.models import Booking
+        from contact_form.models import ContactMessage
+        order = Order.objects.create(customer_name='Клиент', customer_phone='89991234567', total_price=100)
+        user = User.objects.create_user(email='phone@example.com', username='phone', password='testpass123')
+        booking = Booking.objects.create(
+            user=user, event_date='2030-01-10', event_time='12:00', guests_count=5,
+            event_type='birthday', phone='+7 (999) 765-43-21',
+        )
+        message = ContactMessage.objects.create(name='Клиент', email='c@example.com', phone='9160000001', message='Текст')
+        # Записи, созданные до появления полей
+        Order.objects.update(customer_phone_normalized='')
+        Booking.objects.update(phone_normalized='')
+        ContactMessage.objects.update(phone_normalized='')
+        
+        out = StringIO()
+        call_command('backfill_phones', batch_size=1, stdout=out)
+        order.refresh_from_db()
+        booking.refresh_from_db()
+        message.refresh_from_db()
+        self.assertEqual(order.customer_phone_normalized, '+79991234567')
+        self.assertEqual(booking.phone_normalized, '+79997654321')
+        self.assertEqual(message.phone_normalized, '+79160000001')
@@ -1,5 +1,5 @@
-from django.urls import path
-from . import views
+from django.urls import path, re_path
+from . import views, api, images
 
 app_name = 'menu'
 
@@ -14,4 +14,7 @@ urlpatterns = [
     path('cart/update-delivery/', views.update_delivery_info, name='update_delivery_info'),
     path('order/create/', views.create_order, name='create_order'),
     path('order/success/', views.order_success, name='order_success'),
+    path('api/catalog/', api.catalog_feed, name='catalog_feed'),
+    path('api/delivery/quote/', api.delivery_quote, name='delivery_quote'),
+    re_path(r'^images/(?P<image_hash>[0-9a-f]{64})/(?P<width>[0-9]+)\.(?P<ext>webp|jpg)$', images.serve_thumbnail, name='thumbnail'),
 ]
\ No newline at end of file
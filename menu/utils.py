@@ -1,68 +1,42 @@
 import re
+from decimal import Decimal, InvalidOperation
 
-def validate_phone_number(phone):
+# Телефоны разбираются в menu.phones, здесь - для старых импортов
+from .phones import format_phone_number, validate_phone_number
+
+def parse_ingredients(ingredients):
+    """
+    Разбирает строку состава (через запятую) в список ингредиентов
+    """
+    if not ingredients:
+        return []
+    return [ing.strip() for ing in ingredients.split(',') if ing.strip()]
+
+def parse_grams(value):
     """
-    Валидация российского номера телефона
-    Форматы: +7XXXXXXXXXX, 8XXXXXXXXXX, +7 (XXX) XXX-XX-XX, 8 (XXX) XXX-XX-XX
+    Извлекает число граммов из произвольной строки: '12', '12,5 г', '12.5г'
+    Возвращает Decimal или None, если число не найдено
     """
-    if not phone:
-        return False, "Номер телефона обязателен"
-    
-    # Очищаем номер от пробелов, скобок, тире и плюсов
-    cleaned_phone = re.sub(r'[\s\-()+]', '', phone)
-    
-    # Проверяем длину (10-11 цифр)
-    if len(cleaned_phone) not in [10, 11]:
-        return False, "Номер телефона должен содержать 10 или 11 цифр"
-    
-    # Проверяем, что это только цифры
-    if not cleaned_phone.isdigit():
-        return False, "Номер телефона должен содержать только цифры"
-    
-    # Проверяем код страны/оператора
-    if len(cleaned_phone) == 11:
-        # Формат 8XXXXXXXXXX или +7XXXXXXXXXX (после очистки)
-        if cleaned_phone[0] not in ['7', '8']:
-            return False, "Неверный код страны/оператора"
-        # Убираем первый символ для дальнейшей проверки
-        cleaned_phone = cleaned_phone[1:]
-    
-    # Теперь должно быть 10 цифр
-    if len(cleaned_phone) != 10:
-        return False, "Неверная длина номера телефона"
-    
-    # Проверяем код оператора (первые 3 цифры после кода страны)
-    operator_code = cleaned_phone[:3]
-    valid_codes = ['900', '901', '902', '903', '904', '905', '906', '907', '908', '909',
-                   '910', '911', '912', '913', '914', '915', '916', '917', '918', '919',
-                   '920', '921', '922', '923', '924', '925', '926', '927', '928', '929',
-                   '930', '931', '932', '933', '934', '935', '936', '937', '938', '939',
-                   '940', '941', '942', '943', '944', '945', '946', '947', '948', '949',
-                   '950', '951', '952', '953', '954', '955', '956', '957', '958', '959',
-                   '960', '961', '962', '963', '964', '965', '966', '967', '968', '969',
-                   '970', '971', '972', '973', '974', '975', '976', '977', '978', '979',
-                   '980', '981', '982', '983', '984', '985', '986', '987', '988', '989',
-                   '990', '991', '992', '993', '994', '995', '996', '997', '998', '999']
-    
-    if operator_code not in valid_codes:
-        return False, "Неверный код оператора"
-    
-    return True, cleaned_phone
+    if not value:
+        return None
+    match = re.search(r'\d+(?:[.,]\d+)?', value)
+    if not match:
+        return None
+    try:
+        grams = Decimal(match.group().replace(',', '.')).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        # Слишком длинное число не помещается в точность Decimal
+        return None
+    # Значения больше 9999 г на порцию считаем опечаткой
+    if grams >= 10000:
+        return None
+    return grams
 
-def format_phone_number(phone):
+def format_grams(value):
     """
-    Форматирует телефон в единый формат: +7XXXXXXXXXX
+    Форматирует граммы без лишних нулей: Decimal('12.50') -> '12.5'
     """
-    # Очищаем номер
-    cleaned_phone = re.sub(r'[\s\-()+]', '', phone)
-    
-    # Если 11 цифр и начинается с 8, меняем на 7
-    if len(cleaned_phone) == 11 and cleaned_phone[0] == '8':
-        cleaned_phone = '7' + cleaned_phone[1:]
-    
-    # Если 10 цифр, добавляем 7
-    elif len(cleaned_phone) == 10:
-        cleaned_phone = '7' + cleaned_phone
-    
-    # Форматируем как +7XXXXXXXXXX
-    return f"+{cleaned_phone}"
\ No newline at end of file
+    text = format(value, 'f')
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return text
@@ -2,92 +2,47 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db import models
 from datetime import datetime
+from collections import Counter
+from urllib.parse import urlencode
 from .models import Product, Order, OrderItem
-from .utils import validate_phone_number, format_phone_number
-
-DELIVERY_CITIES = {
-    'tula': {
-        'name': 'Тула',
-        'base_price': 100,
-        'is_main_city': True,
-        'price_per_km': 10
-    },
-    'moscow': {
-        'name': 'Москва',
-        'base_price': 300,
-        'is_main_city': False,
-        'price_per_km': 15
-    },
-    'other': {
-        'name': 'Другой город',
-        'base_price': 200,
-        'is_main_city': False,
-        'price_per_km': 20
-    }
-}
-
-def calculate_delivery_price(city_key, distance_km=0):
-    """Рассчитывает стоимость доставки"""
-    if city_key not in DELIVERY_CITIES:
-        city_key = 'other'
-    
-    city = DELIVERY_CITIES[city_key]
-    
-    if city['is_main_city']:
-        # Для основного города - фиксированная цена
-        return city['base_price']
-    else:
-        # Для других городов - базовая цена + цена за км
-        return city['base_price'] + (distance_km * city['price_per_km'])
-
-def get_delivery_cities():
-    """Возвращает список городов для выбора"""
-    return [
-        {'key': 'tula', 'name': 'Тула (доставка 100 руб)'},
-        {'key': 'moscow', 'name': 'Москва (от 300 руб)'},
-        {'key': 'other', 'name': 'Другой город (расчет по расстоянию)'}
-    ]
+from .phones import validate_phone_number, format_phone_number
+from .catalog import get_available_products, get_product, get_snapshot
+from .pagination import SORT_CHOICES, SORT_KEYS, RELEVANCE_SORT, sort_products, rank_keys, paginate
+from .search import search_products
+from .conditional import catalog_conditional, menu_list_validators, product_detail_validators
+from .cart import hydrate_cart, load_products
+from .checkout import CheckoutError, place_order
+from .cart_store import get_cart
+from .delivery import (
+    ADDRESS_NOT_FOUND, DeliveryQuote, calculate_delivery_price, clean_distance, get_delivery_cities, get_tariffs,
+    quote_address,
+)
 
 def cart_view(request):
-    cart = request.session.get('cart', {})
-    cart_items = []
-    total_price = 0
+    cart = get_cart(request)
     
-    # Получаем продукты из БД
-    for product_id, quantity in cart.items():
-        try:
-            product = Product.objects.get(id=int(product_id), is_available=True)
-            item_total = float(product.price) * quantity
-            cart_items.append({
-                'product': {
-                    'id': product.id,
-                    'title': product.title,
-                    'price': float(product.price),
-                    'image': product.image
-                },
-                'quantity': quantity,
-                'total': item_total
-            })
-            total_price += item_total
-        except Product.DoesNotExist:
-            # Если товар не найден, удаляем его из корзины
-            cart.pop(product_id, None)
-            request.session['cart'] = cart
-            request.session.modified = True
+    # Все товары корзины загружаются одним запросом
+    hydrated = hydrate_cart(cart.items)
+    cart_items = [line.as_dict() for line in hydrated]
+    total_price = hydrated.total_price
+    
+    # Удаляем из корзины ненайденные и недоступные товары
+    for product_id in hydrated.invalid_keys:
+        cart.remove(product_id)
     
     # Получаем информацию о доставке из сессии
     delivery_city = request.session.get('delivery_city', 'tula')
     delivery_distance = request.session.get('delivery_distance', 0)
-    delivery_price = calculate_delivery_price(delivery_city, delivery_distance)
+    delivery_price = calculate_delivery_price(delivery_city, delivery_distance, total_price)
     
     context = {
         'cart_items': cart_items,
         'total_price': total_price,
-        'cart_count': sum(cart.values()),
+        'cart_count': cart.count(),
         'delivery_cities': get_delivery_cities(),
         'delivery_city': delivery_city,
+        'delivery_zone': get_tariffs().get_zone(delivery_city),
         'delivery_distance': delivery_distance,
         'delivery_price': delivery_price,
         'final_total': total_price + delivery_price
@@ -98,41 +53,40 @@ def update_delivery_info(request):
     """Обновляет информацию о доставке через AJAX"""
     if request.method == 'POST':
         city = request.POST.get('city', 'tula')
-        distance = int(request.POST.get('distance', 0))
+        distance = request.POST.get('distance', 0)
+        address = request.POST.get('address', '').strip()
+        
+        # Зона и расстояние по адресу; бесплатная доставка зависит от суммы корзины
+        subtotal = hydrate_cart(get_cart(request).items).total_price
+        tariffs = get_tariffs()
+        if address:
+            quote = tariffs.quote_address(address, subtotal)
+            if quote is None:
+                return JsonResponse({'success': False, 'message': ADDRESS_NOT_FOUND})
+        else:
+            # Без адреса - предварительная цена по выбранному городу, заказ все равно считается по адресу
+            distance = clean_distance(distance)
+            quote = DeliveryQuote(city, distance, tariffs.quote(city, distance, subtotal), None)
+        zone = tariffs.get_zone(quote.city)
         
         # Сохраняем в сессии
-        request.session['delivery_city'] = city
-        request.session['delivery_distance'] = distance
+        request.session['delivery_city'] = quote.city
+        request.session['delivery_distance'] = quote.distance
         request.session.modified = True
         
-        # Рассчитываем цену доставки
-        delivery_price = calculate_delivery_price(city, distance)
-        
         return JsonResponse({
             'success': True,
-            'delivery_price': delivery_price,
-            'city_name': DELIVERY_CITIES.get(city, DELIVERY_CITIES['other'])['name']
+            'delivery_price': quote.price,
+            'city': quote.city,
+            'distance': quote.distance,
+            'city_name': zone.name if zone else quote.city,
+            'located': quote.location.name if quote.location else None,
         })
     
     return JsonResponse({'success': False, 'message': 'Invalid request'})
 
 def add_to_cart(request, product_id):
     try:
-        # Принудительно создаем сессию если ее нет
-        if not request.session.session_key:
-            request.session.create()
-            request.session.modified = True
-        
-        # Убедимся, что сессия активна
-        if not request.session.session_key:
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                return JsonResponse({
-                    'success': False,
-                    'message': 'Ошибка сессии'
-                })
-            messages.error(request, 'Ошибка сессии')
-            return redirect('menu:menu_list')
-        
         # Проверяем существование продукта в БД
         try:
             product = Product.objects.get(id=product_id, is_available=True)
@@ -145,22 +99,9 @@ def add_to_cart(request, product_id):
             messages.error(request, 'Товар не найден или недоступен')
             return redirect('menu:menu_list')
         
-        cart = request.session.get('cart', {})
-        product_id_str = str(product_id)
-        
-        if product_id_str in cart:
-            cart[product_id_str] += 1
-        else:
-            cart[product_id_str] = 1
-        
-        # Сохраняем корзину в сессии
-        request.session['cart'] = cart
-        request.session.modified = True
-        
-        # Принудительно сохраняем сессию
-        request.session.save()
-
-        cart_count = sum(cart.values())
+        cart = get_cart(request)
+        cart.add(product_id)
+        cart_count = cart.count()
         
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({
@@ -183,23 +124,14 @@ def add_to_cart(request, product_id):
         return redirect('menu:menu_list')
 
 def remove_from_cart(request, product_id):
-    cart = request.session.get('cart', {})
-    product_id_str = str(product_id)
+    cart = get_cart(request)
     
     # Получаем информацию о продукте для сообщения
-    product_name = "Товар"
-    try:
-        product = Product.objects.get(id=product_id)
-        product_name = product.title
-    except Product.DoesNotExist:
-        pass
-    
-    if product_id_str in cart:
-        del cart[product_id_str]
-        request.session['cart'] = cart
-        request.session.modified = True
+    product = get_product(product_id)
+    product_name = product['title'] if product else "Товар"
     
-    cart_count = sum(cart.values())
+    cart.remove(product_id)
+    cart_count = cart.count()
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
@@ -214,9 +146,6 @@ def remove_from_cart(request, product_id):
 def update_cart(request, product_id):
     if request.method == 'POST':
         quantity = int(request.POST.get('quantity', 1))
-        cart = request.session.get('cart', {})
-        product_id_str = str(product_id)
-        
         # Проверяем существование продукта
         try:
             product = Product.objects.get(id=product_id, is_available=True)
@@ -224,28 +153,20 @@ def update_cart(request, product_id):
             messages.error(request, 'Товар не найден или недоступен')
             return redirect('menu:cart_view')
         
-        if quantity > 0:
-            cart[product_id_str] = quantity
-        else:
-            if product_id_str in cart:
-                del cart[product_id_str]
-        
-        request.session['cart'] = cart
-        request.session.modified = True
+        # Количество 0 удаляет позицию
+        get_cart(request).set(product_id, quantity)
     
-    cart_count = sum(cart.values())
     return redirect('menu:cart_view')
 
 def clear_cart(request):
-    if 'cart' in request.session:
-        del request.session['cart']
+    get_cart(request).clear()
     
     messages.success(request, 'Корзина очищена')
     return redirect('menu:cart_view')
 
 @login_required
 def create_order(request):
-    cart = request.session.get('cart', {})
+    cart = get_cart(request)
     
     if not cart:
         messages.error(request, 'Корзина пуста')
@@ -256,8 +177,6 @@ def create_order(request):
     
     # Получаем информацию о доставке из формы
     delivery_method = request.POST.get('delivery_method', 'pickup')
-    delivery_city = request.POST.get('delivery_city', '')
-    delivery_distance = int(request.POST.get('delivery_distance', 0))
     customer_name = request.POST.get('customer_name', '').strip()
     customer_phone_raw = request.POST.get('customer_phone', '').strip()
     customer_address = request.POST.get('customer_address', '').strip()
@@ -297,49 +216,21 @@ def create_order(request):
         if not customer_name:
             customer_name = request.user.username or request.user.email.split('@')[0]
     
-    # Рассчитываем стоимость доставки
+    # Рассчитываем стоимость доставки: зона и расстояние по адресу, а не со слов покупателя
     if delivery_method == 'delivery':
-        delivery_price = calculate_delivery_price(delivery_city, delivery_distance)
+        subtotal = hydrate_cart(cart.items).total_price
+        quote = quote_address(customer_address, subtotal)
+        if quote is None:
+            messages.error(request, ADDRESS_NOT_FOUND)
+            return redirect('menu:cart_view')
+        delivery_city, delivery_distance, delivery_price = quote.city, quote.distance, quote.price
     else:
-        delivery_price = 0
-    
-    # Рассчитываем общую стоимость товаров из БД
-    total_price = 0
-    order_items_data = []
-    order_items_for_session = []  # Для сохранения в сессии
+        delivery_city, delivery_distance, delivery_price = '', 0, 0
     
-    for product_id, quantity in cart.items():
-        try:
-            product = Product.objects.get(id=int(product_id), is_available=True)
-            item_total = float(product.price) * quantity
-            order_items_data.append({
-                'product': product,
-                'quantity': quantity,
-                'total': item_total
-            })
-            # Сохраняем информацию для сессии
-            order_items_for_session.append({
-                'product_id': product.id,
-                'product_title': product.title,
-                'product_price': float(product.price),
-                'quantity': quantity,
-                'total': item_total
-            })
-            total_price += item_total
-        except Product.DoesNotExist:
-            # Пропускаем недоступные товары
-            continue
-    
-    if not order_items_data:
-        messages.error(request, 'Все товары в корзине недоступны')
-        return redirect('menu:cart_view')
-    
-    final_total = total_price + delivery_price
-    
-    # СОХРАНЕНИЕ В БАЗУ ДАННЫХ
+    # СОХРАНЕНИЕ В БАЗУ ДАННЫХ (заказ и позиции в одной транзакции)
     try:
-        # Создаем заказ
-        order = Order.objects.create(
+        order, hydrated = place_order(
+            cart.items,
             user=request.user if request.user.is_authenticated else None,
             customer_name=customer_name,
             customer_phone=customer_phone,  # Используем отформатированный номер
@@ -348,40 +239,10 @@ def create_order(request):
             delivery_method=delivery_method,
             delivery_city=delivery_city,
             delivery_distance=delivery_distance,
-            delivery_price=delivery_price,
-            total_price=final_total
+            delivery_price=delivery_price
         )
-        
-        # Создаем элементы заказа с ссылкой на продукт
-        for item_data in order_items_data:
-            OrderItem.objects.create(
-                order=order,
-                product=item_data['product'],
-                product_title=item_data['product'].title,
-                product_price=item_data['product'].price,
-                quantity=item_data['quantity']
-            )
-        
-        # ВЫВОД В КОНСОЛЬ
-        print("=" * 60)
-        print("НОВЫЙ ЗАКАЗ СОХРАНЕН В БАЗУ ДАННЫХ:")
-        print(f"Номер заказа: #{order.id}")
-        print(f"Пользователь: {request.user.email if request.user.is_authenticated else 'Гость'}")
-        print(f"Клиент: {customer_name}")
-        print(f"Телефон: {customer_phone}")
-        print(f"Способ оплаты: {payment_method}")
-        print(f"Способ получения: {delivery_method}")
-        if delivery_method == 'delivery':
-            print(f"Адрес доставки: {customer_address}")
-            print(f"Город: {delivery_city}")
-            print(f"Расстояние: {delivery_distance} км")
-            print(f"Стоимость доставки: {delivery_price} руб.")
-        print("Товары:")
-        for item in order_items_data:
-            print(f"  - {item['product'].title} x {item['quantity']} = {item['total']} руб.")
-        print(f"Общая стоимость: {final_total} руб.")
-        print(f"Дата заказа: {order.created_at}")
-        print("=" * 60)
+        total_price = hydrated.total_price
+        final_total = total_price + delivery_price
         
         # Сохраняем заказ в сессии для страницы успеха
         request.session['last_order'] = {
@@ -394,7 +255,7 @@ def create_order(request):
             'delivery_distance': delivery_distance,
             'delivery_price': delivery_price,
             'customer_address': customer_address,
-            'items': order_items_for_session,
+            'items': [line.as_session_item() for line in hydrated],
             'total_price': total_price,
             'final_total': final_total,
             'created_at': str(datetime.now())
@@ -402,12 +263,14 @@ def create_order(request):
         request.session.modified = True
         
         # Очищаем корзину после создания заказа
-        if 'cart' in request.session:
-            del request.session['cart']
+        cart.clear()
         
         messages.success(request, f'Заказ #{order.id} успешно оформлен! Мы свяжемся с вами по телефону {customer_phone} для подтверждения.')
         return redirect('menu:order_success')
-        
+    
+    except CheckoutError as e:
+        messages.error(request, str(e))
+        return redirect('menu:cart_view')
     except Exception as e:
         print(f"Ошибка при сохранении заказа в БД: {e}")
         messages.error(request, f'Произошла ошибка при оформлении заказа: {str(e)}')
@@ -456,10 +319,10 @@ def order_success(request):
             
         except Order.DoesNotExist:
             # Если заказ не найден в БД, используем данные из сессии
-            return get_order_from_session(order_data)
+            return render(request, 'order_success.html', get_order_from_session(order_data))
     else:
         # Если нет ID заказа, используем данные из сессии
-        return get_order_from_session(order_data)
+        return render(request, 'order_success.html', get_order_from_session(order_data))
     
     context = {
         'order': order_data,
@@ -478,14 +341,10 @@ def get_order_from_session(order_data):
     
     # Получаем информацию о товарах из сессии
     items_from_session = order_data.get('items', [])
+    # Товары загружаем из БД одним запросом
+    products = load_products(item.get('product_id') for item in items_from_session)
     for item in items_from_session:
-        # Пытаемся получить продукт из БД по ID
-        product = None
-        if item.get('product_id'):
-            try:
-                product = Product.objects.get(id=item['product_id'])
-            except Product.DoesNotExist:
-                pass
+        product = products.get(item.get('product_id'))
         
         order_items_for_template.append({
             'product': {
@@ -509,85 +368,90 @@ def get_order_from_session(order_data):
         'final_total': final_total
     }
 
+@catalog_conditional(menu_list_validators)
 def menu_list(request):
-    # Получаем продукты из БД
-    products = Product.objects.filter(is_available=True)
-    
-    # Обработка поиска
     search_query = request.GET.get('search', '')
-    filtered_products = products
+    category = request.GET.get('category', '')
+    sort = request.GET.get('sort', '')
+    cursor = request.GET.get('cursor', '')
+    
+    category_names = dict(Product.CATEGORY_CHOICES)
+    if category not in category_names:
+        category = ''
     
     if search_query:
-        filtered_products = products.filter(
-            models.Q(title__icontains=search_query) |
-            models.Q(description__icontains=search_query) |
-            models.Q(full_description__icontains=search_query)
-        )
+        # Результаты поиска по умолчанию упорядочены по релевантности
+        found_products = search_products(search_query)
+        category_counts = Counter(product['category'] for product in found_products)
+        if category:
+            found_products = [product for product in found_products if product['category'] == category]
+        if sort in SORT_KEYS:
+            products, keys = sort_products(found_products, sort)
+        else:
+            sort = RELEVANCE_SORT
+            products, keys = found_products, rank_keys(found_products)
+    else:
+        # Порядок и счетчики категорий берем из кэша каталога
+        snapshot = get_snapshot()
+        category_counts = snapshot.category_counts
+        if sort not in SORT_KEYS:
+            sort = 'default'
+        products, keys = snapshot.get_ordering(sort, category)
     
-    # Форматируем для шаблона
-    products_for_template = []
-    for product in filtered_products:
-        products_for_template.append({
-            'id': product.id,
-            'title': product.title,
-            'description': product.description,
-            'price': float(product.price),
-            'image': product.image,
-            'full_description': product.full_description,
-            'ingredients': product.get_ingredients_list(),
-            'nutrition': product.get_nutrition_info()
-        })
+    page, next_cursor = paginate(products, keys, cursor)
+    
+    def build_query(**params):
+        query = {'search': search_query, 'category': category, 'sort': sort, **params}
+        return urlencode({key: value for key, value in query.items() if value})
+    
+    categories = [
+        {
+            'key': key,
+            'name': name,
+            'count': category_counts.get(key, 0),
+            'query': build_query(category=key),
+        }
+        for key, name in Product.CATEGORY_CHOICES
+    ]
+    
+    sort_choices = list(SORT_CHOICES)
+    if search_query:
+        sort_choices.insert(0, (RELEVANCE_SORT, 'По релевантности'))
     
     context = {
-        'products': products_for_template,
+        'products': page,
         'title': 'Меню детского кафе "Радуга"',
         'search_query': search_query,
+        'total_count': len(products),
+        'categories': categories,
+        'all_categories_count': sum(category_counts.values()),
+        'all_categories_query': build_query(category=''),
+        'current_category': category,
+        'sort_choices': sort_choices,
+        'current_sort': sort,
+        'next_page_query': build_query(cursor=next_cursor) if next_cursor else '',
+        'cursor': cursor,
+        'catalog_version': get_snapshot().version,
     }
     
     return render(request, 'menu.html', context)
 
+@catalog_conditional(product_detail_validators)
 def product_detail(request, product_id):
-    try:
-        product = Product.objects.get(id=product_id, is_available=True)
-        
-        context = {
-            'product': {
-                'id': product.id,
-                'title': product.title,
-                'description': product.description,
-                'price': float(product.price),
-                'image': product.image,
-                'full_description': product.full_description,
-                'ingredients': product.get_ingredients_list(),
-                'nutrition': product.get_nutrition_info()
-            }
-        }
-        
-        return render(request, 'product_detail.html', context)
-        
-    except Product.DoesNotExist:
+    product = get_product(product_id)
+    
+    if product is None:
         context = {
             'error_message': 'Товар не найден или временно недоступен'
         }
         return render(request, 'product_not_found.html', context)
+    
+    return render(request, 'product_detail.html', {'product': product})
 
 # Вспомогательная функция для получения продуктов из БД (для совместимости со старым кодом)
 def get_products_from_db():
-    """Получает список продуктов из БД (для обратной совместимости)"""
-    products = Product.objects.filter(is_available=True)
-    return [
-        {
-            'id': product.id,
-            'title': product.title,
-            'description': product.description,
-            'price': float(product.price),
-            'image': product.image,
-            'full_description': product.full_description,
-            'ingredients': product.get_ingredients_list(),
-            'nutrition': product.get_nutrition_info()
-        }
-        for product in products
-    ]
+    """Получает список продуктов из кэша каталога (для обратной совместимости)"""
+    return get_available_products()
 
 # Псевдоним для обратной совместимости
-get_products_list = get_products_from_db
\ No newline at end of file
+get_products_list = get_products_from_db
@@ -0,0 +1,31 @@
+from django.contrib import admin
+from .models import DailySales, DailyProductSales, RollupState
+
+
+class ReadOnlyRollupAdmin(admin.ModelAdmin):
+    """Сводки заполняются командой refresh_rollups и не редактируются вручную"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailySales)
+class DailySalesAdmin(ReadOnlyRollupAdmin):
+    list_display = ['date', 'delivery_method', 'delivery_city', 'payment_method', 'orders_count', 'revenue']
+    list_filter = ['delivery_method', 'payment_method']
+    date_hierarchy = 'date'
+
+
+@admin.register(DailyProductSales)
+class DailyProductSalesAdmin(ReadOnlyRollupAdmin):
+    list_display = ['date', 'product_title', 'units', 'revenue']
+    search_fields = ['product_title']
+    date_hierarchy = 'date'
+
+
+@admin.register(RollupState)
+class RollupStateAdmin(ReadOnlyRollupAdmin):
+    list_display = ['name', 'last_order_id', 'updated_at']
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from reports.rollups import BATCH_SIZE, SETTLE_DELAY, rebuild_rollups, refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Учитывает новые заказы в дневных сводках продаж'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Сколько заказов обрабатывать в одной транзакции')
+        parser.add_argument(
+            '--settle-seconds', type=int, default=int(SETTLE_DELAY.total_seconds()),
+            help='Заказы моложе этого срока учитываются при следующем запуске',
+        )
+        parser.add_argument('--rebuild', action='store_true', help='Пересобрать сводки с нуля')
+
+    def handle(self, *args, **options):
+        refresh = rebuild_rollups if options['rebuild'] else refresh_rollups
+        processed = refresh(
+            batch_size=options['batch_size'],
+            settle_delay=timedelta(seconds=options['settle_seconds']),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Учтено заказов: {processed}'))
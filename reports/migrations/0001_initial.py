@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Сводка')),
+                ('last_order_id', models.BigIntegerField(default=0, verbose_name='Последний учтенный заказ')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Состояние сводки',
+                'verbose_name_plural': 'Состояние сводок',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('product_id', models.IntegerField(blank=True, null=True, verbose_name='ID товара')),
+                ('product_title', models.CharField(max_length=200, verbose_name='Название товара')),
+                ('units', models.PositiveIntegerField(default=0, verbose_name='Продано, шт.')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+            ],
+            options={
+                'verbose_name': 'Продажи товара за день',
+                'verbose_name_plural': 'Продажи товаров по дням',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'product_id', 'product_title'), name='reports_dailyproductsales_key_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('delivery_method', models.CharField(max_length=20, verbose_name='Способ получения')),
+                ('delivery_city', models.CharField(blank=True, max_length=50, verbose_name='Город доставки')),
+                ('payment_method', models.CharField(max_length=20, verbose_name='Способ оплаты')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('delivery_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка за доставку')),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи по дням',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'delivery_method', 'delivery_city', 'payment_method'), name='reports_dailysales_key_uniq')],
+            },
+        ),
+    ]
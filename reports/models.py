@@ -0,0 +1,64 @@
+from django.db import models
+
+
+class DailySales(models.Model):
+    """Продажи за день в разрезе способа получения, города и способа оплаты"""
+    date = models.DateField(verbose_name='Дата')
+    delivery_method = models.CharField(max_length=20, verbose_name='Способ получения')
+    delivery_city = models.CharField(max_length=50, blank=True, verbose_name='Город доставки')
+    payment_method = models.CharField(max_length=20, verbose_name='Способ оплаты')
+    orders_count = models.PositiveIntegerField(default=0, verbose_name='Заказов')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Выручка')
+    delivery_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Выручка за доставку')
+    
+    def __str__(self):
+        return f"{self.date} {self.delivery_method} {self.delivery_city} {self.payment_method}"
+    
+    class Meta:
+        verbose_name = 'Продажи за день'
+        verbose_name_plural = 'Продажи по дням'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'delivery_method', 'delivery_city', 'payment_method'],
+                name='reports_dailysales_key_uniq',
+            ),
+        ]
+
+
+class DailyProductSales(models.Model):
+    """Продажи товара за день"""
+    date = models.DateField(verbose_name='Дата')
+    # Без внешнего ключа: сводка хранит и товары, удаленные из меню
+    product_id = models.IntegerField(null=True, blank=True, verbose_name='ID товара')
+    product_title = models.CharField(max_length=200, verbose_name='Название товара')
+    units = models.PositiveIntegerField(default=0, verbose_name='Продано, шт.')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Выручка')
+    
+    def __str__(self):
+        return f"{self.date} {self.product_title}"
+    
+    class Meta:
+        verbose_name = 'Продажи товара за день'
+        verbose_name_plural = 'Продажи товаров по дням'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'product_id', 'product_title'],
+                name='reports_dailyproductsales_key_uniq',
+            ),
+        ]
+
+
+class RollupState(models.Model):
+    """Отметка обработанных заказов (high-water mark) для сводок"""
+    name = models.CharField(max_length=50, unique=True, verbose_name='Сводка')
+    last_order_id = models.BigIntegerField(default=0, verbose_name='Последний учтенный заказ')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+    
+    def __str__(self):
+        return f"{self.name}: до заказа #{self.last_order_id}"
+    
+    class Meta:
+        verbose_name = 'Состояние сводки'
+        verbose_name_plural = 'Состояние сводок'
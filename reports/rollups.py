@@ -0,0 +1,160 @@
+"""
+Дневные сводки продаж.
+
+Сводки обновляются инкрементально: в RollupState хранится ID последнего
+учтенного заказа (high-water mark), при обновлении агрегируются только
+заказы после него, и их суммы прибавляются к строкам сводок. Заказы
+обрабатываются пачками, каждая пачка и сдвиг отметки - в одной
+транзакции, поэтому прерванное обновление не учитывает заказ дважды.
+
+Заказ моложе SETTLE_DELAY еще может быть в незафиксированной транзакции,
+а заказы с ID больше него - уже зафиксированы. Такие заказы и все после
+них ждут следующего обновления, иначе отметка перепрыгнула бы их.
+
+Изменения и удаления уже учтенных заказов в сводки не попадают, для
+этого сводки пересобираются (rebuild_rollups).
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from menu.models import Order, OrderItem
+
+from .models import DailyProductSales, DailySales, RollupState
+
+ROLLUP_NAME = 'daily_sales'
+BATCH_SIZE = 1000
+SETTLE_DELAY = timedelta(minutes=5)
+
+SALES_KEY = ('date', 'delivery_method', 'delivery_city', 'payment_method')
+PRODUCT_KEY = ('date', 'product_id', 'product_title')
+
+
+def settled_limit(last_order_id, settle_delay):
+    """ID первого заказа после отметки, который еще рано учитывать"""
+    cutoff = timezone.now() - settle_delay
+    return (
+        Order.objects.filter(id__gt=last_order_id, created_at__gte=cutoff)
+        .order_by('id').values_list('id', flat=True).first()
+    )
+
+
+def sales_deltas(orders):
+    return (
+        orders.annotate(date=TruncDate('created_at'))
+        .values(*SALES_KEY)
+        .annotate(orders_count=Count('id'), revenue=Sum('total_price'), delivery_revenue=Sum('delivery_price'))
+        .order_by()
+    )
+
+
+def product_deltas(items):
+    return (
+        items.annotate(date=TruncDate('order__created_at'))
+        .values(*PRODUCT_KEY)
+        .annotate(units=Sum('quantity'), revenue=Sum('line_total'))
+        .order_by()
+    )
+
+
+def apply_deltas(model, key_fields, sum_fields, deltas):
+    """Прибавляет суммы к строкам сводки, недостающие строки создает"""
+    deltas = list(deltas)
+    if not deltas:
+        return
+    dates = {delta['date'] for delta in deltas}
+    existing = {
+        tuple(getattr(row, field) for field in key_fields): row
+        for row in model.objects.select_for_update().filter(date__in=dates)
+    }
+    created, changed = [], {}
+    for delta in deltas:
+        key = tuple(delta[field] for field in key_fields)
+        row = existing.get(key)
+        if row is None:
+            row = model(**{field: delta[field] for field in key_fields})
+            for field in sum_fields:
+                setattr(row, field, 0)
+            existing[key] = row
+            created.append(row)
+        elif row.pk is not None:
+            changed[key] = row
+        for field in sum_fields:
+            setattr(row, field, getattr(row, field) + (delta[field] or 0))
+    model.objects.bulk_create(created)
+    model.objects.bulk_update(list(changed.values()), sum_fields)
+
+
+def refresh_batch(batch_size, limit_id):
+    """Учитывает следующую пачку заказов, возвращает количество заказов"""
+    with transaction.atomic():
+        state, _ = RollupState.objects.select_for_update().get_or_create(name=ROLLUP_NAME)
+        pending = Order.objects.filter(id__gt=state.last_order_id)
+        if limit_id is not None:
+            pending = pending.filter(id__lt=limit_id)
+        ids = list(pending.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return 0
+
+        orders = Order.objects.filter(id__gt=state.last_order_id, id__lte=ids[-1])
+        apply_deltas(DailySales, SALES_KEY, ['orders_count', 'revenue', 'delivery_revenue'], sales_deltas(orders))
+        items = OrderItem.objects.filter(order__id__gt=state.last_order_id, order__id__lte=ids[-1])
+        apply_deltas(DailyProductSales, PRODUCT_KEY, ['units', 'revenue'], product_deltas(items))
+
+        state.last_order_id = ids[-1]
+        state.save(update_fields=['last_order_id', 'updated_at'])
+    return len(ids)
+
+
+def refresh_rollups(batch_size=BATCH_SIZE, settle_delay=SETTLE_DELAY):
+    """Учитывает в сводках новые заказы, возвращает количество заказов"""
+    state, _ = RollupState.objects.get_or_create(name=ROLLUP_NAME)
+    limit_id = settled_limit(state.last_order_id, settle_delay)
+    processed = 0
+    while True:
+        count = refresh_batch(batch_size, limit_id)
+        if not count:
+            return processed
+        processed += count
+
+
+def rebuild_rollups(batch_size=BATCH_SIZE, settle_delay=SETTLE_DELAY):
+    """Пересобирает сводки с нуля"""
+    with transaction.atomic():
+        DailySales.objects.all().delete()
+        DailyProductSales.objects.all().delete()
+        RollupState.objects.update_or_create(name=ROLLUP_NAME, defaults={'last_order_id': 0})
+    return refresh_rollups(batch_size, settle_delay)
+
+
+def sales_summary(start, end):
+    """Данные дашборда за период, только из таблиц сводок"""
+    sales = DailySales.objects.filter(date__gte=start, date__lte=end)
+    totals_fields = {
+        'orders_count': Sum('orders_count'),
+        'revenue': Sum('revenue'),
+        'delivery_revenue': Sum('delivery_revenue'),
+    }
+    totals = sales.aggregate(**totals_fields)
+    totals['average_check'] = (
+        (totals['revenue'] / totals['orders_count']).quantize(Decimal('0.01'))
+        if totals['orders_count'] else None
+    )
+    state = RollupState.objects.filter(name=ROLLUP_NAME).first()
+    return {
+        'totals': totals,
+        'by_day': sales.values('date').annotate(**totals_fields).order_by('date'),
+        'by_delivery': sales.values('delivery_method', 'delivery_city').annotate(**totals_fields).order_by('-revenue'),
+        'by_payment': sales.values('payment_method').annotate(**totals_fields).order_by('-revenue'),
+        'top_products': (
+            DailyProductSales.objects.filter(date__gte=start, date__lte=end)
+            .values('product_id', 'product_title')
+            .annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('-revenue')[:20]
+        ),
+        'state': state,
+    }
@@ -0,0 +1,154 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from menu.models import Order, OrderItem, Product
+from .models import DailyProductSales, DailySales, RollupState
+from .rollups import ROLLUP_NAME, refresh_rollups
+
+User = get_user_model()
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.soup = Product.objects.create(title='Суп', description='Описание', price=150)
+        self.tea = Product.objects.create(title='Чай', description='Описание', price=50)
+    
+    def create_order(self, days_ago=0, delivery_method='pickup', city='', payment_method='cash', delivery_price=0):
+        order = Order.objects.create(
+            customer_name='Клиент', customer_phone='+79991234567',
+            delivery_method=delivery_method, delivery_city=city, payment_method=payment_method,
+            delivery_price=delivery_price, total_price=Decimal('250') + delivery_price,
+        )
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(days=days_ago, hours=1))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.soup, product_title='Суп', product_price=150, quantity=1),
+            OrderItem(order=order, product=self.tea, product_title='Чай', product_price=50, quantity=2),
+        ])
+        return order
+    
+    def test_refresh_is_incremental(self):
+        """Повторное обновление учитывает только новые заказы"""
+        self.create_order()
+        self.create_order(delivery_method='delivery', city='tula', payment_method='card', delivery_price=100)
+        self.assertEqual(refresh_rollups(batch_size=1), 2)
+        self.assertEqual(refresh_rollups(), 0)
+        
+        last = self.create_order()
+        self.assertEqual(refresh_rollups(), 1)
+        self.assertEqual(RollupState.objects.get(name=ROLLUP_NAME).last_order_id, last.id)
+        
+        pickup = DailySales.objects.get(delivery_method='pickup', payment_method='cash')
+        self.assertEqual((pickup.orders_count, pickup.revenue), (2, Decimal('500')))
+        delivery = DailySales.objects.get(delivery_city='tula')
+        self.assertEqual((delivery.orders_count, delivery.revenue, delivery.delivery_revenue), (1, Decimal('350'), Decimal('100')))
+        tea = DailyProductSales.objects.get(product_id=self.tea.id)
+        self.assertEqual((tea.units, tea.revenue), (6, Decimal('300')))
+    
+    def test_recent_orders_wait_for_settle_delay(self):
+        """Свежий заказ и заказы после него ждут следующего обновления"""
+        old = self.create_order(days_ago=1)
+        recent = self.create_order()
+        Order.objects.filter(id=recent.id).update(created_at=timezone.now())
+        self.create_order(days_ago=1)
+        
+        self.assertEqual(refresh_rollups(settle_delay=timedelta(minutes=5)), 1)
+        self.assertEqual(RollupState.objects.get(name=ROLLUP_NAME).last_order_id, old.id)
+        self.assertEqual(refresh_rollups(settle_delay=timedelta(0)), 2)
+    
+    def test_rebuild_command(self):
+        """--rebuild пересобирает сводки после изменения учтенных заказов"""
+        order = self.create_order()
+        refresh_rollups()
+        Order.objects.filter(id=order.id).update(total_price=1000)
+        
+        out = StringIO()
+        call_command('refresh_rollups', '--rebuild', stdout=out)
+        self.assertIn('Учтено заказов: 1', out.getvalue())
+        self.assertEqual(DailySales.objects.get().revenue, Decimal('1000'))
+    
+    def test_dashboard_reads_only_rollups(self):
+        """Дашборд доступен персоналу и не обращается к таблицам заказов"""
+        self.create_order()
+        self.create_order(days_ago=2, delivery_method='delivery', city='moscow', delivery_price=300)
+        refresh_rollups()
+        url = reverse('reports:sales_dashboard')
+        
+        User.objects.create_user(email='user@example.com', username='user', password='x')
+        self.client.login(email='user@example.com', password='x')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        
+        User.objects.create_superuser(email='admin@example.com', username='admin', password='x')
+        self.client.login(email='admin@example.com', password='x')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['totals']['orders_count'], 2)
+        self.assertContains(response, 'moscow')
+        self.assertFalse([q for q in context.captured_queries if 'menu_order' in q['sql']])
+        
+        # Несуществующая дата - период по умолчанию
+        response = self.client.get(url, {'end': '2024-02-30', 'start': '2024-13-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['end'], timezone.localdate())
+
+
+class PhoneLookupTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', username='staff', password='testpass123', is_staff=True)
+        self.client.login(email='staff@example.com', password='testpass123')
+    
+    def test_lookup_across_tables(self):
+        """Поиск находит заказы, бронирования и обращения клиента при любой записи номера"""
+        from contact_form.models import ContactMessage
+        from homepage.models import Booking
+        order = Order.objects.create(customer_name='Анна', customer_phone='8 (999) 123-45-67', total_price=100)
+        Order.objects.create(customer_name='Петр', customer_phone='+79990000000', total_price=100)
+        booking = Booking.objects.create(
+            user=self.staff, event_date='2030-01-10', event_time='12:00', guests_count=5,
+            event_type='birthday', phone='+79991234567',
+        )
+        message = ContactMessage.objects.create(name='Анна', email='anna@example.com', phone='9991234567', message='Текст')
+        
+        response = self.client.get(reverse('reports:phone_lookup'), {'phone': '+7 999 123 45 67'})
+        self.assertEqual(response.status_code, 200)
+        results = response.context['results']
+        self.assertEqual([row.pk for row in results['orders']], [order.pk])
+        self.assertEqual([row.pk for row in results['bookings']], [booking.pk])
+        self.assertEqual([row.pk for row in results['messages']], [message.pk])
+    
+    def test_lookup_includes_archive(self):
+        """Бронирования из архива тоже находятся, со ссылкой на архив"""
+        from datetime import date
+        from homepage.lifecycle import archive_old
+        from homepage.models import Booking
+        booking = Booking.objects.create(
+            user=self.staff, event_date=date.today() - timedelta(days=400), event_time='12:00', guests_count=5,
+            event_type='birthday', phone='+79991234567', status='completed',
+        )
+        archive_old(timezone.now() - timedelta(days=365))
+        
+        response = self.client.get(reverse('reports:phone_lookup'), {'phone': '89991234567'})
+        self.assertEqual([(row.pk, row.is_archived) for row in response.context['results']['bookings']], [(booking.pk, True)])
+        self.assertContains(response, reverse('admin:homepage_archivedbooking_change', args=[booking.pk]))
+    
+    def test_invalid_phone(self):
+        """Некорректный номер показывает ошибку, поиск не выполняется"""
+        response = self.client.get(reverse('reports:phone_lookup'), {'phone': '12345'})
+        self.assertIsNone(response.context['results'])
+        self.assertContains(response, 'Номер телефона должен содержать 10 или 11 цифр')
+    
+    def test_admin_search_by_phone(self):
+        """Поиск в списке заказов по телефону - точное совпадение по нормализованному номеру"""
+        self.staff.is_superuser = True
+        self.staff.save()
+        Order.objects.create(customer_name='Анна', customer_phone='89991234567', total_price=100)
+        Order.objects.create(customer_name='Петр', customer_phone='+79990000000', total_price=100)
+        response = self.client.get(reverse('admin:menu_order_changelist'), {'q': '+7 (999) 123-45-67'})
+        self.assertEqual([order.customer_name for order in response.context['cl'].result_list], ['Анна'])
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'reports'
+
+urlpatterns = [
+    path('', views.sales_dashboard, name='sales_dashboard'),
+    path('phone/', views.phone_lookup, name='phone_lookup'),
+]
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from contact_form.models import ContactMessage
+from homepage.models import BookingHistory
+from menu.models import Order
+from menu.phones import normalize_phone, validate_phone_number
+
+from .rollups import sales_summary
+
+DEFAULT_PERIOD_DAYS = 30
+# Сколько последних записей каждого вида показывать при поиске по телефону
+LOOKUP_LIMIT = 50
+
+
+def parse_query_date(value):
+    """Дата из параметра запроса или None (в том числе для несуществующей даты 2024-02-30)"""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+@staff_member_required
+def sales_dashboard(request):
+    """Дашборд продаж для персонала, читает только таблицы сводок"""
+    today = timezone.localdate()
+    end = parse_query_date(request.GET.get('end')) or today
+    start = parse_query_date(request.GET.get('start')) or end - timedelta(days=DEFAULT_PERIOD_DAYS - 1)
+    if start > end:
+        start, end = end, start
+
+    summary = sales_summary(start, end)
+    # Названия способов из choices заказа, без обращения к таблице заказов
+    delivery_labels = dict(Order._meta.get_field('delivery_method').choices)
+    payment_labels = dict(Order._meta.get_field('payment_method').choices)
+    summary['by_delivery'] = [
+        {**row, 'label': delivery_labels.get(row['delivery_method'], row['delivery_method'])}
+        for row in summary['by_delivery']
+    ]
+    summary['by_payment'] = [
+        {**row, 'label': payment_labels.get(row['payment_method'], row['payment_method'])}
+        for row in summary['by_payment']
+    ]
+
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Продажи',
+        'start': start,
+        'end': end,
+        **summary,
+    }
+    return render(request, 'reports/dashboard.html', context)
+
+
+@staff_member_required
+def phone_lookup(request):
+    """Заказы, бронирования и обращения клиента по номеру телефона"""
+    query = request.GET.get('phone', '').strip()
+    phone = normalize_phone(query)
+    error = ''
+    results = None
+    if query and not phone:
+        error = validate_phone_number(query)[1]
+    elif phone:
+        # Точное совпадение по индексам нормализованных телефонов
+        results = {
+            'orders': list(
+                Order.objects.filter(customer_phone_normalized=phone)
+                .select_related('user').order_by('-created_at')[:LOOKUP_LIMIT]
+            ),
+            # Вместе с архивом бронирований (homepage.lifecycle)
+            'bookings': list(
+                BookingHistory.objects.filter(phone_normalized=phone)
+                .select_related('user').order_by('-created_at')[:LOOKUP_LIMIT]
+            ),
+            'messages': list(
+                ContactMessage.objects.filter(phone_normalized=phone)
+                .select_related('user').order_by('-created_at')[:LOOKUP_LIMIT]
+            ),
+        }
+
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Поиск клиента по телефону',
+        'query': query,
+        'phone': phone,
+        'error': error,
+        'results': results,
+        'limit': LOOKUP_LIMIT,
+    }
+    return render(request, 'reports/phone_lookup.html', context)